@@ -0,0 +1,68 @@
+"""
+Measure how long the app's modules take to import.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` (the same way the
+Streamlit server imports it, with xaelai/ on sys.path), and the cumulative time of the
+module itself is reported together with the slowest modules it pulled in. With
+``--max-ms`` the script exits non-zero when a module takes longer, so it can guard
+against an eager import creeping back in.
+
+Usage: python benchmarks/bench_import_time.py [--max-ms 500] [--top 5] [module ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+XAELAI = Path(__file__).resolve().parents[1] / "xaelai"
+
+DEFAULT_MODULES = ["tools.utils", "tools.homeassistant", "resources", "jobs", "ingestion", "assistant", "app"]
+
+
+def import_times(module: str) -> List[Tuple[int, str]]:
+    """Import a module in a new interpreter and return (cumulative microseconds, name) per imported module."""
+    env = dict(os.environ, PYTHONPATH=str(XAELAI), PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=XAELAI, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        raise ImportError(error)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative), name.strip()))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when a module takes longer to import.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest dependencies to list.")
+    args = parser.parse_args()
+
+    failed = []
+    for module in args.modules:
+        try:
+            times = import_times(module)
+        except ImportError as e:
+            print(f"{module:<22} skipped: {e}")
+            continue
+        total_ms = next((us for us, name in times if name == module), max(times)[0]) / 1000
+        slowest = sorted((t for t in times if t[1] != module and "." not in t[1]), reverse=True)[:args.top]
+        print(f"{module:<22} {total_ms:>8.1f} ms   " + ", ".join(f"{name} {us / 1000:.0f}" for us, name in slowest))
+        if args.max_ms is not None and total_ms > args.max_ms:
+            failed.append(module)
+    if failed:
+        print(f"Over {args.max_ms} ms: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
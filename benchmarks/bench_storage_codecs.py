@@ -0,0 +1,96 @@
+"""
+Compare chat history codecs on a realistic run.
+
+Builds a run with 1,000 chat messages (and the matching llm_messages, as the Assistant
+stores both), then times dump and load for each available codec.
+
+Usage: python benchmarks/bench_storage_codecs.py [--messages 1000] [--repeat 5]
+"""
+import argparse
+import io
+import random
+import string
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import yaml  # noqa: E402
+
+from xaelai.storage.codecs import Codec, YamlCodec, JsonCodec, MsgpackCodec  # noqa: E402
+
+
+class PureYamlCodec(Codec):
+    """The serializer YamlStorage used before codecs were introduced."""
+
+    def dump(self, data: dict, file) -> None:
+        yaml.safe_dump(data, file)
+
+    def load(self, file) -> dict:
+        return yaml.safe_load(file)
+
+
+def make_run(messages: int) -> dict:
+    random.seed(0)
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(2000)]
+    chat_history = []
+    for i in range(messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = " ".join(random.choices(words, k=random.randint(10, 200)))
+        chat_history.append({"role": role, "content": content, "metrics": {"time": random.random()}})
+    return {
+        "name": "local_rag_assistant",
+        "run_id": datetime.now().isoformat(),
+        "run_name": "benchmark",
+        "user_id": "bench",
+        "llm": {"name": "Ollama", "model": "llama3.1:latest", "metrics": {"response_times": [0.5] * (messages // 2)}},
+        "memory": {"chat_history": chat_history, "llm_messages": [dict(m) for m in chat_history], "references": []},
+        "assistant_data": None,
+        "run_data": None,
+        "user_data": None,
+        "task_data": None,
+        "created_at": datetime.now(),
+        "updated_at": None,
+    }
+
+
+def bench(codec: Codec, data: dict, repeat: int):
+    dump_times, load_times = [], []
+    payload = b""
+    for _ in range(repeat):
+        file = io.BytesIO() if codec.binary else io.StringIO()
+        start = time.perf_counter()
+        codec.dump(data, file)
+        dump_times.append(time.perf_counter() - start)
+        payload = file.getvalue()
+        file.seek(0)
+        start = time.perf_counter()
+        codec.load(file)
+        load_times.append(time.perf_counter() - start)
+    size = len(payload) if codec.binary else len(payload.encode())
+    return min(dump_times), min(load_times), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_run(args.messages)
+    codecs = {"yaml (pure python)": PureYamlCodec(), "yaml (libyaml)": YamlCodec(), "json": JsonCodec()}
+    try:
+        codecs["msgpack"] = MsgpackCodec()
+    except ImportError as e:
+        print(f"Skipping msgpack: {e}")
+
+    print(f"{'codec':<20}{'dump ms':>10}{'load ms':>10}{'size KiB':>10}")
+    for name, codec in codecs.items():
+        dump, load, size = bench(codec, data, args.repeat)
+        print(f"{name:<20}{dump * 1000:>10.1f}{load * 1000:>10.1f}{size / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
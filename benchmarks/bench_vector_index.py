@@ -0,0 +1,106 @@
+"""
+Measure recall against latency for the knowledge base ANN index.
+
+Loads random clustered embeddings into a scratch collection, computes the exact
+nearest neighbours with a sequential scan, then reports recall@k and query latency
+for a range of HNSW ef_search (or IVFFlat probes) values. Storage (vector/halfvec) and
+binary quantization can be compared the same way. Needs a Postgres with the pgvector
+extension (0.7 or later for halfvec and binary quantization), given by DB_URL.
+
+Usage: python benchmarks/bench_vector_index.py [--rows 20000] [--dimensions 768] [--index hnsw]
+       [--storage vector] [--quantization none] [--queries 100]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "xaelai"))
+
+from phi.document import Document  # noqa: E402
+from phi.embedder.base import Embedder  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from xaelai.ingestion import bulk_upsert  # noqa: E402
+from xaelai.vector_store import ManagedPgVector, make_index  # noqa: E402
+
+
+class NoEmbedder(Embedder):
+    """The benchmark only searches by embedding."""
+
+    def get_embedding(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+
+def make_vectors(rows: int, dimensions: int, clusters: int = 50) -> List[List[float]]:
+    random.seed(0)
+    centres = [[random.gauss(0, 1) for _ in range(dimensions)] for _ in range(clusters)]
+    return [[c + random.gauss(0, 0.3) for c in random.choice(centres)] for _ in range(rows)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("DB_URL", "postgresql+psycopg://ai:ai@localhost:5432/ai"))
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--storage", choices=["vector", "halfvec"], default="vector")
+    parser.add_argument("--quantization", choices=["none", "binary"], default="none")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    store = ManagedPgVector(
+        collection="bench_vector_index",
+        embedder=NoEmbedder(dimensions=args.dimensions),
+        db_engine=engine,
+        index=make_index(args.index),
+        storage=args.storage,
+        quantization=args.quantization,
+    )
+    store.delete()
+    store.create()
+    vectors = make_vectors(args.rows, args.dimensions)
+    start = time.perf_counter()
+    for i in range(0, args.rows, 1000):
+        bulk_upsert(store, [Document(id=str(j), name="bench", content=str(j), embedding=vectors[j]) for j in range(i, min(i + 1000, args.rows))])
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    store.after_bulk_load()
+    print(f"Built {args.index} index in {time.perf_counter() - start:.1f}s: {store.index_info()}")
+
+    queries = make_vectors(args.queries, args.dimensions, clusters=50)
+    exact = []
+    with store.Session() as sess:
+        with sess.begin():
+            sess.execute(text("SET LOCAL enable_indexscan = off"))
+            for query in queries:
+                stmt = store.table.select().order_by(store.table.c.embedding.cosine_distance(query)).limit(args.k)
+                exact.append({row.content for row in sess.execute(stmt)})
+
+    knob = "ef_search" if args.index == "hnsw" else "probes"
+    values = [10, 20, 40, 80, 160, 320] if args.index == "hnsw" else [1, 2, 5, 10, 20, 50]
+    print(f"{knob:>10} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for value in values:
+        latencies, recalls = [], []
+        for query, truth in zip(queries, exact):
+            start = time.perf_counter()
+            found = store.search_by_embedding(query, limit=args.k, **{knob: value})
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len({d.content for d in found} & truth) / args.k)
+        latencies.sort()
+        print(
+            f"{value:>10} {statistics.mean(recalls):>10.3f} {statistics.median(latencies):>8.2f} "
+            f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f}"
+        )
+    store.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The app runs from inside xaelai/ and imports its modules as top-level names
+# (`from settings import Settings`), so make those resolvable for the tests too.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "xaelai"))
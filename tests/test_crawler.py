@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from xaelai import crawler as crawler_module
+from xaelai.crawler import ValidatorStore, WebsiteCrawler
+
+PAGES = {
+    "/": '<html><body><main>Home page</main><a href="/a">a</a><a href="/b#top">b</a><a href="/private">p</a>'
+         '<a href="http://example.com/">external</a></body></html>',
+    "/a": '<html><body><article>Page A</article><a href="/c">c</a></body></html>',
+    "/b": '<html><body><div class="content">Page B</div></body></html>',
+    "/c": '<html><body><p>Page C</p></body></html>',
+    "/private": '<html><body><p>Secret</p></body></html>',
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/robots.txt":
+            body = b"User-agent: *\nDisallow: /private\n"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+        elif self.path in PAGES:
+            etag = f'"{hash(PAGES[self.path])}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = PAGES[self.path].encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("ETag", etag)
+        else:
+            body = b"not found"
+            self.send_response(404)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestWebsiteCrawler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.validators = ValidatorStore(os.path.join(self.tmp.name, "validators.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def crawler(self, **kwargs):
+        kwargs.setdefault("delay", 0)
+        return WebsiteCrawler(validators=self.validators, **kwargs)
+
+    def test_crawl_follows_site_links_and_respects_robots(self):
+        pages = {page.url: page for page in self.crawler(max_depth=3).iter_pages(self.url)}
+        self.assertEqual(
+            {url[len(self.url) - 1:]: page.content for url, page in pages.items()},
+            {"/": "Home page", "/a": "Page A", "/b": "Page B", "/c": "Page C"},
+        )
+        self.assertEqual(pages[self.url + "c"].depth, 3)
+        self.assertNotIn("/private", [path for path, _ in Handler.requests])
+
+    def test_limits(self):
+        self.assertEqual(len(list(self.crawler(max_depth=1).iter_pages(self.url))), 1)
+        self.assertEqual(len(list(self.crawler(max_depth=3, max_pages=2).iter_pages(self.url))), 2)
+
+    def test_recrawl_uses_conditional_requests(self):
+        list(self.crawler(max_depth=3).iter_pages(self.url))
+        Handler.requests.clear()
+        validators = ValidatorStore(self.validators.path)
+        crawler = WebsiteCrawler(max_depth=3, delay=0, validators=validators)
+        pages = list(crawler.iter_pages(self.url, revalidate={self.url, self.url + "a"}))
+        unchanged = sorted(page.url for page in pages if page.not_modified)
+        self.assertEqual(unchanged, [self.url, self.url + "a"])
+        # Links of unchanged pages are still followed
+        self.assertEqual(len(pages), 4)
+        conditional = [path for path, etag in Handler.requests if etag]
+        self.assertEqual(sorted(conditional), ["/", "/a"])
+
+    def test_failing_pages_do_not_stop_the_crawl(self):
+        extract = crawler_module.extract_main_content
+
+        def extract_or_fail(html):
+            if b"Page A" in html:
+                raise ValueError("unparseable page")
+            return extract(html)
+
+        pages = []
+        with mock.patch.object(crawler_module, "extract_main_content", side_effect=extract_or_fail):
+            thread = threading.Thread(
+                target=lambda: pages.extend(self.crawler(max_depth=3, max_connections=1).iter_pages(self.url)), daemon=True
+            )
+            thread.start()
+            thread.join(10)
+        self.assertFalse(thread.is_alive(), "crawl hung after a page failed")
+        self.assertEqual(sorted(page.content for page in pages), ["Home page", "Page B"])
+
+    def test_pages_are_chunked_into_documents(self):
+        page = next(iter(self.crawler(max_depth=1).iter_pages(self.url)))
+        documents = page.to_documents()
+        self.assertEqual([(d.name, d.id, d.content) for d in documents], [(self.url, self.url + "_1", "Home page")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from phi.embedder.base import Embedder
+from xaelai.embedding_cache import CachedEmbedder, EmbeddingCache
+
+
+class CountingEmbedder(Embedder):
+    dimensions: int = 4
+    model: str = "counting"
+    calls: int = 0
+
+    def get_embedding(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.5, 0.25, 1.0]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "embeddings.sqlite")
+        self.inner = CountingEmbedder()
+        self.embedder = CachedEmbedder(embedder=self.inner, cache=EmbeddingCache(self.path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_identical_texts_are_embedded_once(self):
+        self.assertEqual(self.embedder.dimensions, 4)
+        first = self.embedder.get_embeddings(["a", "bb", "a"])
+        second = self.embedder.get_embeddings(["bb", "a"])
+        self.assertEqual(first, [[1.0, 0.5, 0.25, 1.0], [2.0, 0.5, 0.25, 1.0], [1.0, 0.5, 0.25, 1.0]])
+        self.assertEqual(second, first[1:])
+        self.assertEqual(self.inner.calls, 2)
+        stats = self.embedder.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 2, 2))
+
+    def test_cache_persists_and_is_keyed_by_model(self):
+        self.embedder.get_embedding("hello")
+        reopened = EmbeddingCache(self.path)
+        self.assertEqual(reopened.get_many("counting", 4, ["hello"]), {"hello": [5.0, 0.5, 0.25, 1.0]})
+        self.assertEqual(reopened.get_many("other", 4, ["hello"]), {})
+        self.assertEqual(reopened.get_many("counting", 8, ["hello"]), {})
+
+    def test_failed_embeddings_are_not_cached(self):
+        cache = EmbeddingCache(self.path)
+        cache.put_many("counting", 4, {"broken": []})
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_least_recently_used_embeddings_are_evicted(self):
+        cache = EmbeddingCache(self.path, max_bytes=16 * 3)
+        cache.put_many("counting", 4, {"a": [1.0] * 4, "b": [2.0] * 4})
+        cache.get_many("counting", 4, ["a"])
+        cache.put_many("counting", 4, {"c": [3.0] * 4, "d": [4.0] * 4})
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 16 * 3)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertNotIn("b", cache.get_many("counting", 4, ["b"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
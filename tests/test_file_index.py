@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from xaelai.tools.file_index import FileIndex
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / "logs").mkdir()
+        (self.root / "chat_history").mkdir()
+        (self.root / "notes.txt").write_text("alpha\nbeta\ngamma\n")
+        (self.root / "logs" / "app.log").write_text("".join(f"line {i} {'ERROR' if i % 100 == 0 else 'ok'}\n" for i in range(1, 1001)))
+        (self.root / "report.pdf").write_bytes(b"%PDF-1.4 ERROR")
+        (self.root / "chat_history" / "run.yaml").write_text("ERROR")
+        self.index_path = self.root / ".file_index.json"
+        self.index = FileIndex(self.root, index_path=self.index_path, exclude=["chat_history/*"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_refresh_reports_changes(self):
+        changes = self.index.refresh()
+        self.assertEqual(changes.added, ["logs/app.log", "notes.txt", "report.pdf"])
+        self.assertFalse(self.index.refresh())
+        (self.root / "notes.txt").write_text("changed\n")
+        os.utime(self.root / "notes.txt", (1, 1))
+        (self.root / "report.pdf").unlink()
+        (self.root / "logs" / "new.log").write_text("new\n")
+        changes = self.index.refresh()
+        self.assertEqual((changes.added, changes.changed, changes.removed), (["logs/new.log"], ["notes.txt"], ["report.pdf"]))
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        self.index.refresh()
+        reloaded = FileIndex(self.root, index_path=self.index_path, exclude=["chat_history/*"])
+        self.assertEqual(set(reloaded.records), {"logs/app.log", "notes.txt", "report.pdf"})
+        from unittest import mock
+        with mock.patch("xaelai.tools.file_index.hash_file") as hash_file:
+            self.assertFalse(reloaded.refresh())
+        hash_file.assert_not_called()
+
+    def test_search(self):
+        self.assertEqual([r.path for r in self.index.search(pattern="*.log")], ["logs/app.log"])
+        self.assertEqual([r.path for r in self.index.search(substring="NOTES")], ["notes.txt"])
+        self.assertEqual([r.path for r in self.index.search(type="application/pdf")], ["report.pdf"])
+        self.assertEqual(self.index.get("notes.txt").size, 17)
+
+    def test_refresh_reports_hashed_bytes(self):
+        sizes = []
+        self.index.refresh(throttle=sizes.append)
+        self.assertEqual(sorted(sizes), sorted(self.index.get(path).size for path in self.index.records))
+        sizes.clear()
+        self.index.refresh(throttle=sizes.append)
+        self.assertEqual(sizes, [])
+
+    def test_running_refresh_is_not_waited_for(self):
+        self.index.refresh()
+        with self.index._refresh_lock:
+            self.assertFalse(self.index.refresh(wait=False))
+            self.index.refreshed_at = 0
+            self.index.ensure_fresh()
+        self.assertEqual(len(self.index.search()), 3)
+
+    def test_read_lines(self):
+        lines, more = self.index.read_lines("logs/app.log", start=99, count=3)
+        self.assertEqual(lines, ["line 99 ok", "line 100 ERROR", "line 101 ok"])
+        self.assertTrue(more)
+        self.assertEqual(self.index.read_lines("notes.txt"), (["alpha", "beta", "gamma"], False))
+        with self.assertRaises(PermissionError):
+            self.index.read_lines("../outside.txt")
+
+    def test_read_lines_truncates_long_lines(self):
+        (self.root / "min.json").write_text('{"a": "' + "x" * 100000 + '"}\nsecond\n')
+        lines, more = self.index.read_lines("min.json", count=10, max_bytes=1000)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('{"a": "xxx'))
+        self.assertTrue(lines[0].endswith("[... line truncated, 99009 more characters ...]"))
+        self.assertTrue(more)
+        self.assertEqual(self.index.read_lines("min.json", start=2, max_bytes=1000), (["second"], False))
+
+    def test_read_lines_returns_an_oversize_single_line(self):
+        (self.root / "min.json").write_text("[" + "1," * 50000 + "1]")
+        lines, more = self.index.read_lines("min.json")
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(len(lines[0]), 64 * 1024 + len(" [... line truncated, 34467 more characters ...]"))
+        self.assertFalse(more)
+
+    def test_grep(self):
+        matches, truncated = self.index.grep("error", max_matches=2)
+        self.assertEqual(matches, [("logs/app.log", 100, "line 100 ERROR"), ("logs/app.log", 200, "line 200 ERROR")])
+        self.assertTrue(truncated)
+        with_context, _ = self.index.grep(r"line 10+ ", regex=True, path_pattern="logs/*", context=1, max_matches=1)
+        self.assertEqual([number for _, number, _ in with_context], [9, 10, 11])
+        self.assertEqual(self.index.grep("gamma"), ([("notes.txt", 3, "gamma")], False))
+
+    def test_grep_shortens_oversize_lines(self):
+        (self.root / "min.json").write_text('{"a": "' + "x" * 100000 + 'NEEDLE' + "y" * 100000 + '"}\n')
+        matches, truncated = self.index.grep("needle", path_pattern="*.json", max_line_bytes=100)
+        self.assertFalse(truncated)
+        [(path, number, line)] = matches
+        self.assertEqual((path, number), ("min.json", 1))
+        self.assertIn("NEEDLE", line)
+        self.assertTrue(line.startswith("[... 99982 characters ...] xxx"))
+        self.assertTrue(line.endswith("[... line truncated, 99933 more characters ...]"))
+
+    def test_grep_output_is_bounded(self):
+        matches, truncated = self.index.grep("ok", max_matches=1000, max_bytes=1000)
+        self.assertTrue(truncated)
+        self.assertLessEqual(sum(len(line) for _, _, line in matches), 1000)
+        self.assertGreater(len(matches), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from xaelai.tools.homeassistant import HomeAssistantMirror, base_url, websocket_url
+
+STATES = [
+    {"entity_id": "light.kitchen", "state": "on", "attributes": {"friendly_name": "Kitchen Light"}},
+    {"entity_id": "light.porch", "state": "off", "attributes": {"friendly_name": "Porch Light"}},
+    {"entity_id": "switch.kettle", "state": "off", "attributes": {"friendly_name": "Kettle"}},
+    {"entity_id": "sensor.firmware", "state": "1.2", "attributes": {}},
+]
+AREAS = [["Kitchen", ["light.kitchen", "switch.kettle"]], ["Outside", ["light.porch"]]]
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def respond(self, body):
+        if self.headers.get("Authorization") != "Bearer secret":
+            self.send_response(401)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        self.respond(json.dumps(STATES))
+
+    def do_POST(self):
+        self.requests.append(self.path)
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.respond(json.dumps(AREAS) if "areas()" in payload["template"] else "")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeConnection:
+    """Plays Home Assistant's side of the websocket API."""
+
+    def __init__(self, events):
+        self.incoming = [{"type": "auth_required"}, {"type": "auth_ok"}, *events]
+        self.sent = []
+
+    async def read_message(self):
+        return json.dumps(self.incoming.pop(0)) if self.incoming else None
+
+    async def write_message(self, message):
+        self.sent.append(json.loads(message))
+
+
+class TestHomeAssistantMirror(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/api/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests.clear()
+        self.mirror = HomeAssistantMirror(self.url, "secret", timeout=5)
+
+    def test_urls_are_normalised(self):
+        self.assertEqual(base_url("http://hass:8123/api/"), "http://hass:8123")
+        self.assertEqual(base_url("http://hass:8123"), "http://hass:8123")
+        self.assertEqual(websocket_url("https://hass.example/api"), "wss://hass.example/api/websocket")
+
+    def test_queries_are_answered_from_memory(self):
+        lights = self.mirror.entities(domains=["light"])
+        self.assertEqual([e["entity_id"] for e in lights], ["light.kitchen", "light.porch"])
+        kitchen = self.mirror.entities(domains=["light", "switch"], area="kitchen")
+        self.assertEqual([e["entity_id"] for e in kitchen], ["light.kitchen", "switch.kettle"])
+        self.assertEqual(self.mirror.areas(), ["Kitchen", "Outside"])
+        self.assertEqual(Handler.requests, ["/api/states", "/api/template"])
+
+    def test_events_keep_the_mirror_current(self):
+        events = [
+            {"type": "result", "success": True},
+            {"type": "event", "event": {"event_type": "state_changed", "data": {
+                "entity_id": "light.porch", "new_state": {"entity_id": "light.porch", "state": "on", "attributes": {}}}}},
+            {"type": "event", "event": {"event_type": "state_changed", "data": {
+                "entity_id": "switch.kettle", "new_state": None}}},
+        ]
+        connection = FakeConnection(events)
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.mirror.listen(connection))
+        self.assertEqual(connection.sent[0], {"type": "auth", "access_token": "secret"})
+        self.assertEqual(connection.sent[1]["event_type"], "state_changed")
+        self.assertEqual(self.mirror.states["light.porch"]["state"], "on")
+        self.assertNotIn("switch.kettle", self.mirror.states)
+        self.assertEqual([e["entity_id"] for e in self.mirror.entities(domains=["switch"])], [])
+
+    def test_failed_authentication(self):
+        connection = FakeConnection([])
+        connection.incoming[1] = {"type": "auth_invalid", "message": "Invalid access token"}
+        with self.assertRaises(PermissionError):
+            asyncio.run(self.mirror.listen(connection))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+XAELAI = Path(__file__).resolve().parents[1] / "xaelai"
+
+HEAVY_MODULES = ["sympy", "pint", "duckduckgo_search", "arxiv", "pypdf"]
+
+
+def imported_modules(module: str, **env_vars: str) -> set:
+    """Import a module in a fresh interpreter, the way the app does, and list what got loaded."""
+    code = f"import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=str(XAELAI), **env_vars)
+    result = subprocess.run([sys.executable, "-c", code], cwd=XAELAI, env=env, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr)
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def installed(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+class TestImportTime(unittest.TestCase):
+
+    def assertNotLoaded(self, module, **env_vars):
+        loaded = imported_modules(module, **env_vars)
+        self.assertEqual([name for name in HEAVY_MODULES if name in loaded], [])
+
+    def test_utils_tools_load_their_dependencies_on_first_use(self):
+        self.assertNotLoaded("tools.utils")
+
+    def test_homeassistant_tools_do_not_call_the_api_on_import(self):
+        # HASS_URL points nowhere: an import-time request would raise.
+        self.assertNotLoaded("tools.homeassistant", HASS_URL="http://127.0.0.1:9")
+
+    @unittest.skipUnless(installed("streamlit"), "streamlit is not installed")
+    def test_assistant_does_not_load_optional_toolkits(self):
+        self.assertNotLoaded("assistant")
+
+    def test_lazy_tools_still_work(self):
+        from xaelai.tools.utils import math, unit_conversion
+
+        self.assertEqual(math("1/2"), "1/2")
+        self.assertEqual(math("1/2", as_float=True), "0.500000000000000")
+        self.assertIn("1000", unit_conversion("kilometer", "meter"))
+
+
+if __name__ == "__main__":
+    unittest.main()
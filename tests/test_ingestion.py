@@ -0,0 +1,92 @@
+import time
+import unittest
+from unittest import mock
+
+from phi.document import Document
+from phi.embedder.base import Embedder
+from xaelai import ingestion
+from xaelai.ingestion import IngestionPipeline, chunk_hash
+from xaelai.jobs import Job
+from xaelai.manifest import ManifestEntry
+
+
+class CountingEmbedder(Embedder):
+    dimensions: int = 3
+
+    def get_embedding(self, text):
+        return [float(len(text)), 0.0, 1.0]
+
+
+class TestIngestionPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.vector_db = mock.Mock()
+        self.vector_db.embedder = CountingEmbedder()
+        self.vector_db.collection = "text_documents"
+        self.vector_db.schema = "ai"
+        self.pipeline = IngestionPipeline(self.vector_db, embed_batch_size=4, embed_concurrency=2)
+        self.pipeline.manifest = mock.Mock()
+        self.pipeline.manifest.get.return_value = None
+        self.pipeline.existing_embeddings = mock.Mock(return_value={})
+        self.pipeline.delete_chunks = mock.Mock()
+        self.documents = [Document(id=f"doc_{i}", name="doc", content="x" * (i + 1)) for i in range(10)]
+
+    def test_documents_are_embedded_and_upserted_in_batches(self):
+        with mock.patch.object(ingestion, "bulk_upsert") as bulk_upsert:
+            job = Job("doc")
+            self.pipeline.ingest(self.documents, job)
+        self.assertEqual([len(call.args[1]) for call in bulk_upsert.call_args_list], [4, 4, 2])
+        self.assertEqual(self.documents[2].embedding, [3.0, 0.0, 1.0])
+        self.assertEqual((job.done, job.total, job.progress), (10, 10, 1.0))
+
+    def test_background_job_reports_failure(self):
+        with mock.patch.object(ingestion, "bulk_upsert", side_effect=RuntimeError("db down")):
+            job = self.pipeline.submit_documents(self.documents, "doc")
+            for _ in range(100):
+                if job.finished:
+                    break
+                time.sleep(0.05)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("db down", job.error)
+
+    def test_unchanged_document_is_skipped(self):
+        with mock.patch.object(ingestion, "bulk_upsert") as bulk_upsert:
+            self.pipeline.sync_document("doc", self.documents, Job("doc"))
+            entry = self.pipeline.manifest.put.call_args.args[0]
+            self.pipeline.manifest.get.return_value = entry
+            message = self.pipeline.sync_document("doc", self.documents, Job("doc"))
+        self.assertEqual(bulk_upsert.call_count, 3)
+        self.assertEqual(message, "doc is unchanged")
+
+    def test_only_changed_chunks_are_loaded_and_stale_chunks_deleted(self):
+        chunks = {d.id: chunk_hash(d) for d in self.documents}
+        chunks["doc_0"] = "outdated"
+        chunks["doc_99"] = "removed"
+        self.pipeline.manifest.get.return_value = ManifestEntry("doc", "old", chunks)
+        self.pipeline.existing_embeddings.return_value = {chunk_hash(self.documents[0]): [9.0, 9.0, 9.0]}
+        with mock.patch.object(ingestion, "bulk_upsert") as bulk_upsert:
+            self.pipeline.sync_document("doc", self.documents, Job("doc"))
+        self.assertEqual(bulk_upsert.call_args.args[1], [self.documents[0]])
+        self.assertEqual(self.documents[0].embedding, [9.0, 9.0, 9.0])
+        self.pipeline.delete_chunks.assert_called_once_with(["doc_99"])
+        self.assertNotIn("doc_99", self.pipeline.manifest.put.call_args.args[0].chunks)
+
+    def test_crawled_pages_are_synced_as_they_arrive(self):
+        from xaelai.crawler import CrawledPage
+
+        crawler = mock.Mock()
+        crawler.iter_pages.return_value = iter([
+            CrawledPage("http://site/", 1, "Home page"),
+            CrawledPage("http://site/a", 2, not_modified=True),
+        ])
+        self.pipeline.manifest.names.return_value = ["http://site/a"]
+        self.pipeline.sync_document = mock.Mock(return_value="")
+        message = self.pipeline.sync_crawl(crawler, "http://site/", Job("http://site/"))
+        crawler.iter_pages.assert_called_once_with("http://site/", revalidate={"http://site/a"})
+        self.pipeline.sync_document.assert_called_once()
+        self.assertEqual(self.pipeline.sync_document.call_args.args[0], "http://site/")
+        self.assertEqual(message, "http://site/: 2 pages crawled, 1 unchanged")
+
+
+if __name__ == "__main__":
+    unittest.main()
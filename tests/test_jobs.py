@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from xaelai.jobs import JobManager
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp.name, "jobs.json")
+        self.manager = JobManager(self.state_path, max_workers=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_job_reports_progress_and_result(self):
+        def step(job):
+            job.update(done=1, total=2, message="halfway")
+            return "finished"
+
+        job = wait_for(self.manager.submit("pull", "Pull llama3", step))
+        self.assertEqual((job.status, job.message, job.progress), ("done", "finished", 0.5))
+        self.assertIs(self.manager.get(job.id), job)
+
+    def test_failures_are_recorded(self):
+        def step(job):
+            raise RuntimeError("ollama down")
+
+        job = wait_for(self.manager.submit("pull", "Pull llama3", step))
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "ollama down")
+
+    def test_identical_running_jobs_are_shared(self):
+        release = threading.Event()
+        calls = []
+
+        def step(job):
+            calls.append(job.id)
+            release.wait(5)
+            return "pulled"
+
+        first = self.manager.submit("pull", "Pull llama3", step, key=("pull", "llama3"))
+        second = self.manager.submit("pull", "Pull llama3", step, key=("pull", "llama3"))
+        other = self.manager.submit("pull", "Pull mistral", step, key=("pull", "mistral"))
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual([job.id for job in self.manager.jobs(kind="pull", active=True)], [first.id, other.id])
+        release.set()
+        wait_for(first)
+        wait_for(other)
+        self.assertEqual(len(calls), 2)
+        # Once finished, the same key starts a new job.
+        third = wait_for(self.manager.submit("pull", "Pull llama3", step, key=("pull", "llama3")))
+        self.assertIsNot(third, first)
+
+    def test_kinds_with_their_own_pool_do_not_take_shared_workers(self):
+        manager = JobManager(max_workers=1, kind_workers={"index": 1})
+        release = threading.Event()
+        scans = [manager.submit("index", f"Index {n}", lambda job: release.wait(5) and "scanned") for n in range(2)]
+        pull = wait_for(manager.submit("pull", "Pull llama3", lambda job: "pulled"))
+        self.assertEqual(pull.status, "done")
+        # Scans run one at a time on their own worker.
+        deadline = time.time() + 5
+        while scans[0].status != "running" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([scan.status for scan in scans], ["running", "queued"])
+        release.set()
+        self.assertEqual([wait_for(scan).status for scan in scans], ["done", "done"])
+
+    def test_last_job_of_a_key(self):
+        def step(job):
+            raise RuntimeError("model not found")
+
+        self.assertIsNone(self.manager.last_job(("pull", "llama3")))
+        first = wait_for(self.manager.submit("pull", "Pull llama3", step, key=("pull", "llama3")))
+        self.manager.submit("pull", "Pull mistral", lambda job: "pulled", key=("pull", "mistral"))
+        self.assertIs(self.manager.last_job(("pull", "llama3")), first)
+        self.assertEqual(first.status, "failed")
+        second = wait_for(self.manager.submit("pull", "Pull llama3", step, key=("pull", "llama3")))
+        self.assertIs(self.manager.last_job(("pull", "llama3")), second)
+
+    def test_state_is_persisted_and_interrupted_jobs_are_failed(self):
+        release = threading.Event()
+        done = wait_for(self.manager.submit("ingest", "manual.pdf", lambda job: "loaded"))
+        running = self.manager.submit("crawl", "http://site/", lambda job: release.wait(5) and "crawled")
+        time.sleep(0.05)
+        with open(self.state_path) as file:
+            self.assertEqual({record["id"] for record in json.load(file)}, {done.id, running.id})
+
+        restarted = JobManager(self.state_path)
+        self.assertEqual(restarted.get(done.id).message, "loaded")
+        interrupted = restarted.get(running.id)
+        self.assertEqual((interrupted.status, interrupted.message), ("failed", "Interrupted by a restart"))
+        self.assertEqual(restarted.jobs(active=True), [])
+        release.set()
+        wait_for(running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from phi.assistant.run import AssistantRun
+from xaelai.storage.jsonl_storage import JsonLinesStorage
+from xaelai.storage.yaml_storage import YamlStorage
+
+
+def make_run(run_id: str, messages: int, run_name: str = "chat") -> AssistantRun:
+    chat_history = [{"role": "user", "content": f"message {i}"} for i in range(messages)]
+    return AssistantRun(run_id=run_id, run_name=run_name, memory={"chat_history": chat_history})
+
+
+class TestJsonLinesStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = JsonLinesStorage(storage_dir=self.tmp_dir.name, compact_after=3)
+        self.log_path = Path(self.tmp_dir.name, "run.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_upsert_appends_only_new_messages(self):
+        self.storage.upsert(make_run("run", messages=2))
+        self.storage.upsert(make_run("run", messages=3))
+        lines = self.log_path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("message 2", lines[1])
+        self.assertNotIn("message 0", lines[1])
+        self.assertEqual(len(self.storage.read("run").memory["chat_history"]), 3)
+
+    def test_non_append_changes_are_replayed(self):
+        self.storage.upsert(make_run("run", messages=2))
+        self.storage.upsert(make_run("run", messages=1, run_name="renamed"))
+        run = JsonLinesStorage(storage_dir=self.tmp_dir.name).read("run")
+        self.assertEqual(run.run_name, "renamed")
+        self.assertEqual(len(run.memory["chat_history"]), 1)
+
+    def test_log_is_compacted(self):
+        for messages in range(1, 7):
+            self.storage.upsert(make_run("run", messages=messages))
+        self.assertLessEqual(len(self.log_path.read_text().splitlines()), 4)
+        self.assertEqual(len(self.storage.read("run").memory["chat_history"]), 6)
+
+    def test_truncated_tail_is_ignored_and_repaired(self):
+        self.storage.upsert(make_run("run", messages=2))
+        with self.log_path.open("a") as file:
+            file.write('{"extend": [[["memory", "chat_hi')
+        self.assertEqual(len(self.storage.read("run").memory["chat_history"]), 2)
+        self.storage.upsert(make_run("run", messages=3))
+        self.assertEqual(len(JsonLinesStorage(storage_dir=self.tmp_dir.name).read("run").memory["chat_history"]), 3)
+
+    def test_migrate_from_yaml(self):
+        yaml_storage = YamlStorage(storage_dir=self.tmp_dir.name)
+        yaml_storage.upsert(make_run("old", messages=4))
+        self.assertEqual(self.storage.migrate_from(yaml_storage, delete_source=True), 1)
+        self.assertEqual(len(self.storage.read("old").memory["chat_history"]), 4)
+        self.assertEqual(yaml_storage.get_all_run_ids(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
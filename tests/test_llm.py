@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+import ollama
+
+from phi.llm.message import Message
+
+from xaelai.llm import TimedOllama, format_timings, parse_keep_alive, response_timings, sum_timings
+
+FINAL_CHUNK = {
+    "message": {"role": "assistant", "content": ""},
+    "done": True,
+    "total_duration": 900_000_000,
+    "load_duration": 500_000,
+    "prompt_eval_count": 12,
+    "prompt_eval_duration": 40_000_000,
+    "eval_count": 20,
+    "eval_duration": 800_000_000,
+}
+
+
+def make_client():
+    return mock.create_autospec(ollama.Client, instance=True)
+
+
+def make_llm(client):
+    return TimedOllama(model="llama3", keep_alive="30m", ollama_client=client)
+
+
+class TestTimedOllama(unittest.TestCase):
+
+    def test_parse_keep_alive(self):
+        self.assertEqual(parse_keep_alive("30m"), "30m")
+        self.assertEqual(parse_keep_alive("-1"), -1)
+        self.assertEqual(parse_keep_alive("600"), 600)
+        self.assertIsNone(parse_keep_alive(""))
+
+    def test_timings_of_streamed_response_are_recorded(self):
+        client = make_client()
+        client.chat.return_value = iter([{"message": {"role": "assistant", "content": "Hi"}, "done": False}, FINAL_CHUNK])
+        llm = make_llm(client)
+        self.assertEqual("".join(llm.response_stream([Message(role="user", content="hello")])), "Hi")
+        self.assertEqual(client.chat.call_args.kwargs["keep_alive"], "30m")
+        timings = llm.metrics["ollama_timings"]
+        self.assertEqual(len(timings), 1)
+        self.assertEqual(timings[0]["prompt_eval_count"], 12)
+        self.assertAlmostEqual(timings[0]["prompt_eval_ms"], 40.0)
+        self.assertAlmostEqual(timings[0]["eval_ms"], 800.0)
+
+    def test_turn_timings_add_up(self):
+        turn = sum_timings([response_timings(FINAL_CHUNK), response_timings(FINAL_CHUNK)])
+        self.assertEqual(turn["eval_count"], 40)
+        self.assertEqual(
+            format_timings(turn), "prompt 24 tokens in 80 ms, generated 40 tokens in 1600 ms (25.0 tokens/s), model load 1 ms"
+        )
+
+    def test_warm_up_evaluates_the_system_prompt(self):
+        client = make_client()
+        client.chat.return_value = FINAL_CHUNK
+        client.generate.return_value = {"done": True, "load_duration": 2_000_000_000}
+        llm = make_llm(client)
+        self.assertEqual(llm.warm_up("You are helpful.")["prompt_eval_count"], 12)
+        kwargs = client.chat.call_args.kwargs
+        self.assertEqual(kwargs["messages"], [{"role": "system", "content": "You are helpful."}])
+        self.assertEqual(kwargs["options"], {"num_predict": 1})
+        self.assertEqual(kwargs["keep_alive"], "30m")
+        self.assertEqual(llm.warm_up()["load_ms"], 2000)
+        client.generate.assert_called_once_with(model="llama3", prompt="", keep_alive="30m")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import time
+import unittest
+
+from xaelai.tools import utils
+from xaelai.tools.math_worker import SympyEvaluator
+
+
+class TestSympyEvaluator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.evaluator = SympyEvaluator(workers=1, timeout=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.evaluator.close()
+
+    def test_evaluates(self):
+        self.assertEqual(self.evaluator.evaluate("1/2"), "1/2")
+        self.assertEqual(self.evaluator.evaluate("1/2", as_float=True), "0.500000000000000")
+        self.assertEqual(self.evaluator.evaluate("diff(x**2, x)"), "2*x")
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate("1 +* 2")
+
+    def test_slow_expression_is_stopped_and_worker_replaced(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            self.evaluator.evaluate("factorial(10**7)")
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertEqual(self.evaluator.evaluate("2 + 2"), "4")
+
+
+class TestCachedTools(unittest.TestCase):
+
+    def test_unit_conversion_reuses_parsed_units_and_results(self):
+        utils.convert.cache_clear()
+        utils.parse_unit.cache_clear()
+        self.assertEqual(utils.unit_conversion("Kilometer", "meter", 2.0), "2000.0 meter")
+        self.assertEqual(utils.unit_conversion("kilometer", "meter", 2.0), "2000.0 meter")
+        self.assertEqual(utils.unit_conversion("kilometer", "centimeter", 2.0), "200000.0 centimeter")
+        self.assertEqual(utils.convert.cache_info().hits, 1)
+        self.assertEqual(utils.parse_unit.cache_info().misses, 3)
+
+    def test_math_results_are_cached(self):
+        utils.evaluate.cache_clear()
+        self.assertEqual(utils.math("sqrt(16)"), "4")
+        self.assertEqual(utils.math("sqrt(16)"), "4")
+        self.assertEqual(utils.evaluate.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
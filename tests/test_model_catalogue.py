@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+from xaelai.model_catalogue import ModelCatalogue
+
+
+class TestModelCatalogue(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.client = mock.Mock()
+        self.client.list.return_value = {"models": [{"name": "llama3.1:latest"}, {"name": "nomic-embed-text:latest"}]}
+        self.catalogue = ModelCatalogue(self.client, ttl=60, clock=lambda: self.now)
+
+    def test_list_is_cached_until_ttl(self):
+        for _ in range(5):
+            self.assertEqual(self.catalogue.list_models(), ["llama3.1:latest", "nomic-embed-text:latest"])
+        self.assertEqual(self.client.list.call_count, 1)
+        self.now = 61
+        self.catalogue.list_models()
+        self.assertEqual(self.client.list.call_count, 2)
+
+    def test_invalidate_forces_refresh(self):
+        self.catalogue.list_models()
+        self.client.list.return_value = {"models": [{"name": "llama3.1:latest"}]}
+        self.catalogue.invalidate()
+        self.assertEqual(self.catalogue.list_models(), ["llama3.1:latest"])
+
+    def test_stale_list_is_used_when_refresh_fails(self):
+        self.catalogue.list_models()
+        self.client.list.side_effect = ConnectionError("ollama down")
+        self.now = 120
+        self.assertEqual(len(self.catalogue.list_models()), 2)
+        self.catalogue.invalidate()
+        with self.assertRaises(ConnectionError):
+            self.catalogue.list_models()
+
+    def test_pull_reports_progress_and_refreshes_list(self):
+        from xaelai.jobs import Job
+
+        self.catalogue.list_models()
+        self.client.pull.return_value = iter([
+            {"status": "pulling manifest"},
+            {"status": "downloading", "digest": "sha256:1", "total": 2 * 1024 ** 3, "completed": 1024 ** 3},
+        ])
+        job = Job("Pull mistral", kind="pull")
+        self.assertEqual(self.catalogue.pull("mistral", job), "Model 'mistral' downloaded")
+        self.assertEqual((job.progress, job.message), (0.5, "Downloaded 1.00 GB of 2.00 GB"))
+        self.catalogue.list_models()
+        self.assertEqual(self.client.list.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
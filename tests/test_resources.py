@@ -0,0 +1,81 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from xaelai import resources
+
+
+class TestResourceRegistry(unittest.TestCase):
+
+    def setUp(self):
+        mock.patch.dict(resources._resources, clear=True).start()
+        mock.patch.dict(resources._key_locks, clear=True).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_resource_is_shared(self):
+        factory = mock.Mock(side_effect=lambda: object())
+        first = resources.get_or_create(("thing", 1), factory)
+        self.assertIs(resources.get_or_create(("thing", 1), factory), first)
+        self.assertIsNot(resources.get_or_create(("thing", 2), factory), first)
+        self.assertEqual(factory.call_count, 2)
+
+    def test_failed_factory_is_retried(self):
+        factory = mock.Mock(side_effect=[ConnectionError("down"), "up"])
+        with self.assertRaises(ConnectionError):
+            resources.get_or_create(("thing",), factory)
+        self.assertEqual(resources.get_or_create(("thing",), factory), "up")
+
+    def test_concurrent_callers_share_one_factory_call(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.1)
+            return object()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(resources.get_or_create(("slow",), factory))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_slow_factory_does_not_block_other_keys(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        thread = threading.Thread(target=resources.get_or_create, args=(("slow",), slow))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(5))
+            begin = time.monotonic()
+            self.assertEqual(resources.get_or_create(("fast",), lambda: "fast"), "fast")
+            self.assertLess(time.monotonic() - begin, 1.0)
+            self.assertEqual(resources.resource_stats()["resources"], 1)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(resources.resource_stats()["resources"], 2)
+
+    def test_stats_report_engine_pools(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{Path(tmp) / 'test.db'}"
+            engine = resources.get_engine(url)
+            self.assertIs(resources.get_engine(url), engine)
+            stats = resources.resource_stats()
+            self.assertEqual(stats["resources"], 1)
+            self.assertIn(f"pool {url}", stats)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from phi.document import Document
+from xaelai.retrieval import is_identifier, overlap_rerank, query_terms, reciprocal_rank_fusion
+
+
+def docs(*ids):
+    return [Document(id=i, content=i) for i in ids]
+
+
+class TestRetrieval(unittest.TestCase):
+
+    def test_query_terms_keep_identifiers_whole(self):
+        self.assertEqual(query_terms("Torque for XJ-4000, rev v1.2?"), ["torque", "for", "xj-4000", "rev", "v1.2"])
+        self.assertTrue(is_identifier("xj-4000"))
+        self.assertTrue(is_identifier("m8"))
+        self.assertFalse(is_identifier("torque"))
+
+    def test_documents_found_by_both_retrievers_rank_first(self):
+        fused = reciprocal_rank_fusion([docs("a", "b", "c"), docs("c", "d")])
+        self.assertEqual([d.id for d, _ in fused], ["c", "a", "b", "d"])
+        self.assertAlmostEqual(fused[0][1], 1 / 63 + 1 / 61)
+
+    def test_overlap_rerank_promotes_exact_identifiers(self):
+        scored = [
+            (Document(id="similar", content="Torque specifications for the XJ series"), 0.033),
+            (Document(id="exact", content="XJ-4000 torque: 25 Nm"), 0.032),
+        ]
+        reranked = overlap_rerank("XJ-4000 torque", scored)
+        self.assertEqual([d.id for d, _ in reranked], ["exact", "similar"])
+        self.assertIs(overlap_rerank("", scored), scored)
+
+
+if __name__ == "__main__":
+    unittest.main()
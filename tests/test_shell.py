@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import unittest
+
+from xaelai.tools.shell import OutputBuffer, ShellExecutor, run_command, stream_output_to
+
+
+class TestOutputBuffer(unittest.TestCase):
+
+    def test_keeps_head_and_tail(self):
+        buffer = OutputBuffer(head_bytes=4, tail_bytes=4)
+        for i in range(100):
+            buffer.write(f"{i:02d}\n".encode())
+        self.assertEqual(buffer.total, 300)
+        self.assertEqual(buffer.truncated, 292)
+        self.assertEqual(buffer.text(), "00\n0\n[... 292 bytes omitted ...]\n\n99\n")
+        self.assertLessEqual(len(buffer.tail), 8)
+
+    def test_short_output_is_unchanged(self):
+        buffer = OutputBuffer(head_bytes=4, tail_bytes=4)
+        buffer.write(b"hello")
+        self.assertEqual(buffer.text(), "hello")
+
+
+class TestRunCommand(unittest.TestCase):
+
+    def test_success_and_failure_are_reported_like_before(self):
+        self.assertEqual(run_command("echo hello").to_tool_output(), "hello\n")
+        output = run_command("echo oops >&2; exit 3").to_tool_output()
+        self.assertEqual(output, "Error: Command returned non-zero exit code 3\noops\n")
+
+    def test_runaway_command_is_killed_with_its_children(self):
+        start = time.monotonic()
+        result = run_command("sleep 30 & yes", timeout=0.5, max_output_bytes=1024)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(result.timed_out)
+        self.assertLessEqual(len(result.stdout.text()), 1200)
+        self.assertIn("bytes omitted", result.stdout.text())
+        self.assertTrue(result.to_tool_output().startswith("Error: Command timed out"))
+
+    @unittest.skipUnless(os.name == "posix", "resource limits are POSIX only")
+    def test_cpu_limit(self):
+        result = run_command("while :; do :; done", timeout=10, cpu_seconds=1)
+        self.assertFalse(result.timed_out)
+        self.assertNotEqual(result.returncode, 0)
+
+    @unittest.skipUnless(os.name == "posix", "resource limits are POSIX only")
+    def test_limits_are_set_by_the_shell(self):
+        result = run_command("ulimit -t; ulimit -v", cpu_seconds=7, memory_bytes=512 * 1024 * 1024)
+        self.assertEqual(result.to_tool_output(), "7\n524288\n")
+
+    def test_output_is_streamed(self):
+        chunks = []
+        run_command("echo one; sleep 0.2; echo two >&2", on_output=lambda stream, text: chunks.append((stream, text)))
+        self.assertEqual(chunks, [("stdout", "one\n"), ("stderr", "two\n")])
+
+
+class TestShellExecutor(unittest.TestCase):
+
+    def test_commands_run_concurrently(self):
+        executor = ShellExecutor(max_workers=4, timeout=10)
+        results = []
+        start = time.monotonic()
+        threads = [threading.Thread(target=lambda: results.append(executor.run("sleep 0.5"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 4)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_output_reaches_the_calling_thread(self):
+        executor = ShellExecutor(max_workers=1)
+        seen = []
+        with stream_output_to(lambda stream, text: seen.append((threading.current_thread(), text))):
+            result = executor.run("echo hi")
+        self.assertEqual(result.to_tool_output(), "hi\n")
+        self.assertEqual(seen, [(threading.current_thread(), "hi\n")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from xaelai.streaming import StreamingMarkdown
+
+
+class FakePlaceholder:
+
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+class FakeContainer:
+
+    def __init__(self):
+        self.placeholders = []
+
+    def empty(self):
+        placeholder = FakePlaceholder()
+        self.placeholders.append(placeholder)
+        return placeholder
+
+    def text(self):
+        return "".join(p.renders[-1] for p in self.placeholders if p.renders)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStreamingMarkdown(unittest.TestCase):
+
+    def setUp(self):
+        self.container = FakeContainer()
+        self.clock = FakeClock()
+        self.stream = StreamingMarkdown(self.container, flush_interval=0.05, clock=self.clock)
+
+    def test_deltas_are_batched_by_time(self):
+        for token in ["Hello", " ", "world"]:
+            self.stream.write(token)
+        self.assertEqual(self.stream.renders, 0)
+        self.clock.now = 0.1
+        self.stream.write("!")
+        self.assertEqual(self.stream.renders, 1)
+        self.assertEqual(self.stream.close(), "Hello world!")
+        self.assertEqual(self.container.text(), "Hello world!")
+
+    def test_only_tail_block_is_rerendered(self):
+        response = "First paragraph.\n\nSecond paragraph that keeps going."
+        for i, char in enumerate(response):
+            self.clock.now = i * 0.1
+            self.stream.write(char)
+        self.assertEqual(self.stream.close(), response)
+        self.assertEqual(self.container.text(), response)
+        self.assertEqual(len(self.container.placeholders), 2)
+        self.assertEqual(self.container.placeholders[0].renders[-1], "First paragraph.\n\n")
+        self.assertLess(self.stream.chars_rendered, sum(range(len(response) + 1)))
+
+    def test_code_fences_are_not_split(self):
+        response = "```python\nx = 1\n\ny = 2\n```\n\nDone"
+        for char in response:
+            self.clock.now += 0.1
+            self.stream.write(char)
+        self.stream.close()
+        self.assertEqual(self.container.placeholders[0].renders[-1], "```python\nx = 1\n\ny = 2\n```\n\n")
+        self.assertEqual(self.container.text(), response)
+
+
+if __name__ == "__main__":
+    unittest.main()
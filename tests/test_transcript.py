@@ -0,0 +1,67 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+@unittest.skipUnless(installed("streamlit"), "streamlit is not installed")
+class TestTranscript(unittest.TestCase):
+
+    def setUp(self):
+        from xaelai import transcript
+
+        self.transcript = transcript
+        self.st = types.SimpleNamespace(session_state={})
+        mock.patch.object(transcript, "st", self.st).start()
+        self.converted = mock.patch.object(transcript, "message_markdown", wraps=transcript.message_markdown).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_message_markdown(self):
+        message_markdown = self.transcript.message_markdown
+        self.assertEqual(message_markdown(None), "")
+        self.assertEqual(message_markdown("hello"), "hello")
+        self.assertEqual(message_markdown([{"type": "text", "text": "a"}, "b"]), "a\n\nb")
+        self.assertEqual(message_markdown({"x": 1}), '```json\n{\n  "x": 1\n}\n```')
+
+    def test_cache_hit(self):
+        messages = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+        self.assertEqual(self.transcript._cached_markdown(messages), ["a", "b"])
+        self.assertEqual(self.converted.call_count, 2)
+        self.assertEqual(self.transcript._cached_markdown(messages), ["a", "b"])
+        self.assertEqual(self.converted.call_count, 2)
+
+    def test_append_converts_only_new_messages(self):
+        messages = [{"role": "user", "content": "a"}]
+        self.transcript._cached_markdown(messages)
+        messages.append({"role": "assistant", "content": "b"})
+        self.assertEqual(self.transcript._cached_markdown(messages), ["a", "b"])
+        self.assertEqual(self.converted.call_count, 2)
+
+    def test_shrunk_list_rebuilds(self):
+        messages = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+        self.transcript._cached_markdown(messages)
+        del messages[1:]
+        messages[0] = {"role": "user", "content": "c"}
+        self.assertEqual(self.transcript._cached_markdown(messages), ["c"])
+
+    def test_replaced_list_rebuilds(self):
+        first, second = [{"role": "user", "content": "a"}], [{"role": "user", "content": "b"}]
+        self.transcript._cached_markdown(first)
+        self.assertEqual(self.transcript._cached_markdown(second), ["b"])
+
+    def test_reset(self):
+        messages = [{"role": "user", "content": "a"}]
+        self.transcript._cached_markdown(messages)
+        self.st.session_state["transcript_window"] = 100
+        self.transcript.reset_transcript()
+        self.assertEqual(self.st.session_state, {})
+        self.assertEqual(self.transcript._cached_markdown(messages), ["a"])
+        self.assertEqual(self.converted.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import unittest
+from unittest import mock
+
+from phi.embedder.base import Embedder
+from phi.vectordb.pgvector.index import HNSW, Ivfflat
+from sqlalchemy import create_engine
+
+from xaelai import resources
+from xaelai.vector_store import (
+    ManagedPgVector,
+    embedding_space_collection,
+    embedding_to_list,
+    make_index,
+    partition_collection,
+)
+
+
+class FixedEmbedder(Embedder):
+    dimensions: int = 8
+
+    def get_embedding(self, text):
+        return [1.0] * self.dimensions
+
+
+def make_store(index, dimensions=8, **kwargs):
+    # The engine connects lazily, the database is never reached.
+    engine = create_engine("postgresql+psycopg://ai:ai@localhost:5432/ai")
+    store = ManagedPgVector(
+        collection="docs", embedder=FixedEmbedder(dimensions=dimensions), db_engine=engine, index=index, **kwargs
+    )
+    store.analyze = mock.Mock()
+    store.build_index = mock.Mock()
+    return store
+
+
+class TestManagedPgVector(unittest.TestCase):
+
+    def test_make_index(self):
+        self.assertIsNone(make_index("none"))
+        hnsw = make_index("hnsw", m=32, ef_construction=100, ef_search=80)
+        self.assertEqual((hnsw.m, hnsw.ef_construction, hnsw.ef_search), (32, 100, 80))
+        self.assertFalse(make_index("ivfflat", lists=50).dynamic_lists)
+        self.assertTrue(make_index("IVFFLAT", lists=0).dynamic_lists)
+        with self.assertRaises(ValueError):
+            make_index("annoy")
+
+    def test_index_is_named_after_collection(self):
+        self.assertEqual(make_store(HNSW()).index.name, "docs_hnsw_index")
+        self.assertEqual(make_store(Ivfflat()).index.name, "docs_ivfflat_index")
+
+    def test_ivfflat_lists_follow_collection_size(self):
+        store = make_store(Ivfflat())
+        self.assertEqual(store.ivfflat_lists(500), 1)
+        self.assertEqual(store.ivfflat_lists(250_000), 250)
+        self.assertEqual(store.ivfflat_lists(4_000_000), 2000)
+        self.assertEqual(make_store(Ivfflat(lists=7, dynamic_lists=False)).ivfflat_lists(250_000), 7)
+
+    def test_hnsw_is_built_once(self):
+        store = make_store(HNSW())
+        store.get_count = mock.Mock(return_value=10)
+        store.index_info = mock.Mock(return_value=None)
+        store.after_bulk_load()
+        store.analyze.assert_called_once()
+        store.build_index.assert_called_once_with(10)
+        store.index_info.return_value = {"built_rows": 10}
+        store.get_count.return_value = 10_000
+        store.after_bulk_load()
+        self.assertEqual(store.build_index.call_count, 1)
+
+    def test_ivfflat_is_rebuilt_when_collection_grows(self):
+        store = make_store(Ivfflat())
+        store.index_info = mock.Mock(return_value=None)
+        store.get_count = mock.Mock(return_value=500)
+        store.after_bulk_load()
+        store.build_index.assert_not_called()
+        store.get_count.return_value = 2000
+        store.after_bulk_load()
+        store.build_index.assert_called_once_with(2000)
+        store.index_info.return_value = {"built_rows": 2000}
+        store.get_count.return_value = 3000
+        store.after_bulk_load()
+        self.assertEqual(store.build_index.call_count, 1)
+        store.get_count.return_value = 4000
+        store.after_bulk_load()
+        store.build_index.assert_called_with(4000)
+
+    def test_too_many_dimensions_are_not_indexed(self):
+        store = make_store(HNSW(), dimensions=4096)
+        store.get_count = mock.Mock(return_value=10)
+        store.index_info = mock.Mock(return_value=None)
+        store.after_bulk_load()
+        store.analyze.assert_called_once()
+        store.build_index.assert_not_called()
+
+    def test_partition_collections(self):
+        self.assertEqual(partition_collection("text_documents", "alice"), "text_documents_alice")
+        odd = partition_collection("text_documents", "Alice Smith")
+        self.assertRegex(odd, r"^text_documents_alice_smith_[0-9a-f]{8}$")
+        self.assertNotEqual(odd, partition_collection("text_documents", "alice_smith"))
+        self.assertNotEqual(odd, partition_collection("text_documents", "alice-smith"))
+        long_name = embedding_space_collection(partition_collection("text_documents", "x" * 200), "nomic-embed-text", 768)
+        self.assertLessEqual(len(long_name + "_ivfflat_index"), 63)
+        self.assertRegex(partition_collection("text_documents", "ß"), r"^text_documents_[0-9a-f]{8}$")
+
+    def test_embedding_spaces_get_their_own_collection(self):
+        names = {
+            embedding_space_collection("text_documents_alice", model, dimensions, storage)
+            for model, dimensions, storage in [("nomic", 768, "vector"), ("nomic", 768, "halfvec"), ("mxbai", 1024, "vector")]
+        }
+        self.assertEqual(len(names), 3)
+        self.assertEqual(embedding_space_collection("t", "nomic", 768), embedding_space_collection("t", "nomic", 768))
+
+    def test_storage_and_quantization(self):
+        self.assertEqual(make_store(HNSW()).index_target(), "embedding vector_cosine_ops")
+        halfvec = make_store(HNSW(), dimensions=3000, storage="halfvec")
+        self.assertEqual(str(halfvec.table.c.embedding.type), "HALFVEC(3000)")
+        self.assertEqual(halfvec.index_target(), "embedding halfvec_cosine_ops")
+        self.assertTrue(halfvec.index_supported())
+        binary = make_store(HNSW(), dimensions=4096, quantization="binary")
+        self.assertEqual(binary.index_target(), "(binary_quantize(embedding)::bit(4096)) bit_hamming_ops")
+        self.assertTrue(binary.index_supported())
+        with self.assertRaises(ValueError):
+            make_store(HNSW(), storage="float8")
+
+    def test_binary_quantized_search_reranks_candidates(self):
+        store = make_store(HNSW(), dimensions=3, quantization="binary", rerank_factor=4)
+        session = mock.MagicMock()
+        store.Session = mock.Mock(return_value=session)
+        sess = session.__enter__.return_value
+        sess.execute.return_value.fetchall.return_value = []
+        store.search_by_embedding([1.0, 0.0, 0.0], limit=5)
+        set_ef, query = [c.args[0] for c in sess.execute.call_args_list]
+        self.assertEqual(str(set_ef), "SET LOCAL hnsw.ef_search = 40")
+        compiled = str(query.compile(dialect=store.db_engine.dialect, compile_kwargs={"literal_binds": False}))
+        self.assertIn("<~> binary_quantize(", compiled)
+        self.assertIn("ORDER BY anon_1.embedding <=>", compiled)
+        self.assertEqual(query.compile().params["param_1"], 20)
+
+    def test_keyword_search_matches_the_text_index(self):
+        store = make_store(HNSW(), search_mode="hybrid")
+        session = mock.MagicMock()
+        store.Session = mock.Mock(return_value=session)
+        sess = session.__enter__.return_value
+        sess.execute.return_value.fetchall.return_value = []
+        store.keyword_search("XJ-4000 torque", limit=3)
+        query = sess.execute.call_args.args[0].compile(dialect=store.db_engine.dialect)
+        self.assertIn("to_tsvector('english'::regconfig, ai.docs.content) @@ websearch_to_tsquery('english'::regconfig", str(query))
+        self.assertEqual(query.params["terms"], "xj-4000 OR torque")
+        with self.assertRaises(ValueError):
+            make_store(HNSW(), text_search_config="english'; DROP TABLE x; --")
+
+    def test_hybrid_search_fuses_and_reranks(self):
+        from phi.document import Document
+
+        store = make_store(HNSW(), search_mode="hybrid", reranker="overlap", hybrid_candidates=10)
+        vector_hits = [Document(id="similar", content="XJ series torque"), Document(id="other", content="unrelated")]
+        keyword_hits = [Document(id="exact", content="XJ-4000 torque 25 Nm"), Document(id="similar", content="XJ series torque")]
+        store.search_by_embedding = mock.Mock(return_value=vector_hits)
+        store.keyword_search = mock.Mock(return_value=keyword_hits)
+        results = store.search("XJ-4000 torque", limit=2)
+        self.assertEqual([d.id for d in results], ["exact", "similar"])
+        self.assertEqual(store.search_by_embedding.call_args.args[1], 10)
+        store.keyword_search.assert_called_once_with("XJ-4000 torque", 10, None)
+
+    def test_embedding_to_list(self):
+        from pgvector.utils import HalfVector
+        import numpy
+
+        self.assertEqual(embedding_to_list(numpy.array([1.0, 2.0], dtype=numpy.float32)), [1.0, 2.0])
+        self.assertEqual(embedding_to_list(HalfVector([1.0, 2.0])), [1.0, 2.0])
+        self.assertIsNone(embedding_to_list(None))
+
+
+class TestEmbeddingDimensions(unittest.TestCase):
+
+    def test_dimensions_are_probed_once(self):
+        client = mock.Mock()
+        client.embed.return_value = {"embeddings": [[0.0] * 768]}
+        with mock.patch.object(resources, "Client", return_value=client) as client_class, \
+                mock.patch.dict(resources._resources, clear=True):
+            self.assertEqual(resources.get_embedding_dimensions("nomic-embed-text", "ollama", timeout=5), 768)
+            self.assertEqual(resources.get_embedding_dimensions("nomic-embed-text", "ollama"), 768)
+        self.assertEqual(client.embed.call_count, 1)
+        client_class.assert_called_once_with(host="ollama", timeout=5)
+
+    def test_failed_probe_raises_and_is_retried(self):
+        client = mock.Mock()
+        client.embed.side_effect = [ConnectionError("ollama down"), {"embeddings": [[0.0] * 1024]}]
+        with mock.patch.object(resources, "Client", return_value=client), \
+                mock.patch.dict(resources._resources, clear=True):
+            with self.assertRaisesRegex(RuntimeError, "EMBEDDING_DIMENSIONS"):
+                resources.get_embedding_dimensions("mxbai-embed-large", "ollama")
+            self.assertEqual(resources.get_embedding_dimensions("mxbai-embed-large", "ollama"), 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
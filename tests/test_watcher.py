@@ -0,0 +1,142 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from phi.embedder.base import Embedder
+
+from xaelai import ingestion, watcher
+from xaelai.ingestion import IngestionPipeline
+from xaelai.jobs import Job
+from xaelai.manifest import ManifestEntry
+from xaelai.tools.file_index import FileIndex
+from xaelai.watcher import DataDirectoryWatcher, Throttle
+
+
+class CountingEmbedder(Embedder):
+    dimensions: int = 3
+
+    def get_embedding(self, text):
+        return [float(len(text)), 0.0, 1.0]
+
+
+class FakeManifest:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def put(self, entry):
+        self.entries[entry.name] = entry
+
+    def content_hashes(self, prefix=""):
+        return {name: entry.content_hash for name, entry in self.entries.items() if name.startswith(prefix)}
+
+    def delete(self, name):
+        self.entries.pop(name, None)
+
+
+class TestDataDirectoryWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / "notes.txt").write_text("Meeting notes\n" * 20)
+        (self.root / "docs").mkdir()
+        (self.root / "docs" / "manual.md").write_text("# Manual\nPress the red button.\n")
+        (self.root / "image.bin").write_bytes(b"\0\1\2")
+        vector_db = mock.Mock()
+        vector_db.embedder = CountingEmbedder()
+        vector_db.collection = "text_documents"
+        vector_db.schema = "ai"
+        self.pipeline = IngestionPipeline(vector_db)
+        self.pipeline.manifest = FakeManifest()
+        self.pipeline.manifest.put(ManifestEntry("file:bob/other.txt", "hash", {}))
+        self.pipeline.existing_embeddings = mock.Mock(return_value={})
+        self.pipeline.delete_chunks = mock.Mock()
+        self.watcher = DataDirectoryWatcher(
+            self.pipeline, FileIndex(self.root), max_bytes_per_second=0, prefix="file:alice/"
+        )
+        patcher = mock.patch.object(ingestion, "bulk_upsert")
+        self.bulk_upsert = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_changes_are_ingested(self):
+        message = self.watcher.scan(Job("scan"))
+        self.assertIn("2 files indexed, 0 removed, 0 unchanged", message)
+        self.assertEqual(
+            sorted(self.pipeline.manifest.content_hashes("file:alice/")), ["file:alice/docs/manual.md", "file:alice/notes.txt"]
+        )
+        upserts = self.bulk_upsert.call_count
+
+        message = self.watcher.scan(Job("scan"))
+        self.assertIn("0 files indexed, 0 removed, 2 unchanged", message)
+        self.assertEqual(self.bulk_upsert.call_count, upserts)
+
+        (self.root / "docs" / "manual.md").write_text("# Manual\nPress the green button.\n")
+        (self.root / "notes.txt").unlink()
+        message = self.watcher.scan(Job("scan"))
+        self.assertIn("1 files indexed, 1 removed, 0 unchanged", message)
+        self.assertGreater(self.bulk_upsert.call_count, upserts)
+        self.assertNotIn("file:alice/notes.txt", self.pipeline.manifest.entries)
+        # Documents of other users and other sources are left alone.
+        self.assertIn("file:bob/other.txt", self.pipeline.manifest.entries)
+
+    def test_large_files_are_skipped(self):
+        self.watcher.max_file_bytes = 100
+        self.assertIn("1 files indexed", self.watcher.scan(Job("scan")))
+
+    def test_hashing_and_ingestion_are_throttled(self):
+        with mock.patch.object(watcher.Throttle, "wait") as wait:
+            self.watcher.scan(Job("scan"))
+        # Three files hashed by the index refresh, two of them ingested.
+        self.assertEqual(len(wait.call_args_list), 5)
+
+    def test_throttle_is_shared_by_watchers(self):
+        throttle = Throttle(1000)
+        other = DataDirectoryWatcher(self.pipeline, FileIndex(self.root), throttle=throttle)
+        self.watcher.throttle = throttle
+        with mock.patch.object(watcher.time, "sleep") as sleep:
+            self.watcher.throttle.wait(500)
+            other.throttle.wait(500)
+        self.assertAlmostEqual(sleep.call_args.args[0], 1.0, delta=0.1)
+        with mock.patch.dict(watcher.__dict__, _throttle=None):
+            self.assertIs(watcher.get_throttle(1000), watcher.get_throttle(5))
+
+    def test_watcher_is_replaced_when_the_collection_changes(self):
+        def create(collection):
+            created = mock.Mock()
+            created.pipeline.vector_db.collection = collection
+            return lambda: created
+
+        with mock.patch.dict(watcher._watchers, clear=True):
+            first = watcher.get_watcher("/data/alice", "e1", create("e1"))
+            self.assertIs(watcher.get_watcher("/data/alice", "e1", create("e1")), first)
+            second = watcher.get_watcher("/data/alice", "e2", create("e2"))
+            self.assertIsNot(second, first)
+            first.stop.assert_called_once_with()
+            second.stop.assert_not_called()
+
+    def test_throttle(self):
+        with mock.patch.object(watcher.time, "sleep") as sleep:
+            throttle = Throttle(1000)
+            throttle.wait(500)
+            throttle.wait(500)
+        self.assertAlmostEqual(sleep.call_args.args[0], 1.0, delta=0.1)
+        with mock.patch.object(watcher.time, "sleep") as sleep:
+            Throttle(0).wait(10 ** 9)
+        sleep.assert_not_called()
+        # Idle time is not saved up for bursts.
+        throttle = Throttle(1000)
+        throttle.available_at -= 60
+        with mock.patch.object(watcher.time, "sleep") as sleep:
+            throttle.wait(500)
+        self.assertAlmostEqual(sleep.call_args.args[0], 0.5, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
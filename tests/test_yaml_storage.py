@@ -0,0 +1,183 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from phi.assistant.run import AssistantRun
+from xaelai.storage.cache import RunCache
+from xaelai.storage.yaml_storage import YamlStorage, JsonStorage, MsgpackStorage
+from xaelai.storage.write_behind import write_behind_queue
+
+
+def make_run(run_id: str, run_name: str = "chat", messages: int = 2) -> AssistantRun:
+    chat_history = [{"role": "user", "content": f"message {i}"} for i in range(messages)]
+    return AssistantRun(run_id=run_id, run_name=run_name, memory={"chat_history": chat_history})
+
+
+class TestYamlStorageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = YamlStorage(storage_dir=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_upsert_updates_index(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00", messages=3))
+        self.storage.upsert(make_run("2024-01-02T10:00:00", run_name="second"))
+        summaries = self.storage.list_run_summaries()
+        self.assertEqual([s.run_id for s in summaries], ["2024-01-02T10:00:00", "2024-01-01T10:00:00"])
+        self.assertEqual(summaries[0].run_name, "second")
+        self.assertEqual(summaries[1].message_count, 3)
+
+    def test_unchanged_runs_are_not_deserialized(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00"))
+        with mock.patch.object(self.storage, "deserialize", wraps=self.storage.deserialize) as deserialize:
+            self.storage.list_run_summaries()
+            YamlStorage(storage_dir=self.tmp_dir.name).list_run_summaries()
+            deserialize.assert_not_called()
+
+    def test_external_changes_are_reconciled(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00"))
+        other = YamlStorage(storage_dir=self.tmp_dir.name)
+        other.write("2024-01-01T10:00:00", make_run("2024-01-01T10:00:00", run_name="renamed", messages=5).__dict__)
+        Path(self.tmp_dir.name, "2024-01-03T10:00:00.yaml").touch()
+        summaries = {s.run_id: s for s in self.storage.list_run_summaries()}
+        self.assertEqual(summaries["2024-01-01T10:00:00"].run_name, "renamed")
+        self.assertEqual(summaries["2024-01-01T10:00:00"].message_count, 5)
+        self.assertIn("2024-01-03T10:00:00", summaries)
+
+    def test_delete_removes_index_entry(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00"))
+        self.storage.delete("2024-01-01T10:00:00")
+        self.assertEqual(self.storage.list_run_summaries(), [])
+        self.assertEqual(self.storage.get_all_run_ids(), [])
+
+
+    def test_failed_index_write_keeps_the_previous_index(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00"))
+        before = self.storage.index_path.read_text()
+        with mock.patch("xaelai.storage.yaml_storage.json.dump", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.upsert(make_run("2024-01-02T10:00:00"))
+        self.assertEqual(self.storage.index_path.read_text(), before)
+        self.assertEqual(list(Path(self.tmp_dir.name).glob("*.tmp")), [])
+
+    def test_unchanged_index_is_not_parsed_again(self):
+        self.storage.upsert(make_run("2024-01-01T10:00:00"))
+        with mock.patch("xaelai.storage.yaml_storage.json.load") as load:
+            self.storage.upsert(make_run("2024-01-02T10:00:00"))
+            self.assertEqual(len(self.storage.list_run_summaries()), 2)
+        load.assert_not_called()
+
+
+class TestStorageCodecs(unittest.TestCase):
+
+    def round_trip(self, storage_class):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = storage_class(storage_dir=tmp_dir)
+            run = make_run("2024-01-01T10:00:00", messages=3)
+            run.created_at = datetime(2024, 1, 1, 10, 0)
+            storage.upsert(run)
+            self.assertEqual(storage_class(storage_dir=tmp_dir).read(run.run_id), run)
+
+    def test_yaml_round_trip(self):
+        self.round_trip(YamlStorage)
+
+    def test_json_round_trip(self):
+        self.round_trip(JsonStorage)
+
+    def test_msgpack_round_trip(self):
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            self.skipTest("msgpack not installed")
+        self.round_trip(MsgpackStorage)
+
+    def test_empty_run_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = JsonStorage(storage_dir=tmp_dir)
+            storage.create("empty")
+            self.assertIsNone(storage.read("empty"))
+
+
+class TestRunCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = RunCache()
+        self.storage = YamlStorage(storage_dir=self.tmp_dir.name)
+        self.storage.cache = self.cache
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reads_are_served_from_cache(self):
+        self.storage.upsert(make_run("run"))
+        with mock.patch.object(self.storage, "deserialize") as deserialize:
+            first = self.storage.read("run")
+            second = self.storage.read("run")
+            deserialize.assert_not_called()
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        first.memory["chat_history"].clear()
+        self.assertEqual(len(second.memory["chat_history"]), 2)
+
+    def test_changed_file_is_reparsed(self):
+        self.storage.upsert(make_run("run"))
+        self.storage.write("run", make_run("run", run_name="renamed", messages=4).__dict__)
+        self.assertEqual(self.storage.read("run").run_name, "renamed")
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_delete_invalidates(self):
+        self.storage.upsert(make_run("run"))
+        self.storage.delete("run")
+        self.assertIsNone(self.storage.read("run"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        self.cache.max_bytes = 100
+        self.cache.put("a", make_run("a"), 1.0, 40)
+        self.cache.put("b", make_run("b"), 1.0, 40)
+        self.cache.get("a", 1.0, 40)
+        self.cache.put("c", make_run("c"), 1.0, 40)
+        self.assertIsNotNone(self.cache.get("a", 1.0, 40))
+        self.assertIsNone(self.cache.get("b", 1.0, 40))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = YamlStorage(storage_dir=self.tmp_dir.name)
+        self.storage.write_behind = True
+
+    def tearDown(self):
+        write_behind_queue.flush()
+        self.tmp_dir.cleanup()
+
+    def test_upserts_are_coalesced_and_flushed(self):
+        with mock.patch.object(self.storage, "_write_data", wraps=self.storage._write_data) as write_data:
+            # Holding the queue lock keeps the worker from picking up the run between upserts.
+            with write_behind_queue._condition:
+                for messages in range(1, 6):
+                    self.storage.upsert(make_run("run", messages=messages))
+                self.assertEqual(len(self.storage.read("run").memory["chat_history"]), 5)
+            self.assertTrue(write_behind_queue.flush(timeout=5))
+            self.assertEqual(write_data.call_count, 1)
+        self.assertEqual(len(YamlStorage(storage_dir=self.tmp_dir.name).read("run").memory["chat_history"]), 5)
+
+    def test_failed_write_keeps_previous_file(self):
+        self.storage.write_behind = False
+        self.storage.upsert(make_run("run", messages=2))
+        with mock.patch.object(self.storage, "serialize", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                self.storage.upsert(make_run("run", messages=3))
+        self.assertEqual(len(YamlStorage(storage_dir=self.tmp_dir.name).read("run").memory["chat_history"]), 2)
+        self.assertEqual([p.name for p in Path(self.tmp_dir.name).iterdir() if p.name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,27 +1,33 @@
+import hashlib
 import os
-import json
-import shutil
-from typing import List
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 import streamlit as st
 from phi.assistant import Assistant
-from phi.document import Document
-from phi.document.reader.pdf import PDFReader
-from phi.document.reader.website import WebsiteReader
 from phi.utils.log import logger
 
 from settings import Settings
-from storage.yaml_storage import YamlStorage
 from assistant import get_rag_assistant  # type: ignore
 from file_manager import file_manager_ui
+from streaming import StreamingMarkdown
+from llm import format_timings, sum_timings
+from tools.shell import stream_output_to
+from transcript import render_transcript, reset_transcript
+
+if TYPE_CHECKING:
+    from ingestion import IngestionPipeline
 
 settings = Settings()
 
-from ollama import Client
+from model_catalogue import get_model_catalogue
 
 ollama_host = os.getenv("OLLAMA_HOST", "ollama")
-ollama = Client(host=ollama_host)
+model_catalogue = get_model_catalogue(ollama_host, ttl=settings.model_catalogue_ttl)
+ollama = model_catalogue.client
+job_manager = settings.get_job_manager()
 
 st.set_page_config(
     page_title="Xael AI",
@@ -34,6 +40,7 @@ st.set_page_config(
 def restart_assistant():
     st.session_state["rag_assistant"] = None
     st.session_state["rag_assistant_run_id"] = None
+    reset_transcript()
     if "url_scrape_key" in st.session_state:
         st.session_state["url_scrape_key"] += 1
     if "file_uploader_key" in st.session_state:
@@ -67,13 +74,20 @@ def main() -> None:
         embeddings_model = st.session_state.get("embeddings_model", settings.default_embeddings_model)
 
         # Initialize or retrieve the assistant
-        rag_assistant = initialize_assistant(llm_model, embeddings_model)
+        try:
+            rag_assistant = initialize_assistant(llm_model, embeddings_model)
+        except RuntimeError as e:
+            # E.g. the embedding model could not be probed; retried on the next rerun.
+            st.error(str(e))
+            st.stop()
 
         # Create assistant run and handle chat messages
         handle_chat_interaction(rag_assistant)
 
         # Load and manage knowledge base
         manage_knowledge_base(rag_assistant)
+        with st.sidebar:
+            show_job_progress()
 
         # Handle assistant runs
         handle_assistant_runs(rag_assistant, llm_model, embeddings_model)
@@ -95,14 +109,15 @@ def main() -> None:
 
 def select_llm_model() -> str:
     """Select the LLM model from available options."""
-    models = [m["name"] for m in ollama.list()['models']]
+    models = model_catalogue.list_models()
     default_llm_model = settings.default_llm_model
     if default_llm_model not in models:
-        st.warning(f"Default model '{default_llm_model}' not found. Downloading...")
-        download_model(default_llm_model)
-        models = [m["name"] for m in ollama.list()['models']]  # Refresh the model list
+        download_default_model(default_llm_model, "model")
+        if not models:
+            st.stop()
 
-    llm_model = st.selectbox("Select Model", options=models, index=models.index(default_llm_model))
+    index = models.index(default_llm_model) if default_llm_model in models else 0
+    llm_model = st.selectbox("Select Model", options=models, index=index)
     if "llm_model" not in st.session_state or st.session_state["llm_model"] != llm_model:
         st.session_state["llm_model"] = llm_model
         restart_assistant()
@@ -119,50 +134,55 @@ def manage_models(llm_model: str) -> None:
             delete_model(llm_model)
 
 
-download_progress = {}
+def track_job(job) -> None:
+    """Show a background job's progress in this session."""
+    job_ids = st.session_state.setdefault("job_ids", [])
+    if job.id not in job_ids:
+        job_ids.append(job.id)
+
+
+def pull_job_key(model_name: str) -> tuple:
+    return ("pull", ollama_host, model_name)
+
 
 def download_model(model_name: str) -> None:
-    """Download a model by name with resumable progress."""
+    """Pull a model in the background. Sessions asking for the same model share one download."""
     if model_name:
-        try:
-            if model_name not in download_progress:
-                download_progress[model_name] = 0
-
-            with st.spinner(f"Downloading model '{model_name}'..."):
-                progress_bar = st.progress(0)
-                current_digest = ''
-                progress_message = st.empty()
-                total = 0
-
-                for progress in ollama.pull(model_name, stream=True):
-                    digest = progress.get('digest', '')
-                    if digest != current_digest:
-                        current_digest = digest
-                        total = progress.get('total', 0)
-
-                    if not digest:
-                        st.write(progress.get('status'))
-                        continue
-
-                    completed = progress.get('completed', 0)
-                    if total > 0:
-                        progress_bar.progress(completed / total)
-                        completed_gb = completed / (1024 ** 3)
-                        total_gb = total / (1024 ** 3)
-                        progress_message.write(f"Downloaded {completed_gb:.2f} GB of {total_gb:.2f} GB ({completed / total:.2%})")
-
-            st.success(f"Model '{model_name}' downloaded successfully.")
-            del download_progress[model_name]
-        except Exception as e:
-            st.error(f"Failed to download model: {e}")
+        job = job_manager.submit(
+            "pull", f"Pull {model_name}", lambda job: model_catalogue.pull(model_name, job), key=pull_job_key(model_name)
+        )
+        track_job(job)
+        st.info(f"Downloading model '{model_name}' in the background.")
     else:
         st.warning("Please enter a model name to download.")
 
 
+def download_default_model(model_name: str, label: str) -> None:
+    """
+    Pull a missing default model, once per process.
+
+    Runs on every rerun while the model is missing, so a pull that already finished, e.g.
+    failed for a misspelled name or an unreachable Ollama, is not submitted again: retrying
+    is left to the Download Model button.
+    """
+    job = job_manager.last_job(pull_job_key(model_name))
+    if job is None:
+        st.warning(f"Default {label} '{model_name}' not found. Downloading in the background...")
+        download_model(model_name)
+    elif job.status == "failed":
+        st.error(f"Downloading default {label} '{model_name}' failed: {job.message}. Use Download Model to retry.")
+    elif job.finished:
+        st.warning(f"Default {label} '{model_name}' was downloaded but is not listed by Ollama.")
+    else:
+        track_job(job)
+        st.info(f"Downloading default {label} '{model_name}' in the background.")
+
+
 def delete_model(model_name: str) -> None:
     """Delete a model by name."""
     try:
         ollama.delete(model_name)
+        model_catalogue.invalidate()
         st.success(f"Model '{model_name}' deleted successfully.")
     except Exception as e:
         st.error(f"Failed to delete model: {e}")
@@ -170,14 +190,15 @@ def delete_model(model_name: str) -> None:
 
 def select_embeddings_model() -> str:
     """Select the embeddings model from available options."""
-    models = [m["name"] for m in ollama.list()['models']]
+    models = model_catalogue.list_models()
     default_embeddings_model = settings.default_embeddings_model
     if default_embeddings_model not in models:
-        st.warning(f"Default embeddings model '{default_embeddings_model}' not found. Downloading...")
-        download_model(default_embeddings_model)
-        models = [m["name"] for m in ollama.list()['models']]  # Refresh the model list
+        download_default_model(default_embeddings_model, "embeddings model")
+        if not models:
+            st.stop()
 
-    embeddings_model = st.selectbox("Select Embeddings Model", options=models, index=models.index(default_embeddings_model))
+    index = models.index(default_embeddings_model) if default_embeddings_model in models else 0
+    embeddings_model = st.selectbox("Select Embeddings Model", options=models, index=index)
     if "embeddings_model" not in st.session_state or st.session_state["embeddings_model"] != embeddings_model:
         st.session_state["embeddings_model"] = embeddings_model
         restart_assistant()
@@ -205,10 +226,8 @@ def handle_chat_interaction(rag_assistant: Assistant) -> None:
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
 
-    # Display existing messages
-    for message in st.session_state["messages"]:
-        with st.chat_message(message["role"]):
-            st.write(message["content"])
+    # Display the most recent messages
+    render_transcript(st.session_state["messages"], page_size=settings.transcript_page_size)
 
     # Input for new message
     if prompt := st.chat_input("Type your message here..."):
@@ -219,16 +238,42 @@ def handle_chat_interaction(rag_assistant: Assistant) -> None:
 
         # Get response from assistant
         with st.chat_message("assistant"):
-            response = ""
-            resp_container = st.empty()
-            for delta in rag_assistant.run(prompt):
-                response += delta  # type: ignore
-                resp_container.markdown(response)
+            shell_output = st.container()
+            stream = StreamingMarkdown(st.container(), flush_interval=settings.stream_flush_interval_ms / 1000)
+            requests_before = len(rag_assistant.llm.metrics.get("ollama_timings", []))
+            with show_shell_output(shell_output):
+                for delta in rag_assistant.run(prompt):
+                    stream.write(delta)  # type: ignore
+            response = stream.close()
+            logger.debug(f"Streamed {len(response)} chars in {stream.renders} renders ({stream.chars_rendered} chars sent)")
+            # Prompt eval time shows whether Ollama reused its cached prompt prefix.
+            turn_timings = sum_timings(rag_assistant.llm.metrics.get("ollama_timings", [])[requests_before:])
+            if turn_timings:
+                st.caption(format_timings(turn_timings))
             # Add assistant response to session state
             st.session_state["messages"].append({"role": "assistant", "content": response})
 
 
 
+@contextmanager
+def show_shell_output(container):
+    """Show the output of shell tool calls in container while they run."""
+    placeholder = container.empty()
+    state = {"text": "", "rendered_at": 0.0}
+
+    def on_output(stream: str, text: str) -> None:
+        state["text"] = (state["text"] + text)[-4000:]
+        now = time.monotonic()
+        if now - state["rendered_at"] >= settings.stream_flush_interval_ms / 1000:
+            placeholder.code(state["text"])
+            state["rendered_at"] = now
+
+    with stream_output_to(on_output):
+        yield
+    # The tool result is part of the answer, the live view is no longer needed.
+    placeholder.empty()
+
+
 def manage_knowledge_base(rag_assistant: Assistant) -> None:
     """Manage the knowledge base by adding URLs and PDFs."""
     if rag_assistant.knowledge_base:
@@ -237,10 +282,23 @@ def manage_knowledge_base(rag_assistant: Assistant) -> None:
 
     if rag_assistant.knowledge_base and rag_assistant.knowledge_base.vector_db:
         if st.sidebar.button("Clear Knowledge Base"):
+            from manifest import DocumentManifest
             rag_assistant.knowledge_base.vector_db.clear()
+            DocumentManifest(rag_assistant.knowledge_base.vector_db).clear()
             st.sidebar.success("Knowledge base cleared")
 
 
+def get_ingestion_pipeline(rag_assistant: Assistant) -> "IngestionPipeline":
+    """Create an ingestion pipeline for the assistant's knowledge base."""
+    # Imported on first use: PDF parsing and crawling dependencies are slow to load.
+    from ingestion import IngestionPipeline
+    return IngestionPipeline(
+        rag_assistant.knowledge_base.vector_db,
+        embed_batch_size=settings.embed_batch_size,
+        embed_concurrency=settings.embed_concurrency,
+    )
+
+
 def add_urls_to_knowledge_base(rag_assistant: Assistant) -> None:
     """Add URLs to the knowledge base."""
     if "url_scrape_key" not in st.session_state:
@@ -248,16 +306,9 @@ def add_urls_to_knowledge_base(rag_assistant: Assistant) -> None:
 
     input_url = st.sidebar.text_input("Add URL to Knowledge Base", type="default", key=st.session_state["url_scrape_key"])
     if st.sidebar.button("Add URL") and input_url:
-        alert = st.sidebar.info("Processing URLs...", icon="ℹ️")
         if f"{input_url}_scraped" not in st.session_state:
-            scraper = WebsiteReader(max_links=2, max_depth=1)
-            web_documents: List[Document] = scraper.read(input_url)
-            if web_documents:
-                rag_assistant.knowledge_base.load_documents(web_documents, upsert=True)
-            else:
-                st.sidebar.error("Could not read website")
-            st.session_state[f"{input_url}_uploaded"] = True
-        alert.empty()
+            track_job(get_ingestion_pipeline(rag_assistant).submit_crawl(settings.get_crawler(), input_url))
+            st.session_state[f"{input_url}_scraped"] = True
 
 
 def add_pdfs_to_knowledge_base(rag_assistant: Assistant) -> None:
@@ -265,19 +316,36 @@ def add_pdfs_to_knowledge_base(rag_assistant: Assistant) -> None:
     if "file_uploader_key" not in st.session_state:
         st.session_state["file_uploader_key"] = 100
 
-    uploaded_file = st.sidebar.file_uploader("Add a PDF :page_facing_up:", type="pdf", key=st.session_state["file_uploader_key"])
-    if uploaded_file:
-        alert = st.sidebar.info("Processing PDF...", icon="🧠")
+    uploaded_files = st.sidebar.file_uploader(
+        "Add PDFs :page_facing_up:", type="pdf", accept_multiple_files=True, key=st.session_state["file_uploader_key"]
+    )
+    for uploaded_file in uploaded_files or []:
         rag_name = uploaded_file.name.split(".")[0]
-        if f"{rag_name}_uploaded" not in st.session_state:
-            reader = PDFReader()
-            rag_documents: List[Document] = reader.read(uploaded_file)
-            if rag_documents:
-                rag_assistant.knowledge_base.load_documents(rag_documents, upsert=True)
-            else:
-                st.sidebar.error("Could not read PDF")
-            st.session_state[f"{rag_name}_uploaded"] = True
-        alert.empty()
+        data = uploaded_file.getvalue()
+        # Keyed on the content, so a changed PDF uploaded under the same name is synced again.
+        uploaded_key = f"{rag_name}_uploaded_{hashlib.sha256(data).hexdigest()}"
+        if uploaded_key not in st.session_state:
+            track_job(get_ingestion_pipeline(rag_assistant).submit_pdf(data, rag_name))
+            st.session_state[uploaded_key] = True
+
+
+@st.fragment(run_every=1)
+def show_job_progress() -> None:
+    """Show progress of this session's background jobs and of all model pulls, refreshing only this fragment."""
+    job_ids = st.session_state.get("job_ids", [])
+    jobs = [job for job in map(job_manager.get, job_ids) if job is not None]
+    jobs += [job for job in job_manager.jobs(kind="pull", active=True) if job.id not in job_ids]
+    for job in jobs:
+        if job.status == "failed":
+            st.error(f"{job.name}: {job.message}")
+        elif job.status == "done":
+            st.success(f"{job.name}: {job.message}")
+        else:
+            st.progress(job.progress, text=f"{job.name}: {job.message or job.status}")
+    # Keep finished jobs visible for a little while, then drop them.
+    st.session_state["job_ids"] = [
+        job.id for job in jobs if job.id in job_ids and (not job.finished or time.time() - job.finished_at < 10)
+    ]
 
 
 def display_previous_sessions() -> None:
@@ -287,19 +355,17 @@ def display_previous_sessions() -> None:
     if not user_id:
         st.sidebar.error("User ID is missing. Please ensure you are properly authenticated.")
         raise ValueError("User ID is missing. Please ensure you are properly authenticated.")
-    user_data_dir = settings.get_user_data_dir(user_id) / "chat_history"
-    storage = YamlStorage(storage_dir=user_data_dir)
-    session_ids = storage.get_all_run_ids()
-    session_details = [(session_id, storage.read(session_id)) for session_id in session_ids]
+    storage = settings.get_chat_storage(user_id)
+    summaries = storage.list_run_summaries()
 
-    if session_ids:
+    if summaries:
         session_options = [
-            f"{session.run_name} - {session.run_id.split('T')[0]}" if session else session_id
-            for session_id, session in session_details
+            f"{summary.run_name} - {summary.run_id.split('T')[0]}" if summary.run_name else summary.run_id
+            for summary in summaries
         ]
         selected_index = st.sidebar.selectbox("Restore Session", options=range(len(session_options)), format_func=lambda i: session_options[i])
-        selected_session = session_ids[selected_index]
-        selected_session_data = session_details[selected_index][1]
+        selected_session = summaries[selected_index].run_id
+        selected_session_data = storage.read(selected_session)
 
         if selected_session_data:
             new_run_name = st.sidebar.text_input("Update Run Name", value=selected_session_data.run_name)
@@ -311,7 +377,8 @@ def display_previous_sessions() -> None:
             if st.sidebar.button("Restore"):
                 st.session_state["rag_assistant_run_id"] = selected_session
                 st.session_state["rag_assistant"] = None
-                st.session_state["messages"] = getattr(selected_session_data, "messages", [])
+                st.session_state["messages"] = (selected_session_data.memory or {}).get("chat_history", [])
+                reset_transcript()
                 st.rerun()
         else:
             st.sidebar.warning("Selected session data is not available.")
@@ -1,21 +1,14 @@
 import os
+import hashlib
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 from phi.assistant import Assistant
 from phi.knowledge import AssistantKnowledge
-from phi.llm.ollama import Ollama
-from phi.embedder.ollama import OllamaEmbedder
-from phi.tools.duckduckgo import DuckDuckGo
-from phi.vectordb.pgvector import PgVector2
-from storage.yaml_storage import YamlStorage
 from settings import Settings
-from phi.tools.website import WebsiteTools
-from phi.tools.arxiv_toolkit import ArxivToolkit
+from resources import get_embedder, get_llm, get_vector_db
+from llm import parse_keep_alive
 from phi.knowledge.text import TextKnowledgeBase
-from phi.embedder.ollama import OllamaEmbedder
-
-db_url = "postgresql+psycopg://ai:ai@pgvector:5432/ai"
 
 ollama_host = os.getenv("OLLAMA_HOST", "ollama")
 
@@ -28,35 +21,66 @@ def get_rag_assistant(
     user_id: Optional[str] = None,
     run_id: Optional[str] = None,
     debug_mode: bool = True,
+    warm_up: Optional[bool] = None,
 ) -> Assistant:
+    """
+    Create the assistant for a user's chat run.
+
+    The LLM is asked to stay loaded for OLLAMA_KEEP_ALIVE, and the system prompt only
+    changes when the date does, so Ollama can reuse its prompt cache across turns. With
+    warm_up (MODEL_WARM_UP by default) the model is loaded and the system prompt
+    evaluated in the background before the first message.
+    """
+
+    # Imported here: the search toolkit pulls in duckduckgo_search and its HTTP stack.
+    from phi.tools.duckduckgo import DuckDuckGo
 
     settings = Settings()
     if run_id is None:
         run_id = datetime.now().isoformat()
-    embedder = OllamaEmbedder(model=embeddings_model, dimensions=4096)
+    if not user_id:
+        user_id = settings.get_user_id()
+        if not user_id:
+            raise ValueError("User ID is not set. Please ensure you are properly authenticated.")
+
+    # Clients, embedder and vector store are shared by all sessions in the process
+    dimensions = settings.get_embedding_dimensions(embeddings_model, ollama_host)
+    embedder = get_embedder(
+        embeddings_model,
+        ollama_host,
+        dimensions=dimensions,
+        cache_path=settings.embedding_cache_path,
+        cache_max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+    )
 
     knowledge_base = TextKnowledgeBase(
         path="data/docs",
-        # Table name: ai.text_documents
-        vector_db=PgVector2(
-            collection="text_documents",
-            embedder=embedder,
-            db_url=db_url,
+        # Table name: ai.text_documents_<user>_e<embedding space>, without <user> when shared
+        vector_db=get_vector_db(
+            settings.get_knowledge_collection(user_id, embeddings_model, dimensions),
+            embedder,
+            settings.db_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            **settings.get_vector_db_options(),
         ),
     )
 
-    # Set up YAML storage for the assistant
-    if not user_id:
-        user_id = settings.get_user_id()
-        if not user_id:
-            raise ValueError("User ID is not set. Please ensure you are properly authenticated.")
-    user_data_dir = settings.get_user_data_dir(user_id) / "chat_history"
-    storage = YamlStorage(storage_dir=user_data_dir)
+    # Keep the knowledge base in sync with the files in the user's data directory
+    if settings.data_watch_interval > 0:
+        settings.get_data_watcher(user_id, knowledge_base.vector_db).start()
+
+    # Configure the shared shell and math tool workers before the tools can be called
+    settings.get_shell_executor()
+    settings.get_sympy_evaluator()
+
+    # Set up chat history storage for the assistant
+    storage = settings.get_chat_storage(user_id)
     assistant = Assistant(
         name="local_rag_assistant",
         run_id=run_id,
         user_id=user_id,
-        llm=Ollama(model=llm_model, host=ollama_host),
+        llm=get_llm(llm_model, ollama_host, keep_alive=parse_keep_alive(settings.ollama_keep_alive)),
         storage=storage,
         tools=[
             *utils,
@@ -69,12 +93,38 @@ def get_rag_assistant(
         read_chat_history=True,
         prevent_hallucinations=True,
         # add_chat_history_to_messages=True,
-        # knowledge_base=knowledge_base,
+        # Searched for references on every message, with the collection's search mode and re-ranker
+        knowledge_base=knowledge_base,
         add_references_to_prompt=True,
-        add_datetime_to_instructions=True,
+        # The date instead of add_datetime_to_instructions: a timestamp would change the
+        # system prompt every turn and defeat Ollama's prompt cache.
+        extra_instructions=[f"The current date is {date.today().isoformat()}."],
         )
     # assistant.knowledge_base.load(recreate=False)
 
+    if warm_up is None:
+        warm_up = settings.model_warm_up
+    if warm_up:
+        warm_up_assistant(assistant, settings)
     return assistant
 
 
+def warm_up_assistant(assistant: Assistant, settings: Settings):
+    """Load the assistant's model and evaluate its system prompt in the background."""
+    # Attach the tools first, their definitions are part of the system prompt.
+    assistant.update_llm()
+    system_prompt = assistant.get_system_prompt()
+    llm = assistant.llm
+    prompt_hash = hashlib.sha1((system_prompt or "").encode()).hexdigest()
+
+    def step(job) -> str:
+        job.update(message="Loading")
+        timings = llm.warm_up(system_prompt)
+        return f"Ready in {timings.get('total_ms', 0):.0f} ms"
+
+    # Sessions starting with the same model and prompt share one warm-up.
+    return settings.get_job_manager().submit(
+        "warmup", f"Load {llm.model}", step, key=("warmup", ollama_host, llm.model, prompt_hash)
+    )
+
+
@@ -0,0 +1,313 @@
+"""
+Concurrent website crawler for URL ingestion.
+
+The crawler runs an asyncio event loop on its own thread with one pooled
+``httpx.AsyncClient``. Requests are limited per host, honour robots.txt (including
+Crawl-delay) and use the ETag/Last-Modified validators of earlier crawls so that
+unchanged pages cost a 304. Pages are handed to the caller as they arrive through
+``WebsiteCrawler.iter_pages``, so they can be chunked and embedded while the crawl
+is still running.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from phi.document import Document
+from phi.document.reader.base import Reader
+from phi.utils.log import logger
+
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".zip", ".gz", ".mp4", ".mp3")
+
+
+class CrawledPage:
+    """A page produced by the crawler."""
+
+    def __init__(self, url: str, depth: int, content: str = "", links: Optional[List[str]] = None, not_modified: bool = False):
+        self.url = url
+        self.depth = depth
+        self.content = content
+        self.links = links or []
+        self.not_modified = not_modified
+
+    def to_documents(self, reader: Optional[Reader] = None) -> List[Document]:
+        """Chunk the page into documents named after its URL."""
+        document = Document(name=self.url, id=self.url, meta_data={"url": self.url}, content=self.content)
+        return (reader or Reader()).chunk_document(document)
+
+
+class ValidatorStore:
+    """
+    ValidatorStore keeps the ETag, Last-Modified header and outgoing links of crawled
+    pages in a JSON file, so re-crawls can send conditional requests and still follow
+    the links of pages that did not change.
+
+    :param path: The JSON file, or None to keep validators in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    self._entries = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable crawl validators {path}: {e}")
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], links: List[str]) -> None:
+        with self._lock:
+            self._entries[url] = {"etag": etag, "last_modified": last_modified, "links": links}
+
+    def save(self) -> None:
+        """Write the validators to disk atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._entries)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(data)
+        os.replace(tmp_path, self.path)
+
+
+def extract_main_content(html: bytes) -> Tuple[str, List[str]]:
+    """
+    Extract the main text and the links of an HTML page.
+
+    Like phi's WebsiteReader this prefers <article>, <main> and common content classes,
+    but falls back to the body text instead of dropping the page.
+
+    :param html: The page body.
+    :return: The text and the raw href values.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    links = [link["href"] for link in soup.find_all("a", href=True)]
+    for script in soup(["script", "style", "noscript"]):
+        script.decompose()
+    element = soup.find("article") or soup.find("main")
+    for class_name in ["content", "main-content", "post-content"]:
+        if element is None:
+            element = soup.find(class_=class_name)
+    element = element or soup.body or soup
+    return element.get_text(strip=True, separator=" "), links
+
+
+class WebsiteCrawler:
+    """
+    WebsiteCrawler crawls a site breadth-first with bounded concurrency.
+
+    :param max_depth: Maximum link depth, the start URL has depth 1.
+    :param max_pages: Maximum number of pages to fetch.
+    :param max_connections: Size of the shared connection pool.
+    :param per_host_concurrency: Maximum concurrent requests to one host.
+    :param delay: Minimum seconds between request starts to one host, raised by robots.txt Crawl-delay.
+    :param timeout: Request timeout in seconds.
+    :param validators: ETag/Last-Modified store used for conditional requests.
+    :param user_agent: User-Agent header, also used to match robots.txt rules.
+    :param respect_robots: Whether to obey robots.txt.
+    """
+
+    def __init__(
+        self,
+        max_depth: int = 2,
+        max_pages: int = 50,
+        max_connections: int = 10,
+        per_host_concurrency: int = 2,
+        delay: float = 0.25,
+        timeout: float = 10.0,
+        validators: Optional[ValidatorStore] = None,
+        user_agent: str = "xaelai-crawler",
+        respect_robots: bool = True,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_connections = max_connections
+        self.per_host_concurrency = per_host_concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.validators = validators if validators is not None else ValidatorStore()
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+
+    def iter_pages(self, url: str, revalidate: Optional[Set[str]] = None) -> Iterator[CrawledPage]:
+        """
+        Crawl from url on a background thread, yielding pages as they are fetched.
+
+        The crawl applies backpressure: it pauses while the consumer is busy with
+        earlier pages. Stopping the iteration stops the crawl.
+
+        :param url: The start URL.
+        :param revalidate: URLs for which a conditional request may be sent. Pages that are
+            not in the knowledge base should be fetched in full, None allows it for all URLs.
+        :return: An iterator of CrawledPages. Unchanged pages have ``not_modified`` set and no content.
+        """
+        pages: "queue.Queue" = queue.Queue(maxsize=max(self.max_connections, 1))
+        done = object()
+        stop = threading.Event()
+
+        def put(item) -> None:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        async def emit(page: CrawledPage) -> None:
+            await asyncio.to_thread(put, page)
+
+        def run() -> None:
+            try:
+                asyncio.run(self.crawl(url, emit, revalidate=revalidate, stop=stop))
+            except BaseException as e:
+                put(e)
+            finally:
+                self.validators.save()
+                put(done)
+
+        thread = threading.Thread(target=run, name="crawler", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    async def crawl(self, url: str, emit, revalidate: Optional[Set[str]] = None, stop: Optional[threading.Event] = None) -> None:
+        """
+        Crawl from url, awaiting ``emit(page)`` for every page fetched.
+
+        :param url: The start URL.
+        :param emit: Coroutine function receiving each CrawledPage.
+        :param revalidate: URLs for which a conditional request may be sent, None for all.
+        :param stop: Set to stop the crawl early.
+        """
+        start = urldefrag(url)[0]
+        domain = urlparse(start).netloc
+        frontier: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+        seen: Set[str] = {start}
+        fetched = 0
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        host_next_start: Dict[str, float] = {}
+        robots: Dict[str, Optional[RobotFileParser]] = {}
+        robots_lock = asyncio.Lock()
+        frontier.put_nowait((start, 1))
+
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        headers = {"User-Agent": self.user_agent}
+        async with httpx.AsyncClient(limits=limits, headers=headers, timeout=self.timeout, follow_redirects=True) as client:
+
+            async def get_robots(host_url: str) -> Optional[RobotFileParser]:
+                origin = "{0.scheme}://{0.netloc}".format(urlparse(host_url))
+                async with robots_lock:
+                    if origin not in robots:
+                        parser: Optional[RobotFileParser] = RobotFileParser()
+                        try:
+                            response = await client.get(f"{origin}/robots.txt")
+                            if response.status_code >= 400:
+                                parser = None
+                            else:
+                                parser.parse(response.text.splitlines())
+                        except httpx.HTTPError:
+                            parser = None
+                        robots[origin] = parser
+                    return robots[origin]
+
+            async def fetch(page_url: str, depth: int) -> Optional[CrawledPage]:
+                host = urlparse(page_url).netloc
+                delay = self.delay
+                if self.respect_robots:
+                    parser = await get_robots(page_url)
+                    if parser is not None:
+                        if not parser.can_fetch(self.user_agent, page_url):
+                            logger.debug(f"robots.txt disallows {page_url}")
+                            return None
+                        delay = max(delay, float(parser.crawl_delay(self.user_agent) or 0))
+                request_headers = {}
+                validator = self.validators.get(page_url)
+                if validator and (revalidate is None or page_url in revalidate):
+                    if validator.get("etag"):
+                        request_headers["If-None-Match"] = validator["etag"]
+                    if validator.get("last_modified"):
+                        request_headers["If-Modified-Since"] = validator["last_modified"]
+                semaphore = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+                async with semaphore:
+                    # Space out request starts per host
+                    now = time.monotonic()
+                    start_at = max(now, host_next_start.get(host, now))
+                    host_next_start[host] = start_at + delay
+                    if start_at > now:
+                        await asyncio.sleep(start_at - now)
+                    response = await client.get(page_url, headers=request_headers)
+                if response.status_code == 304 and validator:
+                    return CrawledPage(page_url, depth, links=validator.get("links", []), not_modified=True)
+                if response.status_code >= 400 or "html" not in response.headers.get("content-type", "html"):
+                    return None
+                content, hrefs = extract_main_content(response.content)
+                links = list(dict.fromkeys(urldefrag(urljoin(str(response.url), href))[0] for href in hrefs))
+                self.validators.put(page_url, response.headers.get("etag"), response.headers.get("last-modified"), links)
+                return CrawledPage(page_url, depth, content, links)
+
+            async def worker() -> None:
+                nonlocal fetched
+                while True:
+                    page_url, depth = await frontier.get()
+                    try:
+                        if (stop is not None and stop.is_set()) or fetched >= self.max_pages:
+                            continue
+                        fetched += 1
+                        page = await fetch(page_url, depth)
+                        if page is None:
+                            continue
+                        if depth < self.max_depth:
+                            for link in page.links:
+                                parsed = urlparse(link)
+                                if (
+                                    link not in seen
+                                    and parsed.scheme in ("http", "https")
+                                    and parsed.netloc == domain
+                                    and not parsed.path.lower().endswith(SKIPPED_EXTENSIONS)
+                                ):
+                                    seen.add(link)
+                                    frontier.put_nowait((link, depth + 1))
+                        if page.not_modified or page.content:
+                            await emit(page)
+                    except httpx.HTTPError as e:
+                        logger.debug(f"Failed to crawl {page_url}: {e}")
+                    except Exception as e:
+                        # A bad page or link must not end the worker: once all workers
+                        # are gone frontier.join() never returns and the crawl hangs.
+                        logger.warning(f"Failed to crawl {page_url}: {e}")
+                    finally:
+                        frontier.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.max_connections)]
+            try:
+                await frontier.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,215 @@
+"""
+Disk-backed embedding cache.
+
+Embeddings are stored in SQLite keyed by (model, dimensions, sha256 of the text), so
+re-ingested documents, repeated queries and chunks shared between users are embedded
+once. CachedEmbedder wraps any phi Embedder and is a drop-in replacement for it.
+"""
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from hashlib import sha256
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from phi.embedder.base import Embedder
+from phi.utils.log import logger
+
+
+def text_hash(text: str) -> str:
+    """Hash a text for use as a cache key."""
+    return sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    EmbeddingCache is an SQLite store of embeddings with size-based LRU eviction.
+
+    Embeddings are stored as float32 blobs, the precision pgvector keeps anyway. When the
+    stored embeddings exceed ``max_bytes`` the least recently used ones are evicted until
+    the cache is back under 90% of the limit.
+
+    :param path: The SQLite database file.
+    :param max_bytes: Maximum size of the stored embeddings.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " dimensions INTEGER NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, dimensions, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, dimensions: int, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up the cached embeddings of several texts.
+
+        :param model: The embedding model.
+        :param dimensions: The embedding dimensions.
+        :param texts: The texts to look up.
+        :return: A mapping of text to embedding for the texts found in the cache.
+        """
+        hashes = {text_hash(text): text for text in texts}
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            keys = list(hashes)
+            # Stay well below SQLite's limit on the number of bound parameters.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings"
+                    f" WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dimensions, *chunk],
+                ).fetchall()
+                for key, blob in rows:
+                    found[hashes[key]] = array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ?"
+                        f" WHERE model = ? AND dimensions = ? AND text_hash IN ({','.join('?' * len(rows))})",
+                        [time.time(), model, dimensions, *(key for key, _ in rows)],
+                    )
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, dimensions: int, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings, evicting the least recently used ones if the cache is full.
+
+        :param model: The embedding model.
+        :param dimensions: The embedding dimensions.
+        :param embeddings: A mapping of text to embedding.
+        """
+        now = time.time()
+        rows = [
+            (model, dimensions, text_hash(text), array("f", embedding).tobytes(), now)
+            for text, embedding in embeddings.items()
+            if embedding
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    previous = self._conn.execute(
+                        "SELECT LENGTH(embedding) FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                        row[:3],
+                    ).fetchone()
+                    self._conn.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", row)
+                    self._bytes += len(row[3]) - (previous[0] if previous else 0)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target_bytes: int) -> None:
+        """Delete the least recently used embeddings until the cache holds at most target_bytes."""
+        rows = self._conn.execute(
+            "SELECT rowid, LENGTH(embedding) FROM embeddings ORDER BY last_used"
+        ).fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if self._bytes <= target_bytes:
+                break
+            evicted.append(rowid)
+            self._bytes -= size
+        for start in range(0, len(evicted), 500):
+            chunk = evicted[start:start + 500]
+            self._conn.execute(f"DELETE FROM embeddings WHERE rowid IN ({','.join('?' * len(chunk))})", chunk)
+        self.evictions += len(evicted)
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} embeddings from {self.path}")
+
+    def clear(self) -> None:
+        """Delete every cached embedding."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._bytes,
+            }
+
+
+class CachedEmbedder(Embedder):
+    """
+    CachedEmbedder answers from an EmbeddingCache and only calls the wrapped embedder
+    for texts it has not seen.
+    """
+
+    embedder: Embedder
+    cache: EmbeddingCache
+    model: str = ""
+
+    def __init__(self, **data: Any):
+        embedder = data["embedder"]
+        data.setdefault("dimensions", embedder.dimensions)
+        data.setdefault("model", getattr(embedder, "model", type(embedder).__name__))
+        super().__init__(**data)
+
+    def get_embeddings(
+        self, texts: List[str], embed_many: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ) -> List[List[float]]:
+        """
+        Embed several texts, only computing the embeddings that are not cached.
+
+        :param texts: The texts to embed.
+        :param embed_many: Embeds a list of texts with the wrapped embedder, one text at a time by default.
+        :return: One embedding per text.
+        """
+        found = self.cache.get_many(self.model, self.dimensions, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in found))
+        if missing:
+            if embed_many is None:
+                computed = [self.embedder.get_embedding(text) for text in missing]
+            else:
+                computed = embed_many(missing)
+            new = dict(zip(missing, computed))
+            self.cache.put_many(self.model, self.dimensions, new)
+            found.update(new)
+        return [found[text] for text in texts]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        found = self.cache.get_many(self.model, self.dimensions, [text])
+        if text in found:
+            return found[text], None
+        embedding, usage = self.embedder.get_embedding_and_usage(text)
+        self.cache.put_many(self.model, self.dimensions, {text: embedding})
+        return embedding, usage
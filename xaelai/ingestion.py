@@ -0,0 +1,365 @@
+"""
+Knowledge base ingestion pipeline.
+
+PDF pages are parsed in a process pool, chunks are embedded in batches through Ollama's
+multi-input ``embed`` endpoint with bounded concurrency, and each embedded batch is
+bulk-upserted into PgVector. A content-hash manifest (see manifest.py) limits that
+work to new and changed chunks. Ingestion runs as a background job (see jobs.py) and
+reports progress through its Job.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import md5, sha256
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from phi.document import Document
+from phi.document.reader.pdf import PDFReader
+from phi.embedder.base import Embedder
+from phi.embedder.ollama import OllamaEmbedder
+from phi.utils.log import logger
+
+from crawler import WebsiteCrawler
+from jobs import Job, JobManager, get_job_manager
+from embedding_cache import CachedEmbedder
+from manifest import DocumentManifest, ManifestEntry
+from vector_store import ManagedPgVector, embedding_to_list
+
+
+def count_pdf_pages(data: bytes) -> int:
+    """Count the pages of a PDF."""
+    from pypdf import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def parse_pdf_pages(data: bytes, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    Extract the text of a range of PDF pages. Runs in a worker process.
+
+    :param data: The PDF file contents.
+    :param start: Index of the first page to extract.
+    :param stop: Index after the last page to extract.
+    :return: A list of (page number, text) tuples, page numbers starting at 1.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    stop = min(stop, len(reader.pages))
+    return [(number + 1, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+
+
+def embed_texts(embedder: Embedder, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several texts with one request when the embedder supports it.
+
+    :param embedder: The embedder to use.
+    :param texts: The texts to embed.
+    :return: One embedding per text.
+    """
+    if isinstance(embedder, CachedEmbedder):
+        return embedder.get_embeddings(texts, lambda missing: embed_texts(embedder.embedder, missing))
+    if isinstance(embedder, OllamaEmbedder):
+        kwargs = {"options": embedder.options} if embedder.options is not None else {}
+        return list(embedder.client.embed(model=embedder.model, input=texts, **kwargs)["embeddings"])
+    return [embedder.get_embedding(text) for text in texts]
+
+
+def chunk_hash(document: Document) -> str:
+    """The content hash PgVector2 stores for a chunk."""
+    return md5(document.content.replace("\x00", "\ufffd").encode()).hexdigest()
+
+
+def document_id(document: Document) -> str:
+    """The row id PgVector2 uses for a chunk."""
+    return document.id or chunk_hash(document)
+
+
+def bulk_upsert(vector_db, documents: List[Document]) -> None:
+    """
+    Upsert already embedded documents into a PgVector2 table in a single statement.
+
+    :param vector_db: The PgVector2 store.
+    :param documents: Documents with their embedding set.
+    """
+    from sqlalchemy.dialects import postgresql
+
+    rows: Dict[str, dict] = {}
+    for document in documents:
+        _id = document_id(document)
+        rows[_id] = dict(
+            id=_id,
+            name=document.name,
+            meta_data=document.meta_data,
+            content=document.content.replace("\x00", "\ufffd"),
+            embedding=document.embedding,
+            usage=document.usage,
+            content_hash=chunk_hash(document),
+        )
+    if not rows:
+        return
+    stmt = postgresql.insert(vector_db.table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={column: stmt.excluded[column] for column in ("name", "meta_data", "content", "embedding", "usage", "content_hash")},
+    )
+    with vector_db.Session() as sess:
+        with sess.begin():
+            sess.execute(stmt, list(rows.values()))
+
+
+_parse_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_parse_pool(workers: int) -> Executor:
+    # Spawned rather than forked: the Streamlit server process is multi-threaded.
+    global _parse_pool
+    with _pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+class IngestionPipeline:
+    """
+    IngestionPipeline loads documents into a knowledge base's vector store.
+
+    :param vector_db: The PgVector2 store that receives the documents.
+    :param embed_batch_size: Number of chunks per embedding request.
+    :param embed_concurrency: Maximum embedding requests in flight.
+    :param pages_per_task: Number of PDF pages parsed per worker task.
+    :param parse_workers: Number of PDF parsing processes.
+    :param job_manager: Runs the background jobs, the process-wide manager by default.
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        embed_batch_size: int = 32,
+        embed_concurrency: int = 2,
+        pages_per_task: int = 16,
+        parse_workers: Optional[int] = None,
+        job_manager: Optional[JobManager] = None,
+    ):
+        self.vector_db = vector_db
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.pages_per_task = pages_per_task
+        self.parse_workers = parse_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.reader = PDFReader()
+        self.manifest = DocumentManifest(vector_db)
+        self.job_manager = job_manager or get_job_manager()
+
+    def read_pdf(self, data: bytes, name: str, job: Job) -> List[Document]:
+        """
+        Parse a PDF in the process pool and chunk its pages.
+
+        :param data: The PDF file contents.
+        :param name: The document name.
+        :param job: Receives parsing progress.
+        :return: The chunked documents.
+        """
+        pages = count_pdf_pages(data)
+        job.update(status="parsing", done=0, total=pages, message=f"Parsing {pages} pages")
+        pool = _get_parse_pool(self.parse_workers)
+        futures = [pool.submit(parse_pdf_pages, data, start, start + self.pages_per_task) for start in range(0, pages, self.pages_per_task)]
+        documents: List[Document] = []
+        for future in futures:
+            for page_number, text in future.result():
+                if not text.strip():
+                    continue
+                page = Document(name=name, id=f"{name}_{page_number}", meta_data={"page": page_number}, content=text)
+                documents.extend(self.reader.chunk_document(page))
+            job.update(done=min(job.done + self.pages_per_task, pages))
+        return documents
+
+    def ingest(self, documents: List[Document], job: Job) -> None:
+        """
+        Embed documents in batches and upsert each batch as soon as it is embedded.
+
+        Documents that already carry an embedding are upserted without embedding them again.
+
+        :param documents: The documents to load.
+        :param job: Receives embedding progress.
+        """
+        self.vector_db.create()
+        embedder = self.vector_db.embedder
+        batches = [documents[i:i + self.embed_batch_size] for i in range(0, len(documents), self.embed_batch_size)]
+        job.update(status="embedding", done=0, total=len(documents), message=f"Embedding {len(documents)} chunks")
+
+        def embed_batch(batch: List[Document]) -> List[Document]:
+            pending = [d for d in batch if d.embedding is None]
+            if pending:
+                for document, embedding in zip(pending, embed_texts(embedder, [d.content for d in pending])):
+                    document.embedding = embedding
+            return batch
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as pool:
+            for batch in pool.map(embed_batch, batches):
+                bulk_upsert(self.vector_db, batch)
+                job.loaded += len(batch)
+                job.update(done=job.done + len(batch))
+
+    def existing_embeddings(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up stored embeddings for chunk contents that are already in the collection.
+
+        :param content_hashes: Content hashes of the chunks.
+        :return: A mapping of content hash to embedding.
+        """
+        if not content_hashes:
+            return {}
+        from sqlalchemy import select
+
+        table = self.vector_db.table
+        stmt = select(table.c.content_hash, table.c.embedding).where(table.c.content_hash.in_(content_hashes))
+        with self.vector_db.Session() as sess:
+            return {row.content_hash: embedding_to_list(row.embedding) for row in sess.execute(stmt) if row.embedding is not None}
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        """Delete chunks from the collection by id."""
+        if not ids:
+            return
+        from sqlalchemy import delete
+
+        with self.vector_db.Session() as sess:
+            with sess.begin():
+                sess.execute(delete(self.vector_db.table).where(self.vector_db.table.c.id.in_(ids)))
+
+    def sync_document(self, name: str, documents: List[Document], job: Job, content_hash: Optional[str] = None) -> str:
+        """
+        Bring one document in the collection up to date using the manifest.
+
+        Unchanged documents are skipped, only new or changed chunks are loaded (reusing
+        stored embeddings for content that is already in the collection) and chunks that
+        disappeared are deleted.
+
+        :param name: The document name.
+        :param documents: The document's chunks.
+        :param job: Receives progress.
+        :param content_hash: Hash of the source, defaults to a hash of the chunk hashes.
+        :return: A summary of what changed.
+        """
+        chunks = {document_id(d): chunk_hash(d) for d in documents}
+        content_hash = content_hash or md5("".join(chunks.values()).encode()).hexdigest()
+        entry = self.manifest.get(name)
+        if entry is not None and entry.content_hash == content_hash:
+            return f"{name} is unchanged"
+
+        previous = entry.chunks if entry is not None else {}
+        changed = [d for d in documents if previous.get(document_id(d)) != chunks[document_id(d)]]
+        stale = [chunk_id for chunk_id in previous if chunk_id not in chunks]
+        embeddings = self.existing_embeddings(list({chunk_hash(d) for d in changed}))
+        for document in changed:
+            document.embedding = embeddings.get(chunk_hash(document))
+        self.ingest(changed, job)
+        self.delete_chunks(stale)
+        self.manifest.put(ManifestEntry(name, content_hash, chunks))
+        reused = len([d for d in changed if chunk_hash(d) in embeddings])
+        return f"{name}: {len(changed)} chunks loaded ({reused} reused), {len(documents) - len(changed)} unchanged, {len(stale)} removed"
+
+    def sync_pdf(self, data: bytes, name: str, job: Job) -> str:
+        """
+        Parse and sync a PDF, skipping parsing entirely if the file is unchanged.
+
+        :param data: The PDF file contents.
+        :param name: The document name.
+        :param job: Receives progress.
+        :return: A summary of what changed.
+        """
+        content_hash = sha256(data).hexdigest()
+        entry = self.manifest.get(name)
+        if entry is not None and entry.content_hash == content_hash:
+            return f"{name} is unchanged"
+        documents = self.read_pdf(data, name, job)
+        if not documents:
+            raise ValueError(f"No text found in {name}")
+        return self.sync_document(name, documents, job, content_hash=content_hash)
+
+    def sync_documents(self, documents: List[Document], job: Job) -> str:
+        """
+        Sync already read documents, grouped by document name.
+
+        :param documents: The chunks of one or more documents.
+        :param job: Receives progress.
+        :return: A summary of what changed.
+        """
+        if not documents:
+            raise ValueError(f"No text found in {job.name}")
+        groups: Dict[str, List[Document]] = {}
+        for document in documents:
+            groups.setdefault(document.name or job.name, []).append(document)
+        return "; ".join(self.sync_document(name, group, job) for name, group in groups.items())
+
+    def sync_crawl(self, crawler: WebsiteCrawler, url: str, job: Job) -> str:
+        """
+        Crawl a website and sync each page as soon as it arrives.
+
+        Pages already in the collection are revalidated with conditional requests and
+        skipped when the server reports them unchanged.
+
+        :param crawler: The crawler to use.
+        :param url: The start URL.
+        :param job: Receives progress.
+        :return: A summary of the crawl.
+        """
+        job.update(status="crawling", message=f"Crawling {url}")
+        crawled = unchanged = 0
+        for page in crawler.iter_pages(url, revalidate=set(self.manifest.names())):
+            crawled += 1
+            if page.not_modified:
+                unchanged += 1
+            else:
+                logger.debug(self.sync_document(page.url, page.to_documents(), job))
+            job.update(status="crawling", message=f"Crawled {crawled} pages from {url}")
+        if not crawled:
+            raise ValueError(f"Could not read {url}")
+        return f"{url}: {crawled} pages crawled, {unchanged} unchanged"
+
+    def run(self, job: Job, step: Callable[[], str]) -> str:
+        """Run an ingestion step, then maintain the collection's indexes if anything was loaded."""
+        message = step()
+        if job.loaded and isinstance(self.vector_db, ManagedPgVector):
+            job.update(status="indexing", message=f"Updating the index of {self.vector_db.collection}")
+            self.vector_db.after_bulk_load()
+        return message
+
+    def submit(self, kind: str, name: str, key: str, step: Callable[[Job], str]) -> Job:
+        """Run step(job) as a background job, sharing the job of an identical running one."""
+        return self.job_manager.submit(
+            kind, name, lambda job: self.run(job, lambda: step(job)), key=(kind, self.vector_db.collection, key)
+        )
+
+    def submit_pdf(self, data: bytes, name: str) -> Job:
+        """
+        Ingest a PDF in the background.
+
+        :param data: The PDF file contents.
+        :param name: The document name.
+        :return: The job tracking the ingestion.
+        """
+        return self.submit("ingest", name, sha256(data).hexdigest(), lambda job: self.sync_pdf(data, name, job))
+
+    def submit_crawl(self, crawler: WebsiteCrawler, url: str) -> Job:
+        """
+        Crawl a website and ingest its pages in the background.
+
+        :param crawler: The crawler to use.
+        :param url: The start URL.
+        :return: The job tracking the crawl.
+        """
+        return self.submit("crawl", url, url, lambda job: self.sync_crawl(crawler, url, job))
+
+    def submit_documents(self, documents: Iterable[Document], name: str) -> Job:
+        """
+        Ingest already read documents in the background.
+
+        :param documents: The documents to load.
+        :param name: A name for the job.
+        :return: The job tracking the ingestion.
+        """
+        documents = list(documents)
+        return self.submit("ingest", name, name, lambda job: self.sync_documents(documents, job))
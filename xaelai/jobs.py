@@ -0,0 +1,240 @@
+"""
+Process-wide background jobs.
+
+Long-running operations (model pulls, knowledge base ingestion, website crawls) run on
+a shared thread pool instead of inside a Streamlit script run, so they survive page
+navigation and are visible to every session. Jobs submitted with the same key while
+one is still running share that job. Job state is kept in memory for cheap polling and
+persisted to a JSON file, so finished and interrupted jobs are still listed after a
+restart. Kinds of slow, low-priority jobs can be given a pool of their own, so they never
+occupy the workers of the others.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+from phi.utils.log import logger
+
+class Job:
+    """Progress of one background operation, updated by the operation and polled by the UI."""
+
+    def __init__(self, name: str, kind: str = "job", key: Optional[Hashable] = None, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.kind = kind
+        self.key = key
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.loaded = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._listener: Optional[Callable[["Job", bool], None]] = None
+
+    @property
+    def progress(self) -> float:
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def update(self, status: Optional[str] = None, done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        status_changed = status is not None and status != self.status
+        if status is not None:
+            self.status = status
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        if self._listener is not None:
+            self._listener(self, status_changed)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        job = cls(data["name"], kind=data.get("kind", "job"), job_id=data["id"])
+        for field in ("status", "done", "total", "message", "error", "started_at", "finished_at"):
+            if field in data:
+                setattr(job, field, data[field])
+        return job
+
+
+class JobManager:
+    """
+    JobManager runs Jobs on a thread pool and keeps track of them.
+
+    :param state_path: JSON file the job list is persisted to, None to keep it in memory only.
+    :param max_workers: Number of jobs that run at the same time.
+    :param keep: Number of finished jobs to remember.
+    :param persist_interval: Minimum seconds between writes caused by progress updates.
+    :param kind_workers: Kinds of jobs that run on a pool of their own, with its number of workers,
+        e.g. {"index": 1}. Other kinds share the max_workers pool.
+    """
+
+    def __init__(self, state_path: Optional[str] = None, max_workers: int = 4, keep: int = 100, persist_interval: float = 1.0,
+                 kind_workers: Optional[Dict[str, int]] = None):
+        self.state_path = state_path
+        self.keep = keep
+        self.persist_interval = persist_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._kind_executors = {
+            kind: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{kind}")
+            for kind, workers in (kind_workers or {}).items()
+        }
+        self._jobs: Dict[str, Job] = {}
+        self._active_keys: Dict[Hashable, Job] = {}
+        self._lock = threading.RLock()
+        self._persisted_at = 0.0
+        self._load()
+
+    def submit(self, kind: str, name: str, fn: Callable[[Job], Optional[str]], key: Optional[Hashable] = None) -> Job:
+        """
+        Run fn(job) in the background.
+
+        :param kind: The kind of job, e.g. "pull", "ingest" or "crawl".
+        :param name: A name to show for the job.
+        :param fn: The operation. It reports progress through job.update() and returns a final message.
+        :param key: Identifies identical operations. While a job with the same key is queued or
+            running, that job is returned instead of starting another.
+        :return: The job.
+        """
+        with self._lock:
+            if key is not None and key in self._active_keys:
+                return self._active_keys[key]
+            job = Job(name, kind=kind, key=key)
+            job._listener = self._on_update
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active_keys[key] = job
+            self._prune()
+        self._kind_executors.get(kind, self._executor).submit(self._run, job, fn)
+        self._persist(force=True)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Optional[str]]) -> None:
+        job.update(status="running")
+        try:
+            message, error = fn(job), None
+        except Exception as e:
+            logger.error(f"Job {job.name} failed: {e}")
+            message, error = str(e), str(e)
+        with self._lock:
+            if job.key is not None and self._active_keys.get(job.key) is job:
+                del self._active_keys[job.key]
+        job.error = error
+        job.finished_at = time.time()
+        job.update(status="failed" if error else "done", message=message or job.message)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def last_job(self, key: Hashable) -> Optional[Job]:
+        """Get the most recent job submitted with key in this process, whether it is running or finished."""
+        with self._lock:
+            return next((job for job in reversed(list(self._jobs.values())) if job.key == key), None)
+
+    def jobs(self, kind: Optional[str] = None, active: Optional[bool] = None) -> List[Job]:
+        """
+        List jobs, oldest first.
+
+        :param kind: Only jobs of this kind.
+        :param active: Only unfinished jobs if True, only finished jobs if False.
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            job for job in jobs
+            if (kind is None or job.kind == kind) and (active is None or job.finished != active)
+        ]
+
+    def _on_update(self, job: Job, status_changed: bool) -> None:
+        self._persist(force=status_changed)
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+
+    def _persist(self, force: bool = False) -> None:
+        if not self.state_path:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._persisted_at < self.persist_interval:
+                return
+            self._persisted_at = now
+            data = json.dumps([job.to_dict() for job in self._jobs.values()])
+            try:
+                directory = os.path.dirname(self.state_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.state_path}.tmp"
+                with open(tmp_path, "w") as file:
+                    file.write(data)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                logger.warning(f"Could not persist job state to {self.state_path}: {e}")
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r") as file:
+                records = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable job state {self.state_path}: {e}")
+            return
+        for record in records:
+            job = Job.from_dict(record)
+            if not job.finished:
+                # The process that ran it is gone.
+                job.status = "failed"
+                job.error = job.message = "Interrupted by a restart"
+                job.finished_at = job.finished_at or time.time()
+            self._jobs[job.id] = job
+        self._prune()
+
+
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager(state_path: Optional[str] = None, max_workers: int = 4,
+                    kind_workers: Optional[Dict[str, int]] = None) -> JobManager:
+    """
+    Get the process-wide job manager, creating it on first use.
+
+    :param state_path: JSON file for persisted job state, used when the manager is created.
+    :param max_workers: Number of concurrent jobs, used when the manager is created.
+    :param kind_workers: Kinds of jobs with a pool of their own, used when the manager is created.
+    :return: The shared JobManager.
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(state_path, max_workers=max_workers, kind_workers=kind_workers)
+        return _job_manager
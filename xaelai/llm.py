@@ -0,0 +1,120 @@
+"""
+Ollama chat model with warm-up and per-request timings.
+
+Ollama unloads a model after it has been idle for ``keep_alive`` and, while loaded,
+reuses the KV cache of the longest prompt prefix it has already evaluated. Passing a
+keep_alive on every request and warming the model up with the assistant's system
+prompt means the first turn after selecting a model neither waits for the model to load
+nor evaluates the system prompt. The timings Ollama reports with its final response
+show whether that worked: a prompt prefix cache hit shows up as a small prompt eval
+count.
+"""
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+from phi.llm.message import Message
+from phi.llm.ollama import Ollama
+from phi.utils.log import logger
+
+# Durations in Ollama's final response, in nanoseconds.
+_DURATIONS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+_COUNTS = ("prompt_eval_count", "eval_count")
+
+
+def parse_keep_alive(value: Optional[str]) -> Optional[Union[int, str]]:
+    """
+    Parse a keep_alive setting.
+
+    :param value: A duration such as "30m", a number of seconds, "-1" to keep the model
+        loaded indefinitely, or empty to use Ollama's default.
+    :return: The keep_alive to send to Ollama, None for its default.
+    """
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def response_timings(response: Mapping[str, Any]) -> Dict[str, float]:
+    """Extract token counts and durations (in milliseconds) from Ollama's final response."""
+    timings: Dict[str, float] = {}
+    for field in _COUNTS:
+        if response.get(field) is not None:
+            timings[field] = response[field]
+    for field in _DURATIONS:
+        if response.get(field) is not None:
+            timings[field.replace("_duration", "_ms")] = response[field] / 1e6
+    return timings
+
+
+def sum_timings(timings: List[Dict[str, float]]) -> Dict[str, float]:
+    """Add up the timings of several requests, e.g. the tool calls and answer of one turn."""
+    total: Dict[str, float] = {}
+    for request in timings:
+        for field, value in request.items():
+            total[field] = total.get(field, 0) + value
+    return total
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Describe prompt evaluation and generation timings in one line."""
+    parts = []
+    if "prompt_eval_count" in timings or "prompt_eval_ms" in timings:
+        parts.append(f"prompt {timings.get('prompt_eval_count', 0):.0f} tokens in {timings.get('prompt_eval_ms', 0):.0f} ms")
+    if "eval_count" in timings:
+        eval_ms = timings.get("eval_ms", 0)
+        rate = timings["eval_count"] / (eval_ms / 1000) if eval_ms else 0
+        parts.append(f"generated {timings['eval_count']:.0f} tokens in {eval_ms:.0f} ms ({rate:.1f} tokens/s)")
+    if timings.get("load_ms", 0) >= 1:
+        parts.append(f"model load {timings['load_ms']:.0f} ms")
+    return ", ".join(parts)
+
+
+class TimedOllama(Ollama):
+    """
+    Ollama LLM that records the timings Ollama reports for every request.
+
+    Each request's timings are appended to ``metrics["ollama_timings"]``, so a caller can
+    sum the entries added during one assistant run to get that turn's prompt eval and
+    eval times.
+    """
+
+    def record_timings(self, response: Mapping[str, Any]) -> None:
+        timings = response_timings(response)
+        if not timings:
+            return
+        self.metrics.setdefault("ollama_timings", []).append(timings)
+        logger.debug(f"Ollama {self.model}: {format_timings(timings)}")
+
+    def invoke(self, messages: List[Message]) -> Mapping[str, Any]:
+        response = super().invoke(messages)
+        self.record_timings(response)
+        return response
+
+    def invoke_stream(self, messages: List[Message]) -> Iterator[Mapping[str, Any]]:
+        for response in super().invoke_stream(messages):
+            if response.get("done"):
+                self.record_timings(response)
+            yield response
+
+    def warm_up(self, system_prompt: Optional[str] = None) -> Dict[str, float]:
+        """
+        Load the model and, given the system prompt, fill Ollama's prompt cache with it.
+
+        :param system_prompt: The system prompt the assistant will send, None to only load the model.
+        :return: The timings of the warm-up request.
+        """
+        start = time.perf_counter()
+        if system_prompt:
+            response = self.client.chat(
+                model=self.model,
+                messages=[{"role": "system", "content": system_prompt}],
+                options={**(self.options or {}), "num_predict": 1},
+                keep_alive=self.keep_alive,
+            )
+        else:
+            # An empty prompt only loads the model.
+            response = self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+        timings = response_timings(response)
+        logger.info(f"Warmed up {self.model} in {time.perf_counter() - start:.2f}s: {format_timings(timings)}")
+        return timings
@@ -0,0 +1,112 @@
+"""
+Persistent content-hash manifest for knowledge base documents.
+
+For every document loaded into a vector collection the manifest records a hash of the
+whole source and the content hash of each chunk id. The ingestion pipeline uses it to
+skip unchanged documents, embed only new or changed chunks and delete chunks that no
+longer exist.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import Column, MetaData, Table
+from sqlalchemy.sql.expression import text
+from sqlalchemy.types import DateTime, String
+
+
+class ManifestEntry:
+    """The recorded state of one document."""
+
+    def __init__(self, name: str, content_hash: str, chunks: Dict[str, str]):
+        self.name = name
+        self.content_hash = content_hash
+        self.chunks = chunks
+
+
+class DocumentManifest:
+    """
+    DocumentManifest stores ManifestEntries for one PgVector2 collection in
+    ``<schema>.knowledge_manifest``, next to the collection's own table.
+
+    :param vector_db: The PgVector2 store the manifest describes.
+    """
+
+    def __init__(self, vector_db):
+        self.vector_db = vector_db
+        self.collection = vector_db.collection
+        self.metadata = MetaData(schema=vector_db.schema)
+        self.table = Table(
+            "knowledge_manifest",
+            self.metadata,
+            Column("collection", String, primary_key=True),
+            Column("name", String, primary_key=True),
+            Column("content_hash", String),
+            Column("chunks", postgresql.JSONB),
+            Column("updated_at", DateTime(timezone=True), server_default=text("now()"), onupdate=text("now()")),
+            extend_existing=True,
+        )
+        self._created = False
+
+    def create(self) -> None:
+        """Create the manifest table if needed."""
+        if not self._created:
+            self.vector_db.create()
+            self.table.create(self.vector_db.db_engine, checkfirst=True)
+            self._created = True
+
+    def get(self, name: str) -> Optional[ManifestEntry]:
+        """Get the recorded state of a document, or None if it was never loaded."""
+        self.create()
+        stmt = select(self.table.c.content_hash, self.table.c.chunks).where(
+            self.table.c.collection == self.collection, self.table.c.name == name
+        )
+        with self.vector_db.Session() as sess:
+            row = sess.execute(stmt).first()
+        return ManifestEntry(name, row.content_hash, row.chunks or {}) if row else None
+
+    def put(self, entry: ManifestEntry) -> None:
+        """Record the state of a document."""
+        self.create()
+        stmt = postgresql.insert(self.table).values(
+            collection=self.collection, name=entry.name, content_hash=entry.content_hash, chunks=entry.chunks
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["collection", "name"],
+            set_=dict(content_hash=stmt.excluded.content_hash, chunks=stmt.excluded.chunks, updated_at=text("now()")),
+        )
+        with self.vector_db.Session() as sess:
+            with sess.begin():
+                sess.execute(stmt)
+
+    def names(self) -> List[str]:
+        """List the names of all recorded documents."""
+        self.create()
+        stmt = select(self.table.c.name).where(self.table.c.collection == self.collection)
+        with self.vector_db.Session() as sess:
+            return [row.name for row in sess.execute(stmt)]
+
+    def content_hashes(self, prefix: str = "") -> Dict[str, str]:
+        """Map the names of recorded documents, optionally only those starting with prefix, to their content hash."""
+        self.create()
+        stmt = select(self.table.c.name, self.table.c.content_hash).where(self.table.c.collection == self.collection)
+        if prefix:
+            stmt = stmt.where(self.table.c.name.startswith(prefix, autoescape=True))
+        with self.vector_db.Session() as sess:
+            return {row.name: row.content_hash for row in sess.execute(stmt)}
+
+    def delete(self, name: str) -> None:
+        """Remove a document and all of its chunks from the collection and the manifest."""
+        entry = self.get(name)
+        with self.vector_db.Session() as sess:
+            with sess.begin():
+                if entry is not None and entry.chunks:
+                    sess.execute(delete(self.vector_db.table).where(self.vector_db.table.c.id.in_(list(entry.chunks))))
+                sess.execute(delete(self.table).where(self.table.c.collection == self.collection, self.table.c.name == name))
+
+    def clear(self) -> None:
+        """Forget every document of the collection, e.g. after the collection was cleared."""
+        self.create()
+        with self.vector_db.Session() as sess:
+            with sess.begin():
+                sess.execute(delete(self.table).where(self.table.c.collection == self.collection))
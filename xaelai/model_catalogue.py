@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from ollama import Client
+from phi.utils.log import logger
+
+from resources import get_ollama_client
+
+
+class ModelCatalogue:
+    """
+    ModelCatalogue caches the list of models available on an Ollama server.
+
+    One catalogue is shared by every session in the process (see get_model_catalogue),
+    so page reruns read the cached list instead of calling ``ollama.list()``. The list is
+    refreshed after ``ttl`` seconds, or straight away after ``invalidate()`` is called
+    because a model was pulled or deleted.
+    """
+
+    def __init__(self, client: Client, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.ttl = ttl
+        self.clock = clock
+        self._models: Optional[List[str]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def list_models(self) -> List[str]:
+        """Return the names of the available models, fetching them if the cache is stale."""
+        with self._lock:
+            if self._models is None or self.clock() - self._fetched_at >= self.ttl:
+                try:
+                    self._models = [m["name"] for m in self.client.list()["models"]]
+                    self._fetched_at = self.clock()
+                except Exception as e:
+                    if self._models is None:
+                        raise
+                    logger.warning(f"Failed to refresh model list, using cached list: {e}")
+            return list(self._models)
+
+    def pull(self, model_name: str, job) -> str:
+        """
+        Pull a model, reporting download progress on a background Job.
+
+        :param model_name: The model to pull.
+        :param job: Receives progress.
+        :return: A final message for the job.
+        """
+        for progress in self.client.pull(model_name, stream=True):
+            total, completed = progress.get("total", 0), progress.get("completed", 0)
+            if progress.get("digest") and total:
+                job.update(
+                    status="downloading",
+                    done=completed,
+                    total=total,
+                    message=f"Downloaded {completed / 1024 ** 3:.2f} GB of {total / 1024 ** 3:.2f} GB",
+                )
+            else:
+                job.update(message=progress.get("status", ""))
+        self.invalidate()
+        return f"Model '{model_name}' downloaded"
+
+    def invalidate(self) -> None:
+        """Force the next list_models() call to fetch from the server."""
+        with self._lock:
+            self._models = None
+
+
+_catalogues: Dict[str, ModelCatalogue] = {}
+_catalogues_lock = threading.Lock()
+
+
+def get_model_catalogue(host: str, ttl: float = 300.0) -> ModelCatalogue:
+    """
+    Get the process-wide model catalogue for an Ollama host.
+
+    :param host: The Ollama host.
+    :param ttl: Seconds before the cached model list is refreshed.
+    :return: The shared ModelCatalogue.
+    """
+    with _catalogues_lock:
+        catalogue = _catalogues.get(host)
+        if catalogue is None:
+            catalogue = _catalogues[host] = ModelCatalogue(get_ollama_client(host), ttl=ttl)
+        catalogue.ttl = ttl
+        return catalogue
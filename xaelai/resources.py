@@ -0,0 +1,174 @@
+"""
+Process-wide registry of shared clients and connection pools.
+
+Streamlit runs every session in the same process, so HTTP clients, the SQLAlchemy
+engine and stateless components such as embedders and vector stores are created once
+per key and reused by all sessions. Each key is created under its own lock, so a slow
+factory only holds up callers asking for the same resource. LLM objects are not shared: the Assistant attaches
+its tools and metrics to them.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from ollama import Client
+from sqlalchemy.engine import Engine, create_engine
+
+_resources: Dict[Hashable, Any] = {}
+_key_locks: Dict[Hashable, threading.Lock] = {}
+# Guards the two dicts only, never held while a factory runs.
+_lock = threading.Lock()
+
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Return the resource registered under key, creating it with factory on first use.
+
+    Concurrent callers of the same key wait for one factory call; other keys are not
+    blocked by it. A factory that raises registers nothing, the next call retries.
+
+    :param key: A hashable key identifying the resource.
+    :param factory: Creates the resource.
+    :return: The shared resource.
+    """
+    with _lock:
+        if key in _resources:
+            return _resources[key]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        with _lock:
+            if key in _resources:
+                return _resources[key]
+        resource = factory()
+        with _lock:
+            _resources[key] = resource
+        return resource
+
+
+def get_ollama_client(host: str) -> Client:
+    """Get the shared Ollama HTTP client for a host."""
+    return get_or_create(("ollama_client", host), lambda: Client(host=host))
+
+
+def get_engine(db_url: str, pool_size: int = 5, max_overflow: int = 10) -> Engine:
+    """Get the shared, pooled SQLAlchemy engine for a database URL."""
+    return get_or_create(
+        ("engine", db_url),
+        lambda: create_engine(db_url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True),
+    )
+
+
+def get_embedding_dimensions(model: str, host: str, timeout: float = 60.0) -> int:
+    """
+    Get the number of dimensions of an embedding model.
+
+    The model is probed with one embedding request the first time and the result is
+    cached for the process. The probe runs under the lock of its own key only, on a
+    client with a timeout, so an unresponsive Ollama does not hold up other lookups. A
+    failed probe is not cached: the dimensions name the collection and size its table,
+    so guessing them would only make later inserts fail.
+
+    :param model: The embedding model.
+    :param host: The Ollama host.
+    :param timeout: Seconds to wait for the probe, including loading the model.
+    :return: The embedding dimensions.
+    :raises RuntimeError: If the model could not be probed.
+    """
+
+    def probe() -> int:
+        # Not the shared client, which has no timeout.
+        response = Client(host=host, timeout=timeout).embed(model=model, input=["dimensions"])
+        return len(response["embeddings"][0])
+
+    try:
+        return get_or_create(("embedding_dimensions", host, model), probe)
+    except Exception as e:
+        raise RuntimeError(
+            f"Could not probe the dimensions of embedding model {model}, "
+            f"check that Ollama is reachable or set EMBEDDING_DIMENSIONS: {e}"
+        ) from e
+
+
+def get_embedding_cache(path: str, max_bytes: int):
+    """Get the shared on-disk embedding cache stored at path."""
+    from embedding_cache import EmbeddingCache
+
+    cache = get_or_create(("embedding_cache", str(path)), lambda: EmbeddingCache(path, max_bytes=max_bytes))
+    cache.max_bytes = max_bytes
+    return cache
+
+
+def get_embedder(model: str, host: str, dimensions: int, cache_path: Optional[str] = None, cache_max_bytes: int = 0):
+    """
+    Get the shared Ollama embedder for a model.
+
+    :param model: The embedding model.
+    :param host: The Ollama host.
+    :param dimensions: The embedding dimensions.
+    :param cache_path: SQLite file for the embedding cache, no cache if None.
+    :param cache_max_bytes: Size limit of the embedding cache, no cache if 0.
+    :return: The embedder, wrapped in a CachedEmbedder when caching is enabled.
+    """
+    from phi.embedder.ollama import OllamaEmbedder
+
+    embedder = get_or_create(
+        ("embedder", host, model, dimensions),
+        lambda: OllamaEmbedder(model=model, dimensions=dimensions, ollama_client=get_ollama_client(host)),
+    )
+    if not cache_path or cache_max_bytes <= 0:
+        return embedder
+
+    from embedding_cache import CachedEmbedder
+
+    cache = get_embedding_cache(cache_path, cache_max_bytes)
+    return get_or_create(
+        ("cached_embedder", host, model, dimensions, str(cache_path)),
+        lambda: CachedEmbedder(embedder=embedder, cache=cache),
+    )
+
+
+def get_vector_db(collection: str, embedder, db_url: str, pool_size: int = 5, max_overflow: int = 10, **options):
+    """
+    Get the shared vector store for a collection and embedder.
+
+    :param collection: The collection (table) name.
+    :param embedder: The embedder of the collection.
+    :param db_url: The database URL.
+    :param pool_size: Connection pool size of the shared engine.
+    :param max_overflow: Connections allowed beyond pool_size.
+    :param options: ManagedPgVector options, such as index, ef_search, storage or search_mode.
+    :return: The shared ManagedPgVector.
+    """
+    from vector_store import ManagedPgVector
+
+    options_key = tuple(
+        sorted((name, value.model_dump_json() if hasattr(value, "model_dump_json") else value) for name, value in options.items())
+    )
+    return get_or_create(
+        ("vector_db", db_url, collection, id(embedder), options_key),
+        lambda: ManagedPgVector(
+            collection=collection,
+            embedder=embedder,
+            db_engine=get_engine(db_url, pool_size=pool_size, max_overflow=max_overflow),
+            **options,
+        ),
+    )
+
+
+def get_llm(model: str, host: str, **kwargs):
+    """Create an Ollama LLM that reuses the shared HTTP client for its host and records request timings."""
+    from llm import TimedOllama
+
+    return TimedOllama(model=model, host=host, ollama_client=get_ollama_client(host), **kwargs)
+
+
+def resource_stats() -> Dict[str, Any]:
+    """Describe the registered resources, including connection pool usage."""
+    with _lock:
+        resources = list(_resources.items())
+    stats: Dict[str, Any] = {"resources": len(resources)}
+    for key, resource in resources:
+        if key[0] == "engine":
+            stats[f"pool {resource.url.render_as_string(hide_password=True)}"] = resource.pool.status()
+        elif key[0] == "embedding_cache":
+            stats[f"embedding cache {key[1]}"] = resource.stats()
+    return stats
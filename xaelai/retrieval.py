@@ -0,0 +1,83 @@
+"""
+Result fusion and re-ranking for hybrid knowledge base search.
+
+Vector and keyword searches return ranked lists of chunks. Reciprocal-rank fusion
+merges them without having to calibrate their scores against each other, and the
+optional overlap re-ranker then promotes chunks that contain the query's terms, giving
+exact identifiers such as part numbers extra weight.
+"""
+import re
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from phi.document import Document
+
+ScoredDocuments = List[Tuple[Document, float]]
+
+_TOKEN = re.compile(r"\w[\w.\-/]*\w|\w")
+
+
+def query_terms(text: str) -> List[str]:
+    """Split text into lowercase terms, keeping identifiers like "XJ-4000" or "v1.2" whole."""
+    return [term.lower() for term in _TOKEN.findall(text)]
+
+
+def is_identifier(term: str) -> bool:
+    """Whether a term looks like an identifier or part number rather than a word."""
+    return any(c.isdigit() for c in term) or any(c in "_.-/" for c in term)
+
+
+def document_key(document: Document) -> str:
+    return document.id or f"{document.name}:{document.content}"
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int = 60) -> ScoredDocuments:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+
+    Each document scores ``sum(1 / (k + rank))`` over the lists it appears in.
+
+    :param rankings: Result lists, best first.
+    :param k: Damping constant, 60 as in the original paper.
+    :return: Documents with their fused score, best first.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document_key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(((documents[key], score) for key, score in scores.items()), key=lambda item: item[1], reverse=True)
+
+
+def overlap_rerank(query: str, scored: ScoredDocuments, weight: float = 0.05) -> ScoredDocuments:
+    """
+    Re-rank documents by how much of the query they contain.
+
+    Adds ``weight`` times the fraction of query terms found in the document to its score.
+    Identifier-like terms count twice, so a chunk containing the exact part number asked
+    about outranks chunks that are merely similar.
+
+    :param query: The search query.
+    :param scored: Documents with their scores, e.g. from reciprocal_rank_fusion.
+    :param weight: Score added for a document containing every query term. The default
+        is more than a first place in two rankings adds with reciprocal-rank fusion, so
+        coverage decides the order and the fused score breaks ties.
+    :return: The documents with adjusted scores, best first.
+    """
+    terms = set(query_terms(query))
+    if not terms:
+        return scored
+    weights = {term: 2.0 if is_identifier(term) else 1.0 for term in terms}
+    total = sum(weights.values())
+    reranked = []
+    for document, score in scored:
+        content = set(query_terms(document.content))
+        coverage = sum(w for term, w in weights.items() if term in content) / total
+        reranked.append((document, score + weight * coverage))
+    return sorted(reranked, key=lambda item: item[1], reverse=True)
+
+
+RERANKERS: Dict[str, Callable[[str, ScoredDocuments], ScoredDocuments]] = {
+    "overlap": overlap_rerank,
+}
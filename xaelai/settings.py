@@ -10,6 +10,55 @@ class Settings:
         self.default_llm_model = os.getenv("DEFAULT_LLM_MODEL", "llama3.1:latest")
         self.default_embeddings_model = os.getenv("DEFAULT_EMBEDDINGS_MODEL", "nomic-embed-text:latest")
         self.feature_model_manager = os.getenv("FEATURE_MODEL_MANAGER", "true").lower() == "true"
+        self.chat_storage_backend = os.getenv("CHAT_STORAGE_BACKEND", "yaml").lower()
+        self.chat_cache_max_mb = int(os.getenv("CHAT_CACHE_MAX_MB", "64"))
+        self.chat_write_behind = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"
+        self.stream_flush_interval_ms = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+        self.transcript_page_size = int(os.getenv("TRANSCRIPT_PAGE_SIZE", "50"))
+        self.model_catalogue_ttl = float(os.getenv("MODEL_CATALOGUE_TTL", "300"))
+        self.ollama_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.model_warm_up = os.getenv("MODEL_WARM_UP", "true").lower() == "true"
+        self.db_url = os.getenv("DB_URL", "postgresql+psycopg://ai:ai@pgvector:5432/ai")
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+        self.embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "2"))
+        self.embedding_cache_path = os.getenv(
+            "EMBEDDING_CACHE_PATH", str(Path(self.default_storage_dir) / "embedding_cache.sqlite")
+        )
+        self.embedding_cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+        self.embedding_dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+        self.vector_storage = os.getenv("VECTOR_STORAGE", "vector").lower()
+        self.vector_quantization = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+        self.binary_rerank_factor = int(os.getenv("BINARY_RERANK_FACTOR", "4"))
+        self.search_mode = os.getenv("SEARCH_MODE", "vector").lower()
+        self.search_reranker = os.getenv("SEARCH_RERANKER", "none").lower()
+        self.text_search_config = os.getenv("TEXT_SEARCH_CONFIG", "english")
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "20"))
+        self.knowledge_partition = os.getenv("KNOWLEDGE_PARTITION", "user").lower()
+        self.vector_index = os.getenv("VECTOR_INDEX", "hnsw").lower()
+        self.hnsw_m = int(os.getenv("HNSW_M", "16"))
+        self.hnsw_ef_construction = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+        self.hnsw_ef_search = int(os.getenv("HNSW_EF_SEARCH", "40"))
+        self.ivfflat_lists = int(os.getenv("IVFFLAT_LISTS", "0"))
+        self.ivfflat_probes = int(os.getenv("IVFFLAT_PROBES", "10"))
+        self.job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.shell_workers = int(os.getenv("SHELL_WORKERS", "4"))
+        self.shell_timeout = float(os.getenv("SHELL_TIMEOUT", "60"))
+        self.shell_cpu_seconds = int(os.getenv("SHELL_CPU_SECONDS", "60"))
+        self.shell_memory_mb = int(os.getenv("SHELL_MEMORY_MB", "1024"))
+        self.shell_max_output_kb = int(os.getenv("SHELL_MAX_OUTPUT_KB", "32"))
+        self.math_workers = int(os.getenv("MATH_WORKERS", "2"))
+        self.math_timeout = float(os.getenv("MATH_TIMEOUT", "5"))
+        self.math_memory_mb = int(os.getenv("MATH_MEMORY_MB", "1024"))
+        self.file_index_max_age = float(os.getenv("FILE_INDEX_MAX_AGE", "30"))
+        self.data_watch_interval = float(os.getenv("DATA_WATCH_INTERVAL", "300"))
+        self.data_watch_max_kb_per_s = int(os.getenv("DATA_WATCH_MAX_KB_PER_S", "1024"))
+        self.data_watch_max_file_mb = int(os.getenv("DATA_WATCH_MAX_FILE_MB", "20"))
+        self.crawl_max_depth = int(os.getenv("CRAWL_MAX_DEPTH", "2"))
+        self.crawl_max_pages = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+        self.crawl_host_concurrency = int(os.getenv("CRAWL_HOST_CONCURRENCY", "2"))
+        self.crawl_delay_ms = int(os.getenv("CRAWL_DELAY_MS", "250"))
 
     def get_user_id(self):
         """Retrieve the user ID from the session state."""
@@ -18,6 +67,140 @@ class Settings:
     def get_user_data_dir(self, user_id: str) -> str:
         """Get the user data directory for the given user ID."""
         return Path(self.default_storage_dir) / user_id
+
+    def get_file_index(self, user_id: str):
+        """Get the shared index of the files in the user's data directory."""
+        from tools.file_index import FileIndex
+        from resources import get_or_create
+        user_dir = self.get_user_data_dir(user_id)
+        return get_or_create(
+            ("file_index", str(user_dir)),
+            lambda: FileIndex(
+                user_dir,
+                index_path=user_dir / ".file_index.json",
+                exclude=["chat_history/*"],
+                max_age=self.file_index_max_age,
+            ),
+        )
+
+    def get_data_watcher(self, user_id: str, vector_db):
+        """Get the shared watcher that indexes the user's data directory into a collection, stopping the one of a previous collection."""
+        from ingestion import IngestionPipeline
+        from watcher import DataDirectoryWatcher, get_throttle, get_watcher
+
+        def create():
+            pipeline = IngestionPipeline(
+                vector_db,
+                embed_batch_size=self.embed_batch_size,
+                embed_concurrency=self.embed_concurrency,
+                job_manager=self.get_job_manager(),
+            )
+            return DataDirectoryWatcher(
+                pipeline,
+                self.get_file_index(user_id),
+                interval=self.data_watch_interval,
+                # One cap on the bytes read per second, shared by the watchers of all users
+                throttle=get_throttle(self.data_watch_max_kb_per_s * 1024),
+                max_file_bytes=self.data_watch_max_file_mb * 1024 * 1024,
+                # Collections can be shared between users, keep each user's files apart.
+                prefix=f"file:{user_id}/",
+            )
+
+        return get_watcher(str(self.get_user_data_dir(user_id)), vector_db.collection, create)
+
+    def get_chat_storage(self, user_id: str):
+        """Get the chat history storage for the given user ID."""
+        from storage import get_storage
+        return get_storage(
+            self.get_user_data_dir(user_id) / "chat_history",
+            backend=self.chat_storage_backend,
+            cache_max_bytes=self.chat_cache_max_mb * 1024 * 1024,
+            write_behind=self.chat_write_behind,
+        )
+
+    def get_embedding_dimensions(self, model: str, host: str) -> int:
+        """Get the embedding dimensions of a model, probing it unless EMBEDDING_DIMENSIONS is set."""
+        if self.embedding_dimensions > 0:
+            return self.embedding_dimensions
+        from resources import get_embedding_dimensions
+        return get_embedding_dimensions(model, host)
+
+    def get_knowledge_collection(self, user_id: str, model: str, dimensions: int) -> str:
+        """Get the vector collection holding the knowledge base of the given user ID and embedding model."""
+        from vector_store import embedding_space_collection, partition_collection
+        collection = "text_documents"
+        if self.knowledge_partition != "shared":
+            collection = partition_collection(collection, user_id)
+        return embedding_space_collection(collection, model, dimensions, self.vector_storage)
+
+    def get_vector_index(self):
+        """Get the ANN index configured for knowledge base collections."""
+        from vector_store import make_index
+        return make_index(
+            self.vector_index,
+            m=self.hnsw_m,
+            ef_construction=self.hnsw_ef_construction,
+            ef_search=self.hnsw_ef_search,
+            lists=self.ivfflat_lists,
+            probes=self.ivfflat_probes,
+        )
+
+    def get_vector_db_options(self) -> dict:
+        """Get the index, storage and search options of knowledge base vector stores."""
+        return dict(
+            index=self.get_vector_index(),
+            ef_search=self.hnsw_ef_search,
+            probes=self.ivfflat_probes,
+            storage=self.vector_storage,
+            quantization=self.vector_quantization,
+            rerank_factor=self.binary_rerank_factor,
+            search_mode=self.search_mode,
+            text_search_config=self.text_search_config,
+            hybrid_candidates=self.hybrid_candidates,
+            reranker=self.search_reranker,
+        )
+
+    def get_job_manager(self):
+        """Get the process-wide background job manager."""
+        from jobs import get_job_manager
+        # Data directory scans are slow by design (throttled), they run one at a time on their own worker.
+        return get_job_manager(
+            str(Path(self.default_storage_dir) / "jobs.json"), max_workers=self.job_workers, kind_workers={"index": 1}
+        )
+
+    def get_shell_executor(self):
+        """Get the process-wide executor of the shell tool."""
+        from tools.shell import get_shell_executor
+        return get_shell_executor(
+            max_workers=self.shell_workers,
+            timeout=self.shell_timeout,
+            cpu_seconds=self.shell_cpu_seconds or None,
+            memory_bytes=self.shell_memory_mb * 1024 * 1024 or None,
+            max_output_bytes=self.shell_max_output_kb * 1024,
+        )
+
+    def get_sympy_evaluator(self):
+        """Get the process-wide evaluator of the math tool."""
+        from tools.math_worker import get_sympy_evaluator
+        return get_sympy_evaluator(
+            workers=self.math_workers,
+            timeout=self.math_timeout,
+            memory_bytes=self.math_memory_mb * 1024 * 1024 or None,
+        )
+
+    def get_crawler(self):
+        """Get a website crawler configured from the settings."""
+        from crawler import ValidatorStore, WebsiteCrawler
+        from resources import get_or_create
+        path = str(Path(self.default_storage_dir) / "crawl_validators.json")
+        return WebsiteCrawler(
+            max_depth=self.crawl_max_depth,
+            max_pages=self.crawl_max_pages,
+            per_host_concurrency=self.crawl_host_concurrency,
+            delay=self.crawl_delay_ms / 1000,
+            validators=get_or_create(("crawl_validators", path), lambda: ValidatorStore(path)),
+        )
+
     def render_settings_ui(self):
         """Render the settings UI in Streamlit."""
         st.header("Settings")
@@ -27,6 +210,44 @@ class Settings:
         st.text(f"Default LLM Model: {self.default_llm_model}")
         st.text(f"Default Embeddings Model: {self.default_embeddings_model}")
         st.text(f"Feature Model Manager Enabled: {self.feature_model_manager}")
+        st.text(f"Chat Storage Backend: {self.chat_storage_backend}")
+        st.text(f"Chat Cache Size: {self.chat_cache_max_mb} MB")
+        st.text(f"Chat Write-Behind Enabled: {self.chat_write_behind}")
+        st.text(f"Stream Flush Interval: {self.stream_flush_interval_ms} ms")
+        st.text(f"Transcript Page Size: {self.transcript_page_size} messages")
+        st.text(f"Model Catalogue TTL: {self.model_catalogue_ttl} s")
+        st.text(f"Ollama Keep-Alive: {self.ollama_keep_alive or 'Ollama default'} (warm-up {self.model_warm_up})")
+        st.text(f"Database Pool Size: {self.db_pool_size} (+{self.db_max_overflow} overflow)")
+        st.text(f"Embedding Batch Size: {self.embed_batch_size} (concurrency {self.embed_concurrency})")
+        st.text(f"Embedding Cache: {self.embedding_cache_path} ({self.embedding_cache_max_mb} MB)")
+        st.text(f"Search Mode: {self.search_mode} (re-ranker {self.search_reranker}, {self.hybrid_candidates} candidates, "
+                f"text search config {self.text_search_config})")
+        st.text(f"Knowledge Base Partitioning: {self.knowledge_partition}")
+        st.text(f"Embedding Dimensions: {self.embedding_dimensions or 'from model'}")
+        st.text(f"Vector Storage: {self.vector_storage} (quantization {self.vector_quantization}, "
+                f"re-rank factor {self.binary_rerank_factor})")
+        st.text(f"Vector Index: {self.vector_index} (HNSW m={self.hnsw_m}, ef_construction={self.hnsw_ef_construction}, "
+                f"ef_search={self.hnsw_ef_search}; IVFFlat lists={self.ivfflat_lists or 'auto'}, probes={self.ivfflat_probes})")
+        st.text(f"Background Job Workers: {self.job_workers} (plus 1 for data directory scans)")
+        st.text(f"Shell Tool: {self.shell_workers} workers, {self.shell_timeout} s timeout, "
+                f"{self.shell_cpu_seconds or 'unlimited'} s CPU, {self.shell_memory_mb or 'unlimited'} MB memory, "
+                f"{self.shell_max_output_kb} KB output")
+        st.text(f"File Index Max Age: {self.file_index_max_age} s")
+        watch_interval = f"every {self.data_watch_interval} s" if self.data_watch_interval > 0 else "disabled"
+        st.text(f"Data Directory Indexing: {watch_interval}, {self.data_watch_max_kb_per_s or 'unlimited'} KB/s, "
+                f"files up to {self.data_watch_max_file_mb} MB")
+        st.text(f"Math Tool: {self.math_workers} workers, {self.math_timeout} s timeout, "
+                f"{self.math_memory_mb or 'unlimited'} MB memory")
+        st.text(f"Crawl Limits: depth {self.crawl_max_depth}, {self.crawl_max_pages} pages, "
+                f"{self.crawl_host_concurrency} per host, {self.crawl_delay_ms} ms delay")
+
+        from resources import resource_stats
+        st.subheader("Shared Resources")
+        st.json(resource_stats())
+
+        from storage import run_cache
+        st.subheader("Chat History Cache")
+        st.json(run_cache.stats())
 
     def set_user_id(self, user_id):
         # Set user_id in session state
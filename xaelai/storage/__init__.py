@@ -0,0 +1,47 @@
+from typing import Optional, Set
+
+from .cache import RunCache, run_cache
+from .codecs import Codec, YamlCodec, JsonCodec, MsgpackCodec
+from .yaml_storage import GenericFileStorageBase, RunSummary, YamlStorage, JsonStorage, MsgpackStorage
+from .jsonl_storage import JsonLinesStorage
+from .write_behind import WriteBehindQueue, write_behind_queue
+
+STORAGE_BACKENDS = {
+    "yaml": YamlStorage,
+    "json": JsonStorage,
+    "msgpack": MsgpackStorage,
+    "jsonl": JsonLinesStorage,
+}
+
+# Directories whose YAML runs have already been migrated in this process.
+_migrated_dirs: Set[str] = set()
+
+
+def get_storage(
+    storage_dir: str,
+    backend: str = "yaml",
+    cache_max_bytes: Optional[int] = None,
+    write_behind: bool = False,
+) -> GenericFileStorageBase:
+    """
+    Create the chat history storage for the given backend.
+
+    When the append-only ``jsonl`` backend is selected, existing YAML runs in the same
+    directory are copied over the first time the directory is opened.
+
+    :param storage_dir: The directory holding the run files.
+    :param backend: One of the keys of STORAGE_BACKENDS.
+    :param cache_max_bytes: Optional memory budget for the shared run cache.
+    :param write_behind: Persist upserts on a background thread.
+    :return: A storage instance.
+    """
+    if cache_max_bytes is not None:
+        run_cache.max_bytes = cache_max_bytes
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown chat storage backend '{backend}'. Expected one of {list(STORAGE_BACKENDS)}")
+    storage = STORAGE_BACKENDS[backend](storage_dir=storage_dir)
+    storage.write_behind = write_behind
+    if isinstance(storage, JsonLinesStorage) and str(storage_dir) not in _migrated_dirs:
+        storage.migrate_from(YamlStorage(storage_dir=storage_dir))
+        _migrated_dirs.add(str(storage_dir))
+    return storage
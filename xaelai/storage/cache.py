@@ -0,0 +1,106 @@
+from typing import Optional, Dict, Tuple
+from collections import OrderedDict
+import threading
+
+from phi.assistant.run import AssistantRun
+
+
+class RunCache:
+    """
+    RunCache is a process-wide, size-bounded LRU cache of deserialized runs.
+
+    Entries are keyed by run file path and validated against the file's mtime and size,
+    so a run changed on disk by another process is parsed again. The memory budget is
+    approximated by the on-disk size of the cached run files. Callers always get a deep
+    copy, since the Assistant mutates the runs it loads.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, AssistantRun]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, mtime: float, size: int) -> Optional[AssistantRun]:
+        """
+        Get a copy of the cached run if the file has not changed since it was cached.
+
+        :param key: The run file path.
+        :param mtime: The current mtime of the file.
+        :param size: The current size of the file.
+        :return: A copy of the cached AssistantRun, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != mtime or entry[1] != size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[2].model_copy(deep=True)
+
+    def put(self, key: str, run: AssistantRun, mtime: float, size: int) -> None:
+        """
+        Cache a copy of the run, evicting least recently used runs to stay within budget.
+
+        :param key: The run file path.
+        :param run: The run to cache.
+        :param mtime: The mtime of the file the run was read from or written to.
+        :param size: The size of that file.
+        """
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+        run = run.model_copy(deep=True)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (mtime, size, run)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop the cached run for the given file path.
+
+        :param key: The run file path.
+        """
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        """Drop all cached runs and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the cache counters.
+
+        :return: A dict with hits, misses, hit_rate, evictions, entries and bytes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+            }
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+
+# Shared by every file storage in the process, i.e. by all Streamlit sessions.
+run_cache = RunCache()
@@ -0,0 +1,78 @@
+from typing import Any
+from datetime import datetime
+import json
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    # PyYAML built without LibYAML, fall back to the pure Python implementation.
+    from yaml import SafeLoader, SafeDumper
+
+
+def _encode_datetime(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+class Codec:
+    """
+    Codec turns run data into bytes or text on a file object and back.
+
+    ``binary`` tells the storage whether to open files in binary mode.
+    """
+
+    binary: bool = False
+
+    def dump(self, data: dict, file) -> None:
+        raise NotImplementedError
+
+    def load(self, file) -> dict:
+        raise NotImplementedError
+
+
+class YamlCodec(Codec):
+    """YAML codec using the LibYAML C loader and dumper when PyYAML was built with them."""
+
+    def dump(self, data: dict, file) -> None:
+        yaml.dump(data, file, Dumper=SafeDumper)
+
+    def load(self, file) -> dict:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+class JsonCodec(Codec):
+    """JSON codec. Datetimes are written as ISO 8601 strings."""
+
+    def dump(self, data: dict, file) -> None:
+        json.dump(data, file, default=_encode_datetime)
+
+    def load(self, file) -> dict:
+        content = file.read()
+        if not content.strip():
+            return None
+        return json.loads(content)
+
+
+class MsgpackCodec(Codec):
+    """Compact binary codec using MessagePack. Datetimes are written as ISO 8601 strings."""
+
+    binary = True
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("`msgpack` not installed. Please install using `pip install msgpack`")
+        self.msgpack = msgpack
+
+    def dump(self, data: dict, file) -> None:
+        file.write(self.msgpack.packb(data, default=_encode_datetime, use_bin_type=True))
+
+    def load(self, file) -> dict:
+        content = file.read()
+        if not content:
+            return None
+        return self.msgpack.unpackb(content, raw=False)
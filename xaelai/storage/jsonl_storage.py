@@ -0,0 +1,206 @@
+from typing import Optional, List, Dict, Any
+import threading
+import json
+import uuid
+
+from .codecs import _encode_datetime
+from .yaml_storage import GenericFileStorageBase
+
+
+def _normalize(data: dict) -> dict:
+    """Round-trip data through JSON so it compares equal to what is replayed from disk."""
+    return json.loads(json.dumps(data, default=_encode_datetime))
+
+
+def diff_run_data(old: Any, new: Any, path: Optional[List[str]] = None, delta: Optional[Dict[str, list]] = None) -> Dict[str, list]:
+    """
+    Compute the delta that turns old into new.
+
+    Dicts are compared key by key, lists that only grew are recorded as extensions,
+    and anything else that changed is replaced wholesale.
+
+    :param old: The previously persisted data.
+    :param new: The data to persist.
+    :return: A dict with "set", "extend" and "unset" operations keyed by path.
+    """
+    path = path or []
+    if delta is None:
+        delta = {"set": [], "extend": [], "unset": []}
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                delta["unset"].append(path + [key])
+        for key, value in new.items():
+            if key not in old:
+                delta["set"].append([path + [key], value])
+            else:
+                diff_run_data(old[key], value, path + [key], delta)
+    elif isinstance(old, list) and isinstance(new, list) and new[:len(old)] == old:
+        if len(new) > len(old):
+            delta["extend"].append([path, new[len(old):]])
+    elif old != new:
+        delta["set"].append([path, new])
+    return delta
+
+
+def apply_run_delta(data: Any, delta: Dict[str, list]) -> Any:
+    """
+    Apply a delta produced by diff_run_data.
+
+    :param data: The data to update in place.
+    :param delta: The delta record.
+    :return: The updated data.
+    """
+    for path, value in delta.get("set", []):
+        if not path:
+            data = value
+            continue
+        parent = data
+        for key in path[:-1]:
+            parent = parent[key]
+        parent[path[-1]] = value
+    for path, items in delta.get("extend", []):
+        target = data
+        for key in path:
+            target = target[key]
+        target.extend(items)
+    for path in delta.get("unset", []):
+        parent = data
+        for key in path[:-1]:
+            parent = parent[key]
+        parent.pop(path[-1], None)
+    return data
+
+
+class _LogState:
+    """What was last persisted for a run log, shared across storage instances."""
+
+    def __init__(self, data: dict, deltas: int, size: int):
+        self.data = data
+        self.deltas = deltas
+        self.size = size
+
+
+_log_states: Dict[str, _LogState] = {}
+_log_lock = threading.RLock()
+
+
+class JsonLinesStorage(GenericFileStorageBase):
+    """
+    JsonLinesStorage keeps each run as an append-only JSON Lines log.
+
+    The first record of a log is a full snapshot of the run; every upsert after that
+    appends only what changed (usually the new chat and llm messages). Once a log holds
+    ``compact_after`` deltas it is rewritten as a single snapshot.
+    """
+
+    def __init__(self, storage_dir: str, compact_after: int = 50):
+        super().__init__(storage_dir, "jsonl")
+        self.compact_after = compact_after
+
+    def migrate_from(self, source: GenericFileStorageBase, delete_source: bool = False) -> int:
+        """
+        Copy runs from another file storage that are not yet present in this one.
+
+        :param source: The storage to migrate from, e.g. a YamlStorage on the same directory.
+        :param delete_source: Delete the source file once its run has been copied.
+        :return: The number of runs migrated.
+        """
+        migrated = 0
+        for run_id in source.get_all_run_ids():
+            if (self.storage_dir / f"{run_id}.{self.file_extension}").exists():
+                continue
+            row = source.read(run_id)
+            if row is None:
+                continue
+            self.upsert(row)
+            migrated += 1
+            if delete_source:
+                source.delete(run_id)
+        return migrated
+
+    def _read_data(self, file_path) -> Optional[dict]:
+        state = self._replay(file_path)
+        return state.data if state is not None else None
+
+    def _write_data(self, file_path, data: dict) -> None:
+        data = _normalize(data)
+        with _log_lock:
+            state = _log_states.get(str(file_path))
+            size = file_path.stat().st_size if file_path.exists() else None
+            if state is None or size != state.size:
+                state = self._replay(file_path)
+            if state is None or size != state.size or state.deltas >= self.compact_after:
+                # Nothing to append to, a truncated tail to repair, or time to compact.
+                self._write_snapshot(file_path, data)
+                return
+            delta = diff_run_data(state.data, data)
+            if not any(delta.values()):
+                return
+            line = json.dumps(delta) + "\n"
+            with file_path.open('a') as file:
+                file.write(line)
+            _log_states[str(file_path)] = _LogState(data, state.deltas + 1, state.size + len(line.encode()))
+
+    def _write_snapshot(self, file_path, data: dict) -> None:
+        """
+        Replace the log with a single snapshot record.
+
+        The snapshot is written next to the log and renamed over it, so a crash during
+        compaction leaves the previous log intact.
+
+        :param file_path: The path of the run log.
+        :param data: The normalized run data.
+        """
+        line = json.dumps({"snapshot": data}) + "\n"
+        tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open('w') as file:
+                file.write(line)
+            tmp_path.rename(file_path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        _log_states[str(file_path)] = _LogState(data, 0, len(line.encode()))
+
+    def _replay(self, file_path) -> Optional[_LogState]:
+        """
+        Rebuild the run data by replaying its log.
+
+        A truncated final record, as left behind by a crash mid-append, is ignored.
+
+        :param file_path: The path of the run log.
+        :return: The replayed state, or None if the log is missing or has no snapshot.
+        """
+        if not file_path.exists():
+            return None
+        data = None
+        deltas = 0
+        size = 0
+        with file_path.open('r') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Warning: Ignoring truncated record in {file_path}")
+                    break
+                size += len(line.encode())
+                if "snapshot" in record:
+                    data = record["snapshot"]
+                    deltas = 0
+                elif data is not None:
+                    data = apply_run_delta(data, record)
+                    deltas += 1
+        if data is None:
+            return None
+        state = _LogState(data, deltas, size)
+        with _log_lock:
+            _log_states[str(file_path)] = _LogState(_normalize(data), deltas, size)
+        return state
+
+    def delete(self, run_id: str) -> None:
+        file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
+        with _log_lock:
+            _log_states.pop(str(file_path), None)
+        super().delete(run_id)
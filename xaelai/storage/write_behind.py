@@ -0,0 +1,92 @@
+from typing import Optional, Dict, Tuple
+import atexit
+import threading
+
+from phi.assistant.run import AssistantRun
+from phi.utils.log import logger
+
+
+class WriteBehindQueue:
+    """
+    WriteBehindQueue persists runs on a background thread.
+
+    Upserts are keyed by run file path, so repeated upserts of the same run that arrive
+    while it is waiting are coalesced into a single write of the latest version. Runs
+    that are queued or being written can still be read through ``pending``. The queue is
+    flushed when the interpreter exits.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Tuple[object, AssistantRun]] = {}
+        self._in_flight: Dict[str, AssistantRun] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, storage, key: str, row: AssistantRun) -> None:
+        """
+        Queue a run to be persisted by storage._persist.
+
+        :param storage: The storage that will write the run.
+        :param key: The run file path.
+        :param row: The run to write. It must not be mutated afterwards.
+        """
+        with self._condition:
+            self._pending.pop(key, None)
+            self._pending[key] = (storage, row)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self, key: str) -> Optional[AssistantRun]:
+        """
+        Get the newest queued or in-flight version of a run.
+
+        :param key: The run file path.
+        :return: The run, or None if nothing is waiting to be written.
+        """
+        with self._condition:
+            if key in self._pending:
+                return self._pending[key][1]
+            return self._in_flight.get(key)
+
+    def cancel(self, key: str) -> None:
+        """
+        Drop a queued write and wait for an in-flight write of the same run to finish.
+
+        :param key: The run file path.
+        """
+        with self._condition:
+            self._pending.pop(key, None)
+            while key in self._in_flight:
+                self._condition.wait()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued write has been persisted.
+
+        :param timeout: Optional number of seconds to wait.
+        :return: True if the queue drained, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._in_flight, timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                key = next(iter(self._pending))
+                storage, row = self._pending.pop(key)
+                self._in_flight[key] = row
+            try:
+                storage._persist(row)
+            except Exception as e:
+                logger.error(f"Failed to write run {row.run_id}: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight.pop(key, None)
+                    self._condition.notify_all()
+
+
+write_behind_queue = WriteBehindQueue()
+atexit.register(write_behind_queue.flush)
@@ -1,11 +1,49 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
+from dataclasses import dataclass, asdict
+import threading
+import uuid
 from upath import UPath
-import yaml
 import json
 from phi.assistant.run import AssistantRun
 
 from phi.storage.assistant.base import AssistantStorage
 
+from .codecs import Codec, YamlCodec, JsonCodec, MsgpackCodec
+from .cache import RunCache, run_cache
+from .write_behind import write_behind_queue
+
+
+@dataclass
+class RunSummary:
+    """
+    Lightweight description of a stored run, kept in the storage index so that
+    listings do not need to deserialize the full chat history.
+    """
+
+    run_id: str
+    run_name: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    message_count: int = 0
+    mtime: Optional[float] = None
+    size: Optional[int] = None
+
+
+# One lock per index file, shared by every storage instance in the process.
+_index_locks: Dict[str, threading.Lock] = {}
+_index_locks_guard = threading.Lock()
+
+
+def _get_index_lock(index_path) -> threading.Lock:
+    with _index_locks_guard:
+        return _index_locks.setdefault(str(index_path), threading.Lock())
+
+
+# The last loaded or written index per file, with the file's (mtime, size) at that time.
+# Only accessed under the file's index lock.
+_index_cache: Dict[str, Tuple[Tuple[float, int], Dict[str, "RunSummary"]]] = {}
+
+
 class GenericFileStorageBase(AssistantStorage):
     """
     GenericFileStorageBase is a base class for managing assistant runs using file storage.
@@ -13,13 +51,31 @@ class GenericFileStorageBase(AssistantStorage):
     in-memory, S3, WebDAV, and more. Universal Pathlib extends the pathlib API to work
     with different filesystems via fsspec, allowing seamless integration with various
     storage protocols.
-    Subclasses should implement specific serialization and deserialization methods.
+    Subclasses either pass a Codec or implement specific serialization and
+    deserialization methods.
+
+    A small JSON index (``.<extension>.index``) is kept next to the run files. It is
+    updated by ``upsert``/``delete`` and reconciled against file mtimes and sizes by
+    ``list_run_summaries``, so runs changed outside this class are picked up too.
+
+    Deserialized runs are kept in a RunCache shared by all storages in the process,
+    validated against file mtime and size on every read.
+
+    With ``write_behind`` enabled, upserts return immediately and the run is written
+    by a background thread; reads see the queued version until it has been written.
+    Files are written to a temporary file and renamed into place, so a crash never
+    leaves a truncated run behind.
     """
 
-    def __init__(self, storage_dir: str, file_extension: str):
+    def __init__(self, storage_dir: str, file_extension: str, codec: Optional[Codec] = None, cache: Optional[RunCache] = run_cache, write_behind: bool = False):
         self.storage_dir = UPath(storage_dir)
         self.file_extension = file_extension
+        self.codec = codec
+        self.cache = cache
+        self.write_behind = write_behind
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.storage_dir / f".{file_extension}.index"
+        self._index_lock = _get_index_lock(self.index_path)
 
     def create(self, run_id: str) -> None:
         """
@@ -48,9 +104,9 @@ class GenericFileStorageBase(AssistantStorage):
         """
         runs = []
         for file_path in self.storage_dir.glob(f"*.{self.file_extension}"):
-            with file_path.open('r') as file:
-                data = self.deserialize(file)
-                runs.append(AssistantRun(**data))
+            run = self.read(file_path.stem)
+            if run is not None:
+                runs.append(run)
         return runs
 
     def read(self, run_id: str) -> Optional[AssistantRun]:
@@ -61,16 +117,30 @@ class GenericFileStorageBase(AssistantStorage):
         :return: An AssistantRun object if found, otherwise None.
         """
         file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
-        if file_path.exists():
-            with file_path.open('r') as file:
-                data = self.deserialize(file)
-                try:
-                    return AssistantRun(**data)
-                except TypeError as e:
-                    print(f"Error creating AssistantRun: {e}")
-                    print(f"Data: {data}")
-                    return None
-        return None
+        pending = write_behind_queue.pending(str(file_path))
+        if pending is not None:
+            return pending.model_copy(deep=True)
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+        if self.cache is not None:
+            run = self.cache.get(str(file_path), stat.st_mtime, stat.st_size)
+            if run is not None:
+                return run
+        data = self._read_data(file_path)
+        if data is None:
+            print(f"Warning: No data found for run_id {run_id}")
+            return None
+        try:
+            run = AssistantRun(**data)
+        except TypeError as e:
+            print(f"Error creating AssistantRun: {e}")
+            print(f"Data: {data}")
+            return None
+        if self.cache is not None:
+            self.cache.put(str(file_path), run, stat.st_mtime, stat.st_size)
+        return run
 
     def upsert(self, row: AssistantRun) -> Optional[AssistantRun]:
         """
@@ -79,9 +149,28 @@ class GenericFileStorageBase(AssistantStorage):
         :param row: The AssistantRun object to upsert.
         :return: The upserted AssistantRun object.
         """
+        if self.write_behind:
+            file_path = self.storage_dir / f"{row.run_id}.{self.file_extension}"
+            write_behind_queue.submit(self, str(file_path), row.model_copy(deep=True))
+            return row
+        return self._persist(row)
+
+    def _persist(self, row: AssistantRun) -> AssistantRun:
+        """
+        Write the run and update the cache and index.
+
+        :param row: The AssistantRun object to write.
+        :return: The written AssistantRun object.
+        """
         file_path = self.storage_dir / f"{row.run_id}.{self.file_extension}"
-        with file_path.open('w') as file:
-            self.serialize(row.__dict__, file)
+        self._write_data(file_path, row.__dict__)
+        stat = file_path.stat()
+        if self.cache is not None:
+            self.cache.put(str(file_path), row, stat.st_mtime, stat.st_size)
+        with self._index_lock:
+            index = self._load_index()
+            index[row.run_id] = self._summarize(row.run_id, row, stat, index.get(row.run_id))
+            self._save_index(index)
         return row
 
     def delete(self, run_id: str) -> None:
@@ -91,102 +180,162 @@ class GenericFileStorageBase(AssistantStorage):
         :param run_id: The unique identifier for the run to delete.
         """
         file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
+        write_behind_queue.cancel(str(file_path))
+        if self.cache is not None:
+            self.cache.invalidate(str(file_path))
         if file_path.exists():
             file_path.unlink()
+        with self._index_lock:
+            index = self._load_index()
+            if index.pop(run_id, None) is not None:
+                self._save_index(index)
 
-    def serialize(self, data: dict, file) -> None:
+    def list_run_summaries(self, user_id: Optional[str] = None) -> List[RunSummary]:
         """
-        Serialize data to a file. To be implemented by subclasses.
+        List summaries of all runs without deserializing unchanged runs.
 
-        :param data: The data to serialize.
-        :param file: The file object to write to.
-        """
-        raise NotImplementedError
-
-    def deserialize(self, file) -> dict:
-        """
-        Deserialize data from a file. To be implemented by subclasses.
+        Only runs whose file mtime or size differ from the index are read again.
 
-        :param file: The file object to read from.
-        :return: The deserialized data.
+        :param user_id: Optional user identifier to filter runs.
+        :return: A list of RunSummary objects, newest run first.
         """
-        raise NotImplementedError
-    def create(self, run_id: str) -> None:
+        with self._index_lock:
+            index = self._load_index()
+            changed = False
+            files = {f.stem: f for f in self.storage_dir.glob(f"*.{self.file_extension}")}
+            for run_id in list(index):
+                if run_id not in files:
+                    del index[run_id]
+                    changed = True
+            for run_id, file_path in files.items():
+                stat = file_path.stat()
+                summary = index.get(run_id)
+                if summary is None or summary.mtime != stat.st_mtime or summary.size != stat.st_size:
+                    index[run_id] = self._summarize(run_id, self.read(run_id), stat, summary)
+                    changed = True
+            if changed:
+                self._save_index(index)
+        return sorted(index.values(), key=lambda summary: summary.run_id, reverse=True)
+
+    def _summarize(self, run_id: str, row: Optional[AssistantRun], stat, previous: Optional[RunSummary] = None) -> RunSummary:
         """
-        Create a new file for the given run_id.
+        Build the index entry for a run.
 
         :param run_id: The unique identifier for the run.
+        :param row: The run, or None if it could not be read.
+        :param stat: The stat result of the run file.
+        :param previous: The existing index entry, if any.
+        :return: A RunSummary for the run.
         """
-        file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
-        file_path.touch(exist_ok=True)
-
-    def get_all_run_ids(self, user_id: Optional[str] = None) -> List[str]:
+        summary = RunSummary(run_id=run_id, mtime=stat.st_mtime, size=stat.st_size)
+        if row is not None:
+            summary.run_name = row.run_name
+            memory = row.memory or {}
+            summary.message_count = len(memory.get("chat_history") or [])
+            summary.created_at = row.created_at.isoformat() if row.created_at else None
+            summary.updated_at = row.updated_at.isoformat() if row.updated_at else None
+        if summary.created_at is None and previous is not None:
+            summary.created_at = previous.created_at
+        return summary
+
+    def _load_index(self) -> Dict[str, RunSummary]:
         """
-        Get all run IDs from the storage.
+        Load the run index. A missing or corrupt index is treated as empty.
 
-        :param user_id: Optional user identifier to filter runs.
-        :return: A list of run IDs.
-        """
-        return [f.stem for f in self.storage_dir.glob(f"*.{self.file_extension}")]
+        The index is only parsed again when the file changed since this process last
+        loaded or wrote it.
 
-    def get_all_runs(self, user_id: Optional[str] = None) -> List[AssistantRun]:
+        :return: A mapping of run ID to RunSummary.
         """
-        Get all runs from the storage.
+        if not self.index_path.exists():
+            return {}
+        stat = self.index_path.stat()
+        cached = _index_cache.get(str(self.index_path))
+        if cached is not None and cached[0] == (stat.st_mtime, stat.st_size):
+            return dict(cached[1])
+        try:
+            with self.index_path.open('r') as file:
+                entries = json.load(file)
+            index = {entry["run_id"]: RunSummary(**entry) for entry in entries}
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Warning: Rebuilding corrupt run index {self.index_path}: {e}")
+            return {}
+        _index_cache[str(self.index_path)] = ((stat.st_mtime, stat.st_size), dict(index))
+        return index
+
+    def _save_index(self, index: Dict[str, RunSummary]) -> None:
+        """
+        Write the run index atomically, so readers never see a partly written index.
 
-        :param user_id: Optional user identifier to filter runs.
-        :return: A list of AssistantRun objects.
+        :param index: A mapping of run ID to RunSummary.
         """
-        runs = []
-        for file_path in self.storage_dir.glob(f"*.{self.file_extension}"):
-            with file_path.open('r') as file:
-                data = self.deserialize(file)
-                runs.append(AssistantRun(**data))
-        return runs
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open('w') as file:
+                json.dump([asdict(summary) for summary in index.values()], file)
+            tmp_path.rename(self.index_path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        stat = self.index_path.stat()
+        _index_cache[str(self.index_path)] = ((stat.st_mtime, stat.st_size), dict(index))
+
+    def _read_data(self, file_path) -> Optional[dict]:
+        """
+        Load the raw run data stored at file_path.
 
-    def read(self, run_id: str) -> Optional[AssistantRun]:
+        :param file_path: The path of the run file.
+        :return: The deserialized data, or None for an empty file.
         """
-        Read an entry from the storage.
+        with file_path.open('rb' if self.codec and self.codec.binary else 'r') as file:
+            return self.deserialize(file)
 
-        :param run_id: The unique identifier for the run.
-        :return: An AssistantRun object if found, otherwise None.
+    def _write_data(self, file_path, data: dict) -> None:
         """
-        file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
-        if file_path.exists():
-            with file_path.open('r') as file:
-                data = self.deserialize(file)
-                if data is not None:
-                    return AssistantRun(**data)
-                else:
-                    print(f"Warning: No data found for run_id {run_id}")
-                    return None
-        return None
+        Persist the raw run data to file_path atomically.
 
-    def upsert(self, row: AssistantRun) -> Optional[AssistantRun]:
+        :param file_path: The path of the run file.
+        :param data: The data to write.
         """
-        Update or insert an entry in the storage.
+        tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open('wb' if self.codec and self.codec.binary else 'w') as file:
+                self.serialize(data, file)
+            tmp_path.rename(file_path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
 
-        :param row: The AssistantRun object to upsert.
-        :return: The upserted AssistantRun object.
+    def serialize(self, data: dict, file) -> None:
         """
-        file_path = self.storage_dir / f"{row.run_id}.{self.file_extension}"
-        with file_path.open('w') as file:
-            self.serialize(row.__dict__, file)
-        return row
+        Serialize data to a file using the codec, or as implemented by subclasses.
 
-    def delete(self, run_id: str) -> None:
+        :param data: The data to serialize.
+        :param file: The file object to write to.
         """
-        Delete an entry from the storage.
+        if self.codec is None:
+            raise NotImplementedError
+        self.codec.dump(data, file)
 
-        :param run_id: The unique identifier for the run to delete.
+    def deserialize(self, file) -> dict:
         """
-        file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
-        if file_path.exists():
-            file_path.unlink()
+        Deserialize data from a file using the codec, or as implemented by subclasses.
 
+        :param file: The file object to read from.
+        :return: The deserialized data.
+        """
+        if self.codec is None:
+            raise NotImplementedError
+        return self.codec.load(file)
 
-from typing import Dict
 
 class YamlStorage(GenericFileStorageBase):
+    """
+    YamlStorage is a subclass of GenericFileStorageBase that uses YAML for serialization.
+    """
+
     def write(self, run_id: str, data: Dict) -> None:
         """
         Write data to a YAML file for the given run_id.
@@ -195,20 +344,10 @@ class YamlStorage(GenericFileStorageBase):
         :param data: The data to write to the file.
         """
         file_path = self.storage_dir / f"{run_id}.{self.file_extension}"
-        with file_path.open('w') as file:
-            self.serialize(data, file)
-    """
-    YamlStorage is a subclass of GenericFileStorageBase that uses YAML for serialization.
-    """
+        self._write_data(file_path, data)
 
     def __init__(self, storage_dir: str):
-        super().__init__(storage_dir, "yaml")
-
-    def serialize(self, data: dict, file) -> None:
-        yaml.safe_dump(data, file)
-
-    def deserialize(self, file) -> dict:
-        return yaml.safe_load(file)
+        super().__init__(storage_dir, "yaml", YamlCodec())
 
 
 class JsonStorage(GenericFileStorageBase):
@@ -217,10 +356,14 @@ class JsonStorage(GenericFileStorageBase):
     """
 
     def __init__(self, storage_dir: str):
-        super().__init__(storage_dir, "json")
+        super().__init__(storage_dir, "json", JsonCodec())
 
-    def serialize(self, data: dict, file) -> None:
-        json.dump(data, file)
 
-    def deserialize(self, file) -> dict:
-        return json.load(file)
+class MsgpackStorage(GenericFileStorageBase):
+    """
+    MsgpackStorage is a subclass of GenericFileStorageBase that uses MessagePack for
+    compact binary serialization. Requires the optional `msgpack` package.
+    """
+
+    def __init__(self, storage_dir: str):
+        super().__init__(storage_dir, "msgpack", MsgpackCodec())
@@ -0,0 +1,87 @@
+import time
+from typing import Callable, List
+
+
+class StreamingMarkdown:
+    """
+    Render a streamed markdown response without re-sending the whole text per token.
+
+    Deltas are buffered in a list and flushed on a time/size budget. On each flush the
+    text is split at the last paragraph break outside a code fence: the finished
+    paragraphs are rendered one final time into their own element and only the open
+    tail block is re-rendered from then on.
+
+    :param container: A Streamlit container (anything with an ``empty()`` method).
+    :param flush_interval: Minimum number of seconds between renders.
+    :param flush_chars: Render early once this many characters are buffered.
+    """
+
+    def __init__(self, container, flush_interval: float = 0.05, flush_chars: int = 2048, clock: Callable[[], float] = time.monotonic):
+        self.container = container
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.clock = clock
+        self._parts: List[str] = []
+        self._tail: List[str] = []
+        self._pending_chars = 0
+        self._last_flush = clock()
+        self._placeholder = container.empty()
+        # Counters for checking how much markdown is sent to the browser.
+        self.renders = 0
+        self.chars_rendered = 0
+
+    def write(self, delta: str) -> None:
+        """Buffer a delta and render if the time or size budget is exhausted."""
+        if not delta:
+            return
+        self._parts.append(delta)
+        self._tail.append(delta)
+        self._pending_chars += len(delta)
+        if self._pending_chars >= self.flush_chars or self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Render buffered deltas, committing finished paragraphs."""
+        if not self._pending_chars:
+            return
+        tail = "".join(self._tail)
+        split = _last_block_boundary(tail)
+        if split > 0:
+            self._render(tail[:split])
+            self._placeholder = self.container.empty()
+            tail = tail[split:]
+        self._tail = [tail] if tail else []
+        if tail:
+            self._render(tail)
+        self._pending_chars = 0
+        self._last_flush = self.clock()
+
+    def close(self) -> str:
+        """Render anything still buffered and return the full response."""
+        self.flush()
+        return "".join(self._parts)
+
+    def _render(self, text: str) -> None:
+        self._placeholder.markdown(text)
+        self.renders += 1
+        self.chars_rendered += len(text)
+
+
+def _last_block_boundary(text: str) -> int:
+    """
+    Find the end of the last blank line that is not inside a fenced code block.
+
+    :param text: Markdown text.
+    :return: The offset just after the boundary, or 0 if there is none.
+    """
+    boundary = 0
+    in_fence = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        offset += len(line)
+        stripped = line.strip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            in_fence = not in_fence
+        elif not stripped and not in_fence and line.endswith("\n") and offset > len(line):
+            boundary = offset
+    return boundary
@@ -0,0 +1,392 @@
+"""
+Index of the files in a user's data directory.
+
+The index records the path, size, modification time, type and content hash of every
+file. Refreshing it only stats the files and hashes those whose size or modification
+time changed, so it stays cheap on directories with thousands of files, and it reports
+what was added, changed and removed. It answers path searches from memory and reads
+files in slices: a range of lines, or the lines matching a pattern, so a tool never has
+to hand a multi-megabyte file to the LLM.
+"""
+import fnmatch
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class FileRecord:
+    """The indexed state of one file. path is relative to the index root, with / separators."""
+
+    def __init__(self, path: str, size: int, mtime: float, type: str, content_hash: str):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.type = type
+        self.content_hash = content_hash
+
+    @property
+    def is_text(self) -> bool:
+        return self.type.startswith("text/") or self.type in TEXT_TYPES
+
+    def to_dict(self) -> dict:
+        return {"path": self.path, "size": self.size, "mtime": self.mtime, "type": self.type, "content_hash": self.content_hash}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FileRecord":
+        return cls(data["path"], data["size"], data["mtime"], data["type"], data["content_hash"])
+
+
+# Types that are text although their MIME type is not text/*.
+TEXT_TYPES = {
+    "application/json", "application/xml", "application/javascript", "application/x-sh", "application/x-yaml",
+    "application/yaml", "application/toml", "application/sql", "application/x-ndjson",
+}
+
+
+class IndexChanges:
+    """Paths added, changed and removed by a refresh."""
+
+    def __init__(self, added: List[str], changed: List[str], removed: List[str]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def file_type(path: str, sample: bytes = b"") -> str:
+    """Guess a file's MIME type from its name, or from the start of its content for unknown names."""
+    guessed = mimetypes.guess_type(path)[0]
+    if guessed:
+        return guessed
+    # Logs, configs and the like: text unless the content has NUL bytes.
+    return "text/plain" if b"\0" not in sample else "application/octet-stream"
+
+
+def hash_file(path: Union[str, Path]) -> Tuple[str, bytes]:
+    """Hash a file's content, also returning its first block for type detection."""
+    digest = hashlib.sha256()
+    sample = b""
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sample = sample or block[:8192]
+            digest.update(block)
+    return digest.hexdigest(), sample
+
+
+def _read_line(file, limit: int) -> Optional[Tuple[str, int]]:
+    """
+    Read one line, holding at most limit characters of it in memory.
+
+    :return: The first limit characters of the line without its ending and the number
+        of characters left out, or None at the end of the file.
+    """
+    text = file.readline(limit + 1)
+    if not text:
+        return None
+    dropped, chunk = 0, text
+    while not chunk.endswith("\n"):
+        chunk = file.readline(HASH_BLOCK_SIZE)
+        if not chunk:
+            break
+        dropped += len(chunk.rstrip("\r\n"))
+    text = text.rstrip("\r\n")
+    if len(text) > limit:
+        dropped += len(text) - limit
+        text = text[:limit]
+    return text, dropped
+
+
+def _excerpt(text: str, dropped: int, limit: int, match: Optional[re.Match] = None) -> str:
+    """
+    Cut a line read with _read_line to limit characters, noting what was left out.
+
+    :param match: Keep the part of the line around this match, rather than its start.
+    """
+    if len(text) <= limit and not dropped:
+        return text
+    start = 0 if match is None else max(0, min(match.start() - limit // 4, len(text) - limit))
+    excerpt = text[start:start + limit]
+    remaining = len(text) - start - len(excerpt) + dropped
+    if start:
+        excerpt = f"[... {start} characters ...] " + excerpt
+    if remaining:
+        excerpt += f" [... line truncated, {remaining} more characters ...]"
+    return excerpt
+
+
+class FileIndex:
+    """
+    FileIndex keeps a FileRecord for every file under a directory.
+
+    :param root: The directory to index.
+    :param index_path: JSON file the index is persisted to, None to keep it in memory only.
+    :param exclude: Glob patterns of relative paths to leave out, e.g. "chat_history/*".
+    :param max_age: Seconds for which search and read calls use the index without refreshing it.
+    """
+
+    def __init__(self, root: Union[str, Path], index_path: Optional[Union[str, Path]] = None,
+                 exclude: Sequence[str] = (), max_age: float = 30.0):
+        self.root = Path(root)
+        self.index_path = Path(index_path) if index_path else None
+        self.exclude = list(exclude)
+        self.max_age = max_age
+        self.records: Dict[str, FileRecord] = {}
+        self.refreshed_at: Optional[float] = None
+        self._lock = threading.RLock()
+        # Serialises refreshes, which hash files without holding _lock.
+        self._refresh_lock = threading.Lock()
+        self._load()
+
+    def _excluded(self, relative: str) -> bool:
+        if self.index_path is not None and (self.root / relative) in (self.index_path, self._tmp_path()):
+            return True
+        return any(fnmatch.fnmatch(relative, pattern) for pattern in self.exclude)
+
+    def _walk(self) -> Iterator[Tuple[str, os.stat_result]]:
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                relative = Path(entry.path).relative_to(self.root).as_posix()
+                if self._excluded(relative):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield relative, entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+
+    def refresh(self, throttle: Optional[Callable[[int], None]] = None, wait: bool = True) -> IndexChanges:
+        """
+        Bring the index up to date with the directory.
+
+        Files whose size and modification time are unchanged are not read again. Files are
+        hashed without holding the lock of the records, so searches and reads are answered
+        from the previous state meanwhile.
+
+        :param throttle: Called with the size of each file after hashing it, and may sleep
+            to limit the rate at which files are read.
+        :param wait: Wait for a refresh that is already running, rather than return no changes.
+        :return: The paths that were added, changed and removed.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return IndexChanges([], [], [])
+        try:
+            with self._lock:
+                known = dict(self.records)
+            added, changed, seen = [], [], set()
+            updated: Dict[str, FileRecord] = {}
+            for relative, stat in self._walk():
+                seen.add(relative)
+                record = known.get(relative)
+                if record is not None and record.size == stat.st_size and record.mtime == stat.st_mtime:
+                    continue
+                try:
+                    content_hash, sample = hash_file(self.root / relative)
+                except OSError:
+                    # Removed or unreadable since the walk saw it.
+                    seen.discard(relative)
+                    continue
+                if throttle is not None:
+                    throttle(stat.st_size)
+                if record is not None and record.content_hash == content_hash:
+                    updated[relative] = FileRecord(relative, stat.st_size, stat.st_mtime, record.type, content_hash)
+                    continue
+                (added if record is None else changed).append(relative)
+                updated[relative] = FileRecord(relative, stat.st_size, stat.st_mtime, file_type(relative, sample), content_hash)
+            removed = [path for path in known if path not in seen]
+            with self._lock:
+                self.records.update(updated)
+                for path in removed:
+                    self.records.pop(path, None)
+                self.refreshed_at = time.monotonic()
+                self._save()
+            return IndexChanges(sorted(added), sorted(changed), sorted(removed))
+        finally:
+            self._refresh_lock.release()
+
+    def ensure_fresh(self) -> None:
+        """
+        Refresh the index if it is older than max_age.
+
+        Once the index has been refreshed, a refresh that is already running, such as a
+        throttled background scan, is not waited for: the previous state is used instead.
+        """
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.max_age:
+            self.refresh(wait=self.refreshed_at is None)
+
+    def _load(self) -> None:
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            records = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return
+        self.records = {data["path"]: FileRecord.from_dict(data) for data in records}
+
+    def _tmp_path(self) -> Path:
+        return self.index_path.with_name(self.index_path.name + ".tmp")
+
+    def _save(self) -> None:
+        if self.index_path is None:
+            return
+        tmp_path = self._tmp_path()
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps([record.to_dict() for record in self.records.values()]))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def get(self, path: str) -> Optional[FileRecord]:
+        """Get the record of a path relative to the root."""
+        self.ensure_fresh()
+        with self._lock:
+            return self.records.get(Path(path).as_posix().lstrip("/"))
+
+    def search(self, pattern: Optional[str] = None, substring: Optional[str] = None,
+               type: Optional[str] = None, limit: Optional[int] = 100) -> List[FileRecord]:
+        """
+        Find files by path.
+
+        :param pattern: Glob pattern the relative path must match, e.g. "logs/*.log" or "*.pdf".
+        :param substring: Text the path must contain, ignoring case.
+        :param type: MIME type, or its prefix such as "text/", the file must have.
+        :param limit: Maximum number of records to return, None for all.
+        :return: Matching records, sorted by path.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            records = list(self.records.values())
+        substring = substring.lower() if substring else None
+        matches = [
+            record for record in records
+            if (pattern is None or fnmatch.fnmatch(record.path, pattern))
+            and (substring is None or substring in record.path.lower())
+            and (type is None or record.type.startswith(type))
+        ]
+        return sorted(matches, key=lambda record: record.path)[:limit]
+
+    def resolve(self, path: str) -> Path:
+        """The absolute path of a file under the root; paths leading outside the root are refused."""
+        full_path = (self.root / path).resolve()
+        if not full_path.is_relative_to(self.root.resolve()):
+            raise PermissionError(f"{path} is outside of {self.root}")
+        if not full_path.is_file():
+            raise FileNotFoundError(f"File {path} not found in {self.root}")
+        return full_path
+
+    def read_lines(self, path: str, start: int = 1, count: int = 200, max_bytes: int = 64 * 1024) -> Tuple[List[str], bool]:
+        """
+        Read a range of lines of a text file without reading the rest of it.
+
+        A line longer than max_bytes, such as minified JSON, is cut to max_bytes characters
+        and ends with a note saying how much was left out. The first requested line is
+        always returned, so reading on from after the returned lines makes progress.
+
+        :param path: The file, relative to the root.
+        :param start: First line to read, counting from 1.
+        :param count: Maximum number of lines to read.
+        :param max_bytes: Maximum number of characters to return.
+        :return: The lines, without line endings, and whether the file continues after them.
+        """
+        lines, size = [], 0
+        with open(self.resolve(path), "r", errors="replace") as file:
+            number = 0
+            while True:
+                line = _read_line(file, max_bytes)
+                if line is None:
+                    return lines, False
+                number += 1
+                if number < start:
+                    continue
+                text, dropped = line
+                if len(lines) >= count or (lines and size + len(text) > max_bytes):
+                    return lines, True
+                if dropped:
+                    text += f" [... line truncated, {dropped} more characters ...]"
+                lines.append(text)
+                size += len(text)
+
+    def grep(self, pattern: str, path_pattern: str = "*", regex: bool = False, ignore_case: bool = True,
+             context: int = 0, max_matches: int = 50, max_line_bytes: int = 1000,
+             max_bytes: int = 64 * 1024) -> Tuple[List[Tuple[str, int, str]], bool]:
+        """
+        Find the lines of text files that contain a pattern.
+
+        Lines longer than max_line_bytes, such as minified JSON, are cut to an excerpt around
+        the match with a note of how much was left out. Only the first HASH_BLOCK_SIZE
+        characters of a line are searched.
+
+        :param pattern: The text, or regular expression if regex is True, to look for.
+        :param path_pattern: Glob pattern of the files to search.
+        :param regex: Treat pattern as a regular expression.
+        :param ignore_case: Match regardless of case.
+        :param context: Lines to include before and after each match.
+        :param max_matches: Stop after this many matching lines.
+        :param max_line_bytes: Maximum number of characters returned of each line.
+        :param max_bytes: Stop before the returned lines exceed this many characters.
+        :return: (path, line number, line) for matching lines and their context, in file order,
+            and whether the search stopped at max_matches or max_bytes.
+        """
+        expression = re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignore_case else 0)
+        results: List[Tuple[str, int, str]] = []
+        size = matches = 0
+
+        def add(path: str, number: int, text: str) -> bool:
+            nonlocal size
+            if results and size + len(text) > max_bytes:
+                return False
+            results.append((path, number, text))
+            size += len(text)
+            return True
+
+        for record in self.search(pattern=path_pattern, limit=None):
+            if not record.is_text:
+                continue
+            before: List[Tuple[int, str]] = []
+            after = 0
+            try:
+                file = open(self.root / record.path, "r", errors="replace")
+            except OSError:
+                continue
+            with file:
+                number = 0
+                while True:
+                    line = _read_line(file, HASH_BLOCK_SIZE)
+                    if line is None:
+                        break
+                    number += 1
+                    text, dropped = line
+                    match = expression.search(text)
+                    if match:
+                        for n, excerpt in before + [(number, _excerpt(text, dropped, max_line_bytes, match))]:
+                            if not add(record.path, n, excerpt):
+                                return results, True
+                        before, after = [], context
+                        matches += 1
+                    elif after:
+                        if not add(record.path, number, _excerpt(text, dropped, max_line_bytes)):
+                            return results, True
+                        after -= 1
+                    elif context:
+                        before = (before + [(number, _excerpt(text, dropped, max_line_bytes))])[-context:]
+                    if matches >= max_matches and not after:
+                        return results, True
+        return results, False
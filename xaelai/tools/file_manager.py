@@ -5,19 +5,41 @@ class FileManager:
     def __init__(self, user_id: str):
         settings = Settings()
         self.base_dir = settings.get_user_data_dir(user_id)
+        self.index = settings.get_file_index(user_id)
 
     def list_files(self):
         """List all files in the base directory."""
         return [f for f in self.base_dir.iterdir() if f.is_file()]
 
-    def read_file(self, file_name: str) -> str:
-        """Read the contents of a file."""
-        file_path = self.base_dir / file_name
-        if file_path.exists() and file_path.is_file():
-            with file_path.open('r') as file:
-                return file.read()
-        else:
-            raise FileNotFoundError(f"File {file_name} not found in {self.base_dir}")
+    def search_files(self, pattern: str = "*", substring: str = "", file_type: str = "", limit: int = 50) -> list:
+        """Find files anywhere in the user's directory tree.
+        pattern is a glob on the relative path, like "*.pdf" or "logs/*", substring must appear in the path,
+        file_type is a MIME type or prefix like "text/". Returns path, size, modification time and type of each file.
+        """
+        records = self.index.search(pattern=pattern or None, substring=substring or None, type=file_type or None, limit=limit)
+        return [{"path": r.path, "size": r.size, "mtime": r.mtime, "type": r.type} for r in records]
+
+    def read_file(self, file_name: str, start_line: int = 1, max_lines: int = 200) -> str:
+        """Read the contents of a file, max_lines lines at a time starting at start_line.
+        If the file continues, the result ends with a note saying which start_line to read next.
+        """
+        lines, more = self.index.read_lines(file_name, start=start_line, count=max_lines)
+        text = "\n".join(lines)
+        if more:
+            next_line = start_line + len(lines)
+            text += f"\n[... file continues, read again with start_line={next_line} ...]"
+        return text
+
+    def grep_files(self, pattern: str, path_pattern: str = "*", regex: bool = False, context: int = 0) -> str:
+        """Find lines containing pattern in the text files matching path_pattern, ignoring case.
+        Returns "path:line: text" lines; context adds that many lines around each match.
+        Long lines are shortened to the part around the match, and the output is limited in size.
+        """
+        matches, truncated = self.index.grep(pattern, path_pattern=path_pattern, regex=regex, context=context)
+        text = "\n".join(f"{path}:{number}: {line}" for path, number, line in matches) or "No matches"
+        if truncated:
+            text += "\n[... output limited, there may be more matches: narrow pattern or path_pattern ...]"
+        return text
 
     def delete_file(self, file_name: str) -> None:
         """Delete a file."""
@@ -1,45 +1,267 @@
-import os
+"""
+Home Assistant tools, answered from a local mirror of Home Assistant's state.
+
+The mirror loads all entity states and the area of each entity once, then keeps them
+current from the websocket API's ``state_changed`` events, so tool calls are answered
+from memory instead of fetching and filtering every entity. Entities are indexed by
+domain and by area. If the websocket client (tornado, installed with streamlit) is not
+available, the mirror reloads over the REST API when it is older than ``max_age``.
+"""
+import asyncio
 import json
-import requests
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from phi.utils.log import logger
 
 hass_token = os.getenv('HASS_TOKEN')
 hass_url = os.getenv('HASS_URL')
 
-headers = {
-    "Authorization": f"Bearer {hass_token}",
-    "Content-Type": "application/json"
-}
-
 included_device_classes = os.getenv('INCLUDED_DEVICE_CLASSES', 'light,switch,climate,cover,media_player,fan,lock,scene').split(',')
 
-def get_areas():
-    """Retrieve the list of areas using the template API."""
-    template_payload = {"template": "{{ areas() }}"}
-    response = requests.post(f"{hass_url}/api/template", headers=headers, json=template_payload)
-    return response.json()
+# Renders [[area name, [entity ids]], ...] as JSON.
+AREAS_TEMPLATE = (
+    "{% set ns = namespace(areas=[]) %}"
+    "{% for area in areas() %}{% set ns.areas = ns.areas + [[area_name(area), area_entities(area)]] %}{% endfor %}"
+    "{{ ns.areas | tojson }}"
+)
 
-print(get_areas())
+# Events after which the area of an entity may have changed.
+REGISTRY_EVENTS = ("area_registry_updated", "device_registry_updated", "entity_registry_updated")
 
 
-def list_devices():
-    """List actual devices, excluding specified device classes."""
-    # Get the areas
-    response = requests.get(f"{hass_url}/states", headers=headers)
-    devices = []
-    for entity in response.json():
-        # Skip entities with device_class firmware
+def base_url(url: str) -> str:
+    """Normalise a Home Assistant URL, given with or without the /api suffix, to its root."""
+    url = url.rstrip("/")
+    return url[:-len("/api")] if url.endswith("/api") else url
+
+
+def websocket_url(url: str) -> str:
+    """The websocket API URL of a Home Assistant instance."""
+    root = base_url(url)
+    return ("wss://" + root[len("https://"):] if root.startswith("https://") else "ws://" + root[len("http://"):]) + "/api/websocket"
+
+
+class HomeAssistantMirror:
+    """
+    An in-memory copy of Home Assistant's entity states.
+
+    :param url: The Home Assistant URL, with or without /api.
+    :param token: A long-lived access token.
+    :param timeout: Timeout of REST requests and the websocket handshake, in seconds.
+    :param max_age: Seconds after which the states are reloaded when no event stream is running.
+    """
+
+    def __init__(self, url: str, token: str, timeout: float = 10.0, max_age: float = 60.0):
+        self.url = base_url(url)
+        self.token = token
+        self.timeout = timeout
+        self.max_age = max_age
+        import httpx
+
+        self.client = httpx.Client(
+            base_url=self.url,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            timeout=timeout,
+        )
+        self.states: Dict[str, dict] = {}
+        self.by_domain: Dict[str, Set[str]] = {}
+        self.by_area: Dict[str, Set[str]] = {}
+        self.area_of: Dict[str, str] = {}
+        self.loaded_at: Optional[float] = None
+        self.subscribed = False
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def load(self) -> None:
+        """Load all states and areas over the REST API."""
+        response = self.client.get("/api/states")
+        response.raise_for_status()
+        states = response.json()
+        areas = self.fetch_areas()
+        with self._lock:
+            self.states = {}
+            self.by_domain = {}
+            for state in states:
+                self._set_state(state)
+            self._set_areas(areas)
+            self.loaded_at = time.monotonic()
+
+    def fetch_areas(self) -> List[list]:
+        response = self.client.post("/api/template", json={"template": AREAS_TEMPLATE})
+        response.raise_for_status()
+        return json.loads(response.text)
+
+    def _set_state(self, state: dict) -> None:
+        entity_id = state["entity_id"]
+        self.states[entity_id] = state
+        self.by_domain.setdefault(entity_id.split(".")[0], set()).add(entity_id)
+
+    def _remove_state(self, entity_id: str) -> None:
+        self.states.pop(entity_id, None)
+        domain = self.by_domain.get(entity_id.split(".")[0])
+        if domain is not None:
+            domain.discard(entity_id)
+
+    def _set_areas(self, areas: List[list]) -> None:
+        self.by_area = {name: set(entities) for name, entities in areas}
+        self.area_of = {entity_id: name for name, entities in areas for entity_id in entities}
+
+    def apply_event(self, event: dict) -> None:
+        """Apply an event from the websocket API to the mirror."""
+        if event.get("event_type") == "state_changed":
+            data = event.get("data", {})
+            with self._lock:
+                if data.get("new_state") is None:
+                    self._remove_state(data["entity_id"])
+                else:
+                    self._set_state(data["new_state"])
+        elif event.get("event_type") in REGISTRY_EVENTS:
+            areas = self.fetch_areas()
+            with self._lock:
+                self._set_areas(areas)
+
+    def ensure_current(self) -> None:
+        """Load the mirror if it is empty, or stale while no event stream keeps it current."""
+        if self.loaded_at is None or (not self.subscribed and time.monotonic() - self.loaded_at > self.max_age):
+            self.load()
+
+    def entities(self, domains: Optional[List[str]] = None, area: Optional[str] = None) -> List[dict]:
+        """
+        List entity states.
+
+        :param domains: Only entities of these domains, e.g. ["light", "switch"].
+        :param area: Only entities in the area with this name (case-insensitive).
+        :return: The states, sorted by entity id.
+        """
+        self.ensure_current()
+        with self._lock:
+            if domains is None:
+                entity_ids = set(self.states)
+            else:
+                entity_ids = set().union(*(self.by_domain.get(domain, set()) for domain in domains))
+            if area is not None:
+                in_area = next((ids for name, ids in self.by_area.items() if name.lower() == area.lower()), set())
+                entity_ids &= in_area
+            return [self.states[entity_id] for entity_id in sorted(entity_ids)]
+
+    def areas(self) -> List[str]:
+        self.ensure_current()
+        with self._lock:
+            return sorted(self.by_area)
+
+    def start(self) -> bool:
+        """
+        Keep the mirror current from the websocket event stream, on a background thread.
+
+        :return: False if no websocket client is installed; the mirror then reloads after max_age.
+        """
         try:
-            if not any(entity['entity_id'].startswith(device_class) for device_class in included_device_classes):
-                continue
-        except KeyError:
-            pass
-        friendly_name = entity.get('attributes', {}).get('friendly_name', 'Unknown')
-        state = entity.get('state', 'Unknown')
-        entity_type = entity['entity_id'].split('.')[0]
+            from tornado.websocket import websocket_connect  # noqa: F401
+        except ImportError:
+            logger.info("tornado is not installed, Home Assistant states are polled instead")
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="hass-events", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _run(self) -> None:
+        from tornado.httpclient import HTTPRequest
+        from tornado.websocket import websocket_connect
+
+        delay = 1.0
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                request = HTTPRequest(websocket_url(self.url), connect_timeout=self.timeout, request_timeout=self.timeout)
+                connection = await websocket_connect(request)
+                await self.listen(connection)
+                delay = 1.0
+            except Exception as e:
+                logger.warning(f"Home Assistant event stream failed, reconnecting in {delay:.0f}s: {e}")
+            finally:
+                self.subscribed = False
+                if connection is not None:
+                    connection.close()
+            if not self._stopping.is_set():
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+
+    async def listen(self, connection) -> None:
+        """
+        Authenticate, subscribe to events and apply them until the connection closes.
+
+        :param connection: An open websocket connection with tornado's
+            ``read_message()`` and ``write_message()`` coroutines.
+        """
+
+        async def receive() -> dict:
+            message = await connection.read_message()
+            if message is None:
+                raise ConnectionError("Connection closed")
+            return json.loads(message)
+
+        if (await receive()).get("type") != "auth_required":
+            raise ConnectionError("Unexpected handshake")
+        await connection.write_message(json.dumps({"type": "auth", "access_token": self.token}))
+        reply = await receive()
+        if reply.get("type") != "auth_ok":
+            raise PermissionError(reply.get("message", "Authentication failed"))
+        for message_id, event_type in enumerate(("state_changed", *REGISTRY_EVENTS), start=1):
+            await connection.write_message(json.dumps({"id": message_id, "type": "subscribe_events", "event_type": event_type}))
+        # Events may have been missed before the subscription, or while disconnected.
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+        self.subscribed = True
+        while not self._stopping.is_set():
+            message = await receive()
+            if message.get("type") == "event":
+                if message["event"].get("event_type") in REGISTRY_EVENTS:
+                    # Re-reads the areas over HTTP, keep the event loop free.
+                    await asyncio.get_running_loop().run_in_executor(None, self.apply_event, message["event"])
+                else:
+                    self.apply_event(message["event"])
+            elif message.get("type") == "result" and not message.get("success", True):
+                logger.warning(f"Home Assistant subscription failed: {message.get('error')}")
+
+
+_mirror: Optional[HomeAssistantMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> HomeAssistantMirror:
+    """Get the shared Home Assistant mirror, starting its event stream on first use."""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            if not hass_url:
+                raise ValueError("HASS_URL is not set")
+            _mirror = HomeAssistantMirror(hass_url, hass_token or "")
+            _mirror.start()
+        return _mirror
+
+
+def get_areas():
+    """Retrieve the list of areas."""
+    return get_mirror().areas()
+
+
+def list_devices(area: Optional[str] = None):
+    """List actual devices and their state, optionally only those in one area."""
+    mirror = get_mirror()
+    devices = []
+    for entity in mirror.entities(domains=included_device_classes, area=area):
         devices.append({
-            'entity_type': entity_type,
-            'friendly_name': friendly_name,
-            'state': state
+            'entity_type': entity['entity_id'].split('.')[0],
+            'friendly_name': entity.get('attributes', {}).get('friendly_name', 'Unknown'),
+            'state': entity.get('state', 'Unknown'),
+            'area': mirror.area_of.get(entity['entity_id']),
         })
     return devices
 
@@ -48,4 +270,3 @@ homeassistant_tool = [list_devices,]
 if __name__ == "__main__":
     for device in list_devices():
         print(device)
-
@@ -0,0 +1,150 @@
+"""
+Time-limited sympy evaluation for the assistant's ``math`` tool.
+
+sympify can spend minutes, and gigabytes, on an expression such as ``9**9**9``. Running
+it in the server process would pin a core and stall the turn with no way to stop it, so
+expressions are evaluated in separate worker processes. A worker that exceeds the time
+budget is killed and replaced on the next call; the others keep sympy imported and
+serve requests without start-up cost.
+"""
+import multiprocessing
+import queue
+import threading
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def _serve(conn, memory_bytes: Optional[int]) -> None:
+    """Worker process loop: evaluate (expression, as_float) requests until the pipe closes."""
+    if resource is not None and memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    from sympy import sympify
+
+    conn.send(("ready", None))
+    while True:
+        try:
+            expression, as_float = conn.recv()
+        except EOFError:
+            return
+        try:
+            value = sympify(expression)
+            conn.send(("ok", str(value.evalf() if as_float else value)))
+        except MemoryError:
+            conn.send(("error", "Expression needs too much memory"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """One worker process and our end of its pipe."""
+
+    # Importing sympy in a new process, not part of the evaluation's time budget.
+    startup_timeout = 60.0
+
+    def __init__(self, context, memory_bytes: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn, memory_bytes), daemon=True)
+        self.process.start()
+        child_conn.close()
+        try:
+            ready = self.conn.poll(self.startup_timeout) and self.conn.recv()[0] == "ready"
+        except EOFError:
+            ready = False
+        if not ready:
+            self.kill()
+            raise RuntimeError("The sympy worker process did not start")
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SympyEvaluator:
+    """
+    SympyEvaluator evaluates expressions on a pool of worker processes.
+
+    Workers are started on first use.
+
+    :param workers: Expressions evaluated at the same time.
+    :param timeout: Seconds an evaluation may take before its worker is killed.
+    :param memory_bytes: Address space limit of each worker, None for no limit.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 5.0, memory_bytes: Optional[int] = None):
+        self.timeout = timeout
+        self.memory_bytes = memory_bytes
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.LifoQueue[Optional[_Worker]]" = queue.LifoQueue()
+        for _ in range(workers):
+            self._idle.put(None)
+
+    def evaluate(self, expression: str, as_float: bool = False) -> str:
+        """
+        Evaluate an expression with sympy.
+
+        :param expression: The expression.
+        :param as_float: Evaluate to a floating point number.
+        :return: The result as a string.
+        :raises ValueError: If sympy can't evaluate the expression.
+        :raises TimeoutError: If the evaluation took longer than the timeout.
+        """
+        worker = self._idle.get()
+        try:
+            if worker is not None and not worker.process.is_alive():
+                worker.kill()
+                worker = None
+            if worker is None:
+                worker = _Worker(self._context, self.memory_bytes)
+            worker.conn.send((expression, as_float))
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                worker = None
+                raise TimeoutError(f"Evaluation took longer than {self.timeout:g}s and was stopped")
+            try:
+                status, result = worker.conn.recv()
+            except EOFError:
+                # The worker died, e.g. from the memory limit.
+                worker.kill()
+                worker = None
+                raise ValueError("Expression could not be evaluated")
+            if status != "ok":
+                raise ValueError(result)
+            return result
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop the idle workers."""
+        workers = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            if worker is not None:
+                worker.kill()
+            self._idle.put(None)
+
+
+_evaluator: Optional[SympyEvaluator] = None
+_evaluator_lock = threading.Lock()
+
+
+def get_sympy_evaluator(**kwargs) -> SympyEvaluator:
+    """
+    Get the process-wide sympy evaluator, creating it on first use.
+
+    :param kwargs: SympyEvaluator arguments, used when the evaluator is created.
+    :return: The shared SympyEvaluator.
+    """
+    global _evaluator
+    with _evaluator_lock:
+        if _evaluator is None:
+            _evaluator = SympyEvaluator(**kwargs)
+        return _evaluator
@@ -0,0 +1,265 @@
+"""
+Bounded execution of shell commands for the assistant's ``shell`` tool.
+
+Commands run in their own process group with a wall-clock timeout and, on POSIX, CPU
+time and address space limits, so a runaway command is killed together with everything
+it started. Output is read as it is produced into a capped buffer that keeps the head
+and the tail, so memory use and the size of the result handed back to the LLM stay
+bounded however much a command prints. Commands run on a small shared worker pool,
+while output chunks are delivered to an optional callback on the calling thread, which
+lets a Streamlit session show output as it arrives.
+"""
+import codecs
+import contextlib
+import contextvars
+import os
+import queue
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+OutputCallback = Callable[[str, str], None]
+
+_output_callback: contextvars.ContextVar[Optional[OutputCallback]] = contextvars.ContextVar(
+    "shell_output_callback", default=None
+)
+
+
+class OutputBuffer:
+    """
+    Keeps the first head_bytes and the last tail_bytes written to it.
+
+    :param head_bytes: Bytes kept from the start of the output.
+    :param tail_bytes: Bytes kept from the end of the output.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes) -> None:
+        self.total += len(data)
+        if len(self.head) < self.head_bytes:
+            room = self.head_bytes - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes:
+            self.tail += data
+            if len(self.tail) > 2 * self.tail_bytes:
+                # Trim in batches rather than on every write.
+                del self.tail[:-self.tail_bytes]
+
+    @property
+    def truncated(self) -> int:
+        """Number of bytes dropped between head and tail."""
+        return max(0, self.total - self.head_bytes - self.tail_bytes)
+
+    def text(self) -> str:
+        head = self.head.decode(errors="replace")
+        tail = bytes(self.tail[-self.tail_bytes:]).decode(errors="replace") if self.tail_bytes else ""
+        if self.truncated:
+            return f"{head}\n[... {self.truncated} bytes omitted ...]\n{tail}"
+        return head + tail
+
+
+class ShellResult:
+    """The outcome of a command."""
+
+    def __init__(self, command: str, returncode: Optional[int], stdout: OutputBuffer, stderr: OutputBuffer,
+                 duration: float, timed_out: bool):
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+
+    def to_tool_output(self) -> str:
+        """Format the result for the LLM, the way the shell tool has always reported it."""
+        if self.timed_out:
+            output = self.stdout.text() + self.stderr.text()
+            return f"Error: Command timed out after {self.duration:.0f}s and was killed\n{output}"
+        if self.returncode != 0:
+            return f"Error: Command returned non-zero exit code {self.returncode}\n{self.stderr.text()}"
+        return self.stdout.text()
+
+
+def _limit_prefix(cpu_seconds: Optional[int], memory_bytes: Optional[int]) -> str:
+    """
+    Shell commands that apply the limits to the command run after them.
+
+    The shell sets the limits itself rather than a preexec_fn, which is not safe to run
+    between fork and exec in a process with threads, such as the Streamlit server.
+    Without -H or -S, ulimit sets the hard limit too, so the command can't raise them.
+    """
+    if os.name != "posix":
+        return ""
+    prefix = ""
+    if cpu_seconds:
+        prefix += f"ulimit -t {int(cpu_seconds)}; "
+    if memory_bytes:
+        prefix += f"ulimit -v {int(memory_bytes) // 1024}; "
+    return prefix
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_command(
+    command: str,
+    timeout: float = 60,
+    cpu_seconds: Optional[int] = None,
+    memory_bytes: Optional[int] = None,
+    max_output_bytes: int = 32 * 1024,
+    on_output: Optional[OutputCallback] = None,
+    cwd: Optional[str] = None,
+) -> ShellResult:
+    """
+    Run a shell command with limits, reading its output as it is produced.
+
+    :param command: The command, run with the system shell.
+    :param timeout: Wall-clock seconds before the command's process group is killed.
+    :param cpu_seconds: CPU time limit of the command, None for no limit.
+    :param memory_bytes: Address space limit of the command, None for no limit.
+    :param max_output_bytes: Bytes of stdout and of stderr kept; a quarter from the start
+        of the output and the rest from the end.
+    :param on_output: Called with ("stdout" or "stderr", text) for every chunk read.
+    :param cwd: Working directory of the command.
+    :return: The ShellResult.
+    """
+    head = max_output_bytes // 4
+    buffers = {"stdout": OutputBuffer(head, max_output_bytes - head), "stderr": OutputBuffer(head, max_output_bytes - head)}
+    decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in buffers}
+    start = time.monotonic()
+    process = subprocess.Popen(
+        _limit_prefix(cpu_seconds, memory_bytes) + command,
+        shell=True,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+        selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+        while selector.get_map():
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                timed_out = True
+                _kill_group(process)
+                break
+            for key, _ in selector.select(timeout=min(remaining, 0.5)):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffers[key.data].write(data)
+                if on_output is not None:
+                    text = decoders[key.data].decode(data)
+                    if text:
+                        on_output(key.data, text)
+    process.stdout.close()
+    process.stderr.close()
+    try:
+        returncode = process.wait(timeout=max(0.0, timeout - (time.monotonic() - start)) + 1)
+    except subprocess.TimeoutExpired:
+        # The command closed its output but kept running past the timeout.
+        timed_out = True
+        _kill_group(process)
+        returncode = process.wait()
+    return ShellResult(command, returncode, buffers["stdout"], buffers["stderr"], time.monotonic() - start, timed_out)
+
+
+class ShellExecutor:
+    """
+    ShellExecutor runs commands on a shared worker pool with the same limits.
+
+    :param max_workers: Commands that run at the same time, across all sessions.
+    :param timeout: Wall-clock limit per command, in seconds.
+    :param cpu_seconds: CPU time limit per command.
+    :param memory_bytes: Address space limit per command.
+    :param max_output_bytes: Output kept per stream.
+    """
+
+    def __init__(self, max_workers: int = 4, timeout: float = 60, cpu_seconds: Optional[int] = None,
+                 memory_bytes: Optional[int] = None, max_output_bytes: int = 32 * 1024):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_output_bytes = max_output_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shell")
+
+    def run(self, command: str, on_output: Optional[OutputCallback] = None, cwd: Optional[str] = None) -> ShellResult:
+        """
+        Run a command on the pool and wait for it.
+
+        :param command: The command.
+        :param on_output: Called on this thread with ("stdout" or "stderr", text) as output
+            arrives. Defaults to the callback installed with stream_output_to().
+        :param cwd: Working directory of the command.
+        :return: The ShellResult.
+        """
+        on_output = on_output or _output_callback.get()
+        chunks: "queue.Queue[tuple]" = queue.Queue()
+        future = self._executor.submit(
+            run_command,
+            command,
+            timeout=self.timeout,
+            cpu_seconds=self.cpu_seconds,
+            memory_bytes=self.memory_bytes,
+            max_output_bytes=self.max_output_bytes,
+            on_output=(lambda stream, text: chunks.put((stream, text))) if on_output else None,
+            cwd=cwd,
+        )
+        if on_output is None:
+            return future.result()
+        while not (future.done() and chunks.empty()):
+            try:
+                on_output(*chunks.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        return future.result()
+
+
+@contextlib.contextmanager
+def stream_output_to(callback: OutputCallback) -> Iterator[None]:
+    """Deliver the output of shell tool calls made in this context to callback."""
+    token = _output_callback.set(callback)
+    try:
+        yield
+    finally:
+        _output_callback.reset(token)
+
+
+_shell_executor: Optional[ShellExecutor] = None
+_shell_executor_lock = threading.Lock()
+
+
+def get_shell_executor(**kwargs) -> ShellExecutor:
+    """
+    Get the process-wide shell executor, creating it on first use.
+
+    :param kwargs: ShellExecutor arguments, used when the executor is created.
+    :return: The shared ShellExecutor.
+    """
+    global _shell_executor
+    with _shell_executor_lock:
+        if _shell_executor is None:
+            _shell_executor = ShellExecutor(**kwargs)
+        return _shell_executor
@@ -1,18 +1,41 @@
-from phi.tools import Toolkit
-import subprocess
-from sympy import sympify
-import pint
+from functools import lru_cache
+
+from .math_worker import get_sympy_evaluator
+from .shell import get_shell_executor
+
+
+@lru_cache(maxsize=None)
+def get_unit_registry():
+    """Build the pint unit registry on first use, it takes a while to load its definitions."""
+    import pint
+
+    return pint.UnitRegistry()
+
+
+@lru_cache(maxsize=256)
+def parse_unit(name: str):
+    """Parse a unit name once, later conversions reuse the parsed unit."""
+    return get_unit_registry().parse_units(name)
+
+
+# Models often repeat a tool call with the same arguments within a turn. Failed
+# evaluations raise and are not cached.
+@lru_cache(maxsize=1024)
+def evaluate(equation: str, as_float: bool) -> str:
+    return get_sympy_evaluator().evaluate(equation, as_float)
+
+
+@lru_cache(maxsize=1024, typed=True)
+def convert(from_unit: str, to_unit: str, value: float) -> str:
+    return str(get_unit_registry().Quantity(value, parse_unit(from_unit)).to(parse_unit(to_unit)))
 
-ureg = pint.UnitRegistry()
-Q_ = ureg.Quantity
 
 def shell(command: str) -> str:
-    """Run a shell command and return the output or error."""
+    """Run a shell command and return the output or error.
+    Commands are killed after a time limit and long output is shortened to its start and end.
+    """
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode != 0:
-            return f"Error: Command returned non-zero exit code {result.returncode}\n{result.stderr}"
-        return result.stdout
+        return get_shell_executor().run(command).to_tool_output()
     except FileNotFoundError:
         return "Error: Command not found"
 
@@ -20,9 +43,7 @@ def math(equation: str, as_float=False) -> str:
     """Evaluate a mathematical expression using sympy. Use as_float to return a float instead of a string.
     for example 1/2 will return 0.5 instead of 1/2.
     """
-    if as_float:
-        return str(sympify(equation).evalf())
-    return str(sympify(equation))
+    return evaluate(equation, bool(as_float))
 
 def unit_conversion(from_unit: str, to_unit: str, value: float = 1.0) -> str:
     """Convert a value from one unit to another.
@@ -31,6 +52,6 @@ def unit_conversion(from_unit: str, to_unit: str, value: float = 1.0) -> str:
 
     You must never use unit abbreviations when calling this tool.
     """
-    return str(Q_(value, from_unit.lower()).to(to_unit.lower()))
+    return convert(from_unit.lower(), to_unit.lower(), value)
 
 utils = [shell, math, unit_conversion]
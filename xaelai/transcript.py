@@ -0,0 +1,57 @@
+import json
+from typing import Any, Dict, List
+
+import streamlit as st
+
+
+def message_markdown(content: Any) -> str:
+    """Convert message content (text, or structured content from restored runs) to markdown."""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n\n".join(message_markdown(part.get("text") if isinstance(part, dict) and "text" in part else part) for part in content)
+    return f"```json\n{json.dumps(content, indent=2, default=str)}\n```"
+
+
+def reset_transcript() -> None:
+    """Forget the transcript window and cached markdown, e.g. after restoring a session."""
+    st.session_state.pop("transcript_window", None)
+    st.session_state.pop("transcript_cache", None)
+
+
+def _cached_markdown(messages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Markdown for each message, cached in the session state.
+
+    Past messages never change, so the cache only grows as messages are appended. It is
+    rebuilt when the message list is replaced or shrinks.
+    """
+    cache = st.session_state.get("transcript_cache")
+    if cache is None or cache["source"] != id(messages) or len(cache["markdown"]) > len(messages):
+        cache = {"source": id(messages), "markdown": []}
+        st.session_state["transcript_cache"] = cache
+    for message in messages[len(cache["markdown"]):]:
+        cache["markdown"].append(message_markdown(message.get("content")))
+    return cache["markdown"]
+
+
+def render_transcript(messages: List[Dict[str, Any]], page_size: int = 50) -> None:
+    """
+    Render the most recent messages of a chat, with a button to load older ones.
+
+    :param messages: The chat messages, oldest first.
+    :param page_size: How many messages to show initially and to add per click.
+    """
+    window = st.session_state.get("transcript_window", page_size)
+    hidden = max(len(messages) - window, 0)
+    if hidden:
+        if st.button(f"Show {min(hidden, page_size)} older messages ({hidden} hidden)", key="transcript_load_older"):
+            st.session_state["transcript_window"] = window + page_size
+            st.rerun()
+
+    markdown = _cached_markdown(messages)
+    for message, text in zip(messages[hidden:], markdown[hidden:]):
+        with st.chat_message(message["role"]):
+            st.markdown(text)
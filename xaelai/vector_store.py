@@ -0,0 +1,457 @@
+"""
+PgVector collection with ANN index lifecycle management.
+
+ManagedPgVector builds the collection's HNSW or IVFFlat index once there is data to
+index, refreshes planner statistics after bulk loads and rebuilds IVFFlat indexes when
+the collection has outgrown the number of lists they were trained with. Search takes
+``ef_search``/``probes`` per query so recall can be traded for latency.
+
+In hybrid search mode a full-text GIN index on the chunk contents is maintained as
+well, and keyword and vector results are merged with reciprocal-rank fusion.
+
+Embeddings can be stored as ``halfvec`` (float16, half the size of ``vector``) and
+indexed by their binary quantization, in which case the index finds candidates by
+Hamming distance and they are re-ranked by their full-precision distance.
+"""
+import re
+from hashlib import sha1
+from math import sqrt
+from typing import Any, Dict, List, Optional, Union
+
+from phi.document import Document
+from phi.utils.log import logger
+from phi.vectordb.distance import Distance
+from phi.vectordb.pgvector import PgVector2
+from phi.vectordb.pgvector.index import HNSW, Ivfflat
+from sqlalchemy.sql.expression import bindparam, cast, func, literal_column, select, text
+
+from retrieval import RERANKERS, query_terms, reciprocal_rank_fusion
+
+# pgvector can't index columns with more dimensions than this.
+MAX_INDEX_DIMENSIONS = {"vector": 2000, "halfvec": 4000, "binary": 64000}
+STORAGE_TYPES = ("vector", "halfvec")
+QUANTIZATIONS = ("none", "binary")
+SEARCH_MODES = ("vector", "hybrid")
+
+
+def embedding_to_list(value) -> Optional[List[float]]:
+    """Convert an embedding read from a vector or halfvec column to a list of floats."""
+    if value is None:
+        return None
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    return [float(x) for x in value]
+
+
+class ManagedPgVector(PgVector2):
+    """
+    ManagedPgVector is a PgVector2 that manages its ANN index.
+
+    :param ef_search: Default HNSW ``ef_search`` for queries.
+    :param probes: Default IVFFlat ``probes`` for queries.
+    :param rebuild_growth: Rebuild an IVFFlat index once the collection has grown by this factor since it was built.
+    :param min_index_rows: Don't build an IVFFlat index before the collection has this many rows.
+    :param storage: Column type of the embeddings, "vector" (float32) or "halfvec" (float16).
+    :param quantization: "binary" to index the binary quantization of the embeddings, "none" to index them as stored.
+    :param rerank_factor: With binary quantization, how many candidates per result are re-ranked.
+    :param search_mode: "vector", or "hybrid" to combine vector and full-text search.
+    :param text_search_config: Postgres text search configuration of the full-text index.
+    :param hybrid_candidates: Results taken from each retriever before fusion in hybrid mode.
+    :param reranker: Name of a re-ranker from retrieval.RERANKERS applied after fusion, or "none".
+
+    Other arguments are passed to PgVector2.
+    """
+
+    def __init__(
+        self,
+        *args,
+        ef_search: int = 40,
+        probes: int = 10,
+        rebuild_growth: float = 2.0,
+        min_index_rows: int = 1000,
+        storage: str = "vector",
+        quantization: str = "none",
+        rerank_factor: int = 4,
+        search_mode: str = "vector",
+        text_search_config: str = "english",
+        hybrid_candidates: int = 20,
+        reranker: str = "none",
+        **kwargs,
+    ):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector storage type: {storage}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        if not re.fullmatch(r"[a-z_]+", text_search_config):
+            raise ValueError(f"Invalid text search configuration: {text_search_config}")
+        if reranker != "none" and reranker not in RERANKERS:
+            raise ValueError(f"Unknown re-ranker: {reranker}")
+        self.search_mode = search_mode
+        self.text_search_config = text_search_config
+        self.hybrid_candidates = hybrid_candidates
+        self.reranker = reranker
+        # Set before PgVector2.__init__, which builds the table.
+        self.storage = storage
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        super().__init__(*args, **kwargs)
+        self.ef_search = ef_search
+        self.probes = probes
+        self.rebuild_growth = rebuild_growth
+        self.min_index_rows = min_index_rows
+        if self.index is not None and self.index.name is None:
+            _type = "ivfflat" if isinstance(self.index, Ivfflat) else "hnsw"
+            self.index.name = f"{self.collection}_{_type}_index"
+
+    def get_table(self):
+        table = super().get_table()
+        if self.storage == "halfvec":
+            from pgvector.sqlalchemy import HALFVEC
+
+            table.c.embedding.type = HALFVEC(self.dimensions)
+        return table
+
+    @property
+    def qualified_table(self) -> str:
+        return f"{self.schema}.{self.collection}" if self.schema else self.collection
+
+    @property
+    def max_index_dimensions(self) -> int:
+        return MAX_INDEX_DIMENSIONS["binary" if self.quantization == "binary" else self.storage]
+
+    def index_supported(self) -> bool:
+        """Whether pgvector can index the collection's embeddings."""
+        return self.index is not None and self.dimensions <= self.max_index_dimensions
+
+    def index_target(self) -> str:
+        """The indexed expression and its operator class."""
+        if self.quantization == "binary":
+            return f"(binary_quantize(embedding)::bit({int(self.dimensions)})) bit_hamming_ops"
+        metric = {Distance.l2: "l2", Distance.max_inner_product: "ip"}.get(self.distance, "cosine")
+        return f"embedding {self.storage}_{metric}_ops"
+
+    def index_info(self) -> Optional[Dict[str, Any]]:
+        """
+        Describe the collection's ANN index.
+
+        :return: The index name, access method, size and the row count it was built with, or None if it does not exist.
+        """
+        if self.index is None:
+            return None
+        stmt = text(
+            "SELECT am.amname AS method, pg_relation_size(c.oid) AS size, obj_description(c.oid, 'pg_class') AS comment "
+            "FROM pg_class c JOIN pg_am am ON am.oid = c.relam "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = :schema"
+        )
+        with self.Session() as sess:
+            row = sess.execute(stmt, {"name": self.index.name, "schema": self.schema or "public"}).first()
+        if row is None:
+            return None
+        built_rows = None
+        if row.comment and row.comment.startswith("rows="):
+            built_rows = int(row.comment[len("rows="):])
+        return {"name": self.index.name, "method": row.method, "size": row.size, "built_rows": built_rows}
+
+    def ivfflat_lists(self, rows: int) -> int:
+        """The number of IVFFlat lists for a collection of the given size, as recommended by pgvector."""
+        if not self.index.dynamic_lists:
+            return self.index.lists
+        return max(1, int(rows / 1000) if rows <= 1_000_000 else int(sqrt(rows)))
+
+    def build_index(self, rows: Optional[int] = None) -> None:
+        """
+        (Re)build the ANN index and record the row count it was built with.
+
+        :param rows: The current row count, counted if None.
+        """
+        if not self.index_supported():
+            logger.warning(
+                f"Not indexing {self.qualified_table}: pgvector indexes support up to "
+                f"{self.max_index_dimensions} dimensions, the collection has {self.dimensions}"
+            )
+            return
+        rows = self.get_count() if rows is None else rows
+        if isinstance(self.index, Ivfflat):
+            method, params = "ivfflat", f"lists = {int(self.ivfflat_lists(rows))}"
+        else:
+            method, params = "hnsw", f"m = {int(self.index.m)}, ef_construction = {int(self.index.ef_construction)}"
+        logger.info(f"Building {method} index {self.index.name} on {self.qualified_table} ({rows} rows, {params})")
+        with self.Session() as sess:
+            with sess.begin():
+                for key, value in self.index.configuration.items():
+                    sess.execute(text(f"SET LOCAL {key} = '{value}'"))
+                sess.execute(text(f"DROP INDEX IF EXISTS {self.schema}.{self.index.name}" if self.schema else f"DROP INDEX IF EXISTS {self.index.name}"))
+                sess.execute(
+                    text(f"CREATE INDEX {self.index.name} ON {self.qualified_table} USING {method} ({self.index_target()}) WITH ({params})")
+                )
+                index = f"{self.schema}.{self.index.name}" if self.schema else self.index.name
+                sess.execute(text(f"COMMENT ON INDEX {index} IS 'rows={int(rows)}'"))
+
+    def optimize(self) -> None:
+        """Build the index if it does not exist yet."""
+        if self.index_supported() and self.index_info() is None:
+            self.build_index()
+
+    def analyze(self) -> None:
+        """Refresh the planner statistics of the collection."""
+        with self.db_engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text(f"ANALYZE {self.qualified_table}"))
+
+    def after_bulk_load(self) -> None:
+        """
+        Maintain the index after documents were loaded.
+
+        Refreshes statistics, builds a missing index once there is enough data, and
+        rebuilds an IVFFlat index whose lists were sized for a much smaller collection.
+        HNSW indexes are maintained incrementally by Postgres and are only built once.
+        """
+        self.analyze()
+        if self.search_mode == "hybrid":
+            self.build_text_index()
+        if not self.index_supported():
+            return
+        rows = self.get_count()
+        info = self.index_info()
+        if isinstance(self.index, Ivfflat):
+            if rows < self.min_index_rows:
+                return
+            built_rows = (info or {}).get("built_rows")
+            if info is None or not built_rows or rows >= built_rows * self.rebuild_growth:
+                self.build_index(rows)
+        elif info is None:
+            self.build_index(rows)
+
+    @property
+    def text_index_name(self) -> str:
+        return f"{self.collection}_fts_index"
+
+    def tsvector(self, content):
+        """The full-text document of a content column, exactly as the GIN index is defined."""
+        # The configuration is inlined rather than bound so the expression matches the index.
+        return func.to_tsvector(literal_column(f"'{self.text_search_config}'::regconfig"), content)
+
+    def build_text_index(self) -> None:
+        """Create the full-text GIN index on the chunk contents if it does not exist."""
+        with self.Session() as sess:
+            with sess.begin():
+                sess.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {self.text_index_name} ON {self.qualified_table} "
+                        f"USING gin (to_tsvector('{self.text_search_config}'::regconfig, content))"
+                    )
+                )
+
+    def clear(self) -> bool:
+        """Delete every document of the collection, truncating its table instead of deleting row by row."""
+        if not self.table_exists():
+            return True
+        with self.Session() as sess:
+            with sess.begin():
+                sess.execute(text(f"TRUNCATE {self.qualified_table}"))
+        return True
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Find the documents closest to a query.
+
+        :param query: The query text.
+        :param limit: Number of documents to return.
+        :param filters: Column values the documents must match.
+        :param ef_search: HNSW candidate list size for this query, at least ``limit``.
+        :param probes: IVFFlat lists to probe for this query.
+        :return: The matching documents, closest first.
+        """
+        if self.search_mode == "hybrid":
+            return self.hybrid_search(query, limit, filters, ef_search, probes)
+        query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+        return self.search_by_embedding(query_embedding, limit, filters, ef_search, probes)
+
+    def hybrid_search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Combine vector and full-text search with reciprocal-rank fusion.
+
+        Both retrievers return ``hybrid_candidates`` results, which are fused, re-ranked
+        if a re-ranker is configured, and cut to ``limit``.
+        """
+        candidates = max(limit, self.hybrid_candidates)
+        rankings = []
+        query_embedding = self.embedder.get_embedding(query)
+        if query_embedding:
+            rankings.append(self.search_by_embedding(query_embedding, candidates, filters, ef_search, probes))
+        else:
+            logger.error(f"Error getting embedding for Query: {query}")
+        rankings.append(self.keyword_search(query, candidates, filters))
+        scored = reciprocal_rank_fusion(rankings)
+        if self.reranker != "none":
+            scored = RERANKERS[self.reranker](query, scored)
+        return [document for document, _ in scored[:limit]]
+
+    def keyword_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Find the chunks that best match the terms of a query with Postgres full-text search.
+
+        A chunk matches if it contains any of the terms; chunks containing more of them,
+        closer together, rank higher.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        table = self.table
+        tsquery = func.websearch_to_tsquery(
+            literal_column(f"'{self.text_search_config}'::regconfig"), bindparam("terms", " OR ".join(terms))
+        )
+        tsvector = self.tsvector(table.c.content)
+        stmt = select(table.c.id, table.c.name, table.c.meta_data, table.c.content, table.c.embedding, table.c.usage)
+        stmt = stmt.where(tsvector.op("@@")(tsquery))
+        for key, value in (filters or {}).items():
+            if hasattr(table.c, key):
+                stmt = stmt.where(getattr(table.c, key) == value)
+        stmt = stmt.order_by(func.ts_rank_cd(tsvector, tsquery).desc()).limit(limit)
+        try:
+            with self.Session() as sess:
+                neighbors = sess.execute(stmt).fetchall()
+        except Exception as e:
+            logger.error(f"Error searching for documents: {e}")
+            return []
+        return self.to_documents(neighbors)
+
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Like search, for a query that is already embedded.
+
+        With binary quantization the index yields ``limit * rerank_factor`` candidates by
+        Hamming distance, which are re-ranked by their full-precision distance.
+        """
+        table = self.table
+        stmt = select(table.c.id, table.c.name, table.c.meta_data, table.c.content, table.c.embedding, table.c.usage)
+        for key, value in (filters or {}).items():
+            if hasattr(table.c, key):
+                stmt = stmt.where(getattr(table.c, key) == value)
+        if self.quantization == "binary":
+            from pgvector.sqlalchemy import BIT
+
+            query = bindparam("query_embedding", query_embedding, type_=table.c.embedding.type)
+            hamming = cast(func.binary_quantize(table.c.embedding), BIT(self.dimensions)).op("<~>")(func.binary_quantize(query))
+            candidates = stmt.order_by(hamming).limit(limit * self.rerank_factor).subquery()
+            stmt = select(*candidates.c).order_by(self.distance_to(candidates.c.embedding, query_embedding)).limit(limit)
+        else:
+            stmt = stmt.order_by(self.distance_to(table.c.embedding, query_embedding)).limit(limit)
+
+        try:
+            with self.Session() as sess:
+                with sess.begin():
+                    if isinstance(self.index, Ivfflat):
+                        sess.execute(text(f"SET LOCAL ivfflat.probes = {int(probes or self.probes)}"))
+                    elif isinstance(self.index, HNSW):
+                        candidates = limit * self.rerank_factor if self.quantization == "binary" else limit
+                        sess.execute(text(f"SET LOCAL hnsw.ef_search = {max(int(ef_search or self.ef_search), candidates)}"))
+                    neighbors = sess.execute(stmt).fetchall()
+        except Exception as e:
+            logger.error(f"Error searching for documents: {e}")
+            self.create()
+            return []
+
+        return self.to_documents(neighbors)
+
+    def to_documents(self, rows) -> List[Document]:
+        """Build Documents from result rows."""
+        return [
+            Document(
+                id=row.id,
+                name=row.name,
+                meta_data=row.meta_data,
+                content=row.content,
+                embedder=self.embedder,
+                embedding=embedding_to_list(row.embedding),
+                usage=row.usage,
+            )
+            for row in rows
+        ]
+
+    def distance_to(self, column, query_embedding: List[float]):
+        """The full-precision distance between a column and a query embedding."""
+        if self.distance == Distance.l2:
+            return column.l2_distance(query_embedding)
+        if self.distance == Distance.max_inner_product:
+            return column.max_inner_product(query_embedding)
+        return column.cosine_distance(query_embedding)
+
+
+def partition_collection(collection: str, partition: str, max_slug_length: int = 16) -> str:
+    """
+    Name the collection holding one user's or workspace's documents.
+
+    The partition is reduced to a safe SQL identifier. Partitions that had to be
+    shortened or changed get a hash suffix, so distinct partitions never share a
+    collection and index names stay within Postgres' 63 character limit.
+
+    :param collection: The base collection name, e.g. "text_documents".
+    :param partition: The user id or workspace name.
+    :param max_slug_length: Maximum length of the readable part of the partition name.
+    :return: The partition's collection name.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", partition.lower()).strip("_")[:max_slug_length]
+    if slug != partition:
+        slug = f"{slug}_{sha1(partition.encode()).hexdigest()[:8]}".lstrip("_")
+    return f"{collection}_{slug}"
+
+
+def embedding_space_collection(collection: str, model: str, dimensions: int, storage: str = "vector") -> str:
+    """
+    Name the collection holding embeddings of one model and storage type.
+
+    Embeddings of different models can't be compared, and the column type depends on
+    the dimensions and storage, so each combination gets its own table.
+
+    :param collection: The (partitioned) collection name.
+    :param model: The embedding model.
+    :param dimensions: The embedding dimensions.
+    :param storage: "vector" or "halfvec".
+    :return: The collection name, suffixed with a short hash of the embedding space.
+    """
+    return f"{collection}_e{sha1(f'{model}:{dimensions}:{storage}'.encode()).hexdigest()[:6]}"
+
+
+def make_index(index_type: str, **params) -> Optional[Union[HNSW, Ivfflat]]:
+    """
+    Create an index description from settings.
+
+    :param index_type: "hnsw", "ivfflat" or "none".
+    :param params: Index parameters, unknown ones are ignored.
+    :return: The index, or None for "none".
+    """
+    index_type = index_type.lower()
+    if index_type == "none":
+        return None
+    if index_type == "ivfflat":
+        return Ivfflat(lists=params.get("lists") or 100, probes=params.get("probes", 10), dynamic_lists=not params.get("lists"))
+    if index_type == "hnsw":
+        return HNSW(m=params.get("m", 16), ef_construction=params.get("ef_construction", 64), ef_search=params.get("ef_search", 40))
+    raise ValueError(f"Unknown vector index type: {index_type}")
@@ -0,0 +1,216 @@
+"""
+Background indexing of a user's data directory into their knowledge base.
+
+A DataDirectoryWatcher periodically refreshes the directory's FileIndex (see
+tools/file_index.py) and reconciles it with the collection's manifest: files whose
+content hash differs from the recorded one are ingested, documents of files that no
+longer exist are deleted with their chunks. Only what changed is read and embedded, so
+the knowledge base stays current without full reloads. Scans run as background jobs
+on a worker of their own, under a cap on the bytes read per second shared by all
+watchers, so a large drop of files does not starve chat requests of Ollama and the
+database, nor other background jobs of workers.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from phi.document import Document
+from phi.utils.log import logger
+
+from ingestion import IngestionPipeline
+from jobs import Job
+from tools.file_index import FileIndex, FileRecord
+
+
+class Throttle:
+    """
+    Throttle limits the rate of work to a number of units per second.
+
+    It can be shared by threads: their work adds up against the same rate. Time spent
+    idle does not build up a budget for later bursts.
+
+    :param rate: Units per second, 0 for no limit.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.available_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, units: float) -> None:
+        """Account for units of work, sleeping until they fit in the rate."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.available_at = max(self.available_at, now) + units / self.rate
+            delay = self.available_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+_throttle: Optional[Throttle] = None
+_throttle_lock = threading.Lock()
+
+
+def get_throttle(rate: float) -> Throttle:
+    """
+    Get the process-wide throttle of data directory scans, creating it on first use.
+
+    :param rate: Bytes per second, used when the throttle is created.
+    :return: The shared Throttle.
+    """
+    global _throttle
+    with _throttle_lock:
+        if _throttle is None:
+            _throttle = Throttle(rate)
+        return _throttle
+
+
+class DataDirectoryWatcher:
+    """
+    DataDirectoryWatcher keeps a knowledge base in sync with the files of a directory.
+
+    :param pipeline: The ingestion pipeline of the knowledge base's collection.
+    :param file_index: The index of the directory.
+    :param interval: Seconds between scans once started.
+    :param max_bytes_per_second: Cap on the file bytes read per second while scanning, 0 for none.
+        Used when no throttle is given.
+    :param throttle: Throttle of the bytes read, e.g. one shared by the watchers of all users.
+    :param max_file_bytes: Larger files are not ingested.
+    :param prefix: Prefix of the document names of indexed files, telling them apart from
+        uploads and crawled pages in the same collection.
+    """
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        file_index: FileIndex,
+        interval: float = 300.0,
+        max_bytes_per_second: int = 1024 * 1024,
+        max_file_bytes: int = 20 * 1024 * 1024,
+        prefix: str = "file:",
+        throttle: Optional[Throttle] = None,
+    ):
+        self.pipeline = pipeline
+        self.file_index = file_index
+        self.interval = interval
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_file_bytes = max_file_bytes
+        self.prefix = prefix
+        self.throttle = throttle or Throttle(max_bytes_per_second)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def document_name(self, record: FileRecord) -> str:
+        return f"{self.prefix}{record.path}"
+
+    def supported(self, record: FileRecord) -> bool:
+        return record.size <= self.max_file_bytes and (record.type == "application/pdf" or record.is_text)
+
+    def read_documents(self, record: FileRecord, job: Job) -> list:
+        """Read and chunk a file into documents named after it."""
+        name = self.document_name(record)
+        path = self.file_index.root / record.path
+        if record.type == "application/pdf":
+            return self.pipeline.read_pdf(path.read_bytes(), name, job)
+        with open(path, "r", errors="replace") as file:
+            content = file.read()
+        if not content.strip():
+            return []
+        document = Document(name=name, id=name, meta_data={"path": record.path}, content=content)
+        return self.pipeline.reader.chunk_document(document)
+
+    def sync_file(self, record: FileRecord, job: Job) -> str:
+        """Ingest one file under the index's content hash, so the next scan recognises it as unchanged."""
+        # Files without text are recorded too, so they are not read again until they change.
+        return self.pipeline.sync_document(
+            self.document_name(record), self.read_documents(record, job), job, content_hash=record.content_hash
+        )
+
+    def scan(self, job: Job) -> str:
+        """
+        Refresh the file index and sync the changes into the collection.
+
+        :param job: Receives progress.
+        :return: A summary of the scan.
+        """
+        job.update(status="scanning", message=f"Scanning {self.file_index.root}")
+        # Hashing changed files and ingesting them share the cap on bytes read per second.
+        self.file_index.refresh(throttle=self.throttle.wait)
+        recorded = self.pipeline.manifest.content_hashes(prefix=self.prefix)
+        records = [record for record in self.file_index.search(limit=None) if self.supported(record)]
+        pending = [record for record in records if recorded.get(self.document_name(record)) != record.content_hash]
+        current = {self.document_name(record) for record in records}
+        removed = [name for name in recorded if name not in current]
+
+        for name in removed:
+            self.pipeline.manifest.delete(name)
+        synced = failed = 0
+        for number, record in enumerate(pending, start=1):
+            if self._stopping.is_set():
+                break
+            job.update(status="indexing files", done=number - 1, total=len(pending), message=f"Indexing {record.path}")
+            try:
+                logger.debug(self.sync_file(record, job))
+                synced += 1
+            except Exception as e:
+                # One unreadable file should not stop the others, it is retried next scan.
+                logger.warning(f"Could not index {record.path}: {e}")
+                failed += 1
+            self.throttle.wait(record.size)
+        job.update(done=len(pending), total=len(pending))
+        message = f"{self.file_index.root}: {synced} files indexed, {len(removed)} removed, {len(records) - len(pending)} unchanged"
+        return message + (f", {failed} failed" if failed else "")
+
+    def submit_scan(self) -> Job:
+        """Scan in the background, sharing the job of a scan that is already running."""
+        return self.pipeline.submit("index", f"Index {self.file_index.root.name}", str(self.file_index.root), self.scan)
+
+    def start(self) -> None:
+        """Scan now and then every interval seconds, until stop() is called."""
+
+        def loop() -> None:
+            while not self._stopping.is_set():
+                try:
+                    self.submit_scan()
+                except Exception as e:
+                    logger.warning(f"Could not start a scan of {self.file_index.root}: {e}")
+                self._stopping.wait(self.interval)
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=loop, name=f"watch-{self.file_index.root.name}", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scanning; a scan that is running stops before its next file."""
+        self._stopping.set()
+
+
+_watchers: Dict[str, DataDirectoryWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(directory: str, collection: str, factory: Callable[[], DataDirectoryWatcher]) -> DataDirectoryWatcher:
+    """
+    Get the watcher of a directory, replacing it when the directory is to be indexed into another collection.
+
+    A directory has one watcher at a time: when a user switches embedding model, the
+    watcher of the previous model's collection is stopped instead of being left to scan
+    into a collection that is no longer used.
+
+    :param directory: The watched directory.
+    :param collection: The collection the directory is indexed into.
+    :param factory: Creates the watcher for the collection.
+    :return: The watcher of the directory.
+    """
+    with _watchers_lock:
+        watcher = _watchers.get(directory)
+        if watcher is not None and watcher.pipeline.vector_db.collection == collection:
+            return watcher
+        if watcher is not None:
+            watcher.stop()
+        watcher = _watchers[directory] = factory()
+        return watcher